@@ -12,16 +12,20 @@ Usage:
             1. 'allreduce'
             2. 'primitive'
             3. 'hybrid_parallel'
+        -j --jobs= (optional)
+            number of processes parsing the simulation logs (default: number of CPUs)
     e.g. "python3 generate_experiments.py --exp_type=message_size --collective_type=allreduce"
 """
 
 import sys, os, getopt
-import pprint, math
+import pprint, functools
 import utilities as utils
+import results_index
+import link_analysis
 sys.path.append('../')
 from collections import defaultdict
-from network_topology import *
-from traffic.synthetic_traffic import *
+from network_topology import topology_registry
+from traffic.synthetic_traffic import traffic_registry, traffic_cache
 
 ####################################################################################################
 # Analysis Parameters 
@@ -33,10 +37,24 @@ ANALYSIS_DIRECTORY = BASE_DIRECTORY + "/analysis/"
 ANALYSIS_OUTPUT_DIRECTORY = BASE_DIRECTORY + "/results/"
 RESULT_DIRECTORY = BASE_DIRECTORY + "/temp/"
 INPUT_DIRECTORY = BASE_DIRECTORY + "/input_parameters/"
+RESULTS_INDEX_FILENAME = ANALYSIS_OUTPUT_DIRECTORY + "results_index.sqlite"
+# Number of processes parsing the flow completion logs (-j option)
+NUM_INGESTION_JOBS = os.cpu_count() or 1
+TRAFFIC_CACHE_DIRECTORY = RESULT_DIRECTORY + ".traffic_cache"
 
-# read parameters from file
-parameter_file_name = INPUT_DIRECTORY + "/setup.json"
-input_parameters = utils.parseJSON(parameter_file_name)
+# Inputs of the experiments (setup.json) and the cache of planned traffic, loaded by setupAnalysis()
+input_parameters = {}
+TRAFFIC_CACHE = None
+
+# Reads the inputs of the experiments. Called by main(), so that importing this script has no side effects.
+def setupAnalysis():
+    global input_parameters, TRAFFIC_CACHE
+    # read parameters from file
+    parameter_file_name = INPUT_DIRECTORY + "/setup.json"
+    input_parameters = utils.parseJSON(parameter_file_name)
+
+    # Planned traffic is cached in memory and on disk, shared with generate_experiment.py
+    TRAFFIC_CACHE = traffic_cache.TrafficCache(TRAFFIC_CACHE_DIRECTORY, max_disk_bytes=int(input_parameters.get("TRAFFIC_CACHE_SIZE_BYTES", 1 << 30)))
 
 # Derive the hardware/system parameter name that includes information on:
 # 1) Transport layer protocol and input/output port buffer size
@@ -59,15 +77,32 @@ def deriveNetworkHardwareParameterName(routing_scheme, network_link_bandwidth_gb
 # Generate the topologies compared in this work normalized along the per-CU bandwidth
 def generateTopology(target_num_nodes, per_cu_bw_gbps, l=1):
     print("[Setup] Generate topologies")
-    p = target_num_nodes
-    r = math.ceil(float(p) ** (1/(float(l)+1)))
-    torus_dim = {16: [4,4], 64: [8,8], 256: [16,16], 512: [32,16], 1024: [32,32]}
-    sipac_network_network = sipac_network_topology.SiPACNetworkTopology(r=r,l=l,link_bw=per_cu_bw_gbps//((l+1)*(r-1)), num_wavelengths_per_pair=1)
-    bcube_network = bcube_network_topology.BcubeNetworkTopology(r=r,l=l,link_bw=per_cu_bw_gbps//(l+1), num_wavelengths_per_pair=1)
-    superpod_network = dgx_superpod_network_topology.DGX_Superpod(target_num_gpus=p, link_bw=per_cu_bw_gbps//6) # each gpu is connected to 6 nvswitches with 2 links each = 12 links
-    torus_network = nd_torus_network_topology.NDTorusNetworkTopology(torus_dim[target_num_nodes], link_bw=per_cu_bw_gbps//(2*2))
-    topology_list = [superpod_network, torus_network, bcube_network, sipac_network_network]
-    return topology_list
+    return [topology_registry.buildTopology(kind, target_num_nodes, per_cu_bw_gbps, l, link_latency_ns=int(input_parameters["NETWORK_LINK_LATENCY_NS"]))
+            for kind in topology_registry.COMPARED_TOPOLOGY_KINDS]
+
+# Returns the index of the run results. On first use, every run under the result directory is discovered and the
+# new or changed flow completion logs are parsed on NUM_INGESTION_JOBS processes.
+@functools.lru_cache(maxsize=None)
+def loadResultsIndex():
+    results = results_index.ResultsIndex(RESULTS_INDEX_FILENAME, RESULT_DIRECTORY)
+    results.scan(jobs=NUM_INGESTION_JOBS)
+    return results
+
+# Returns the job completion time of a run from the results index (None if the run has no flow completion log)
+def findJobCompletionTime(traffic_name, topology_name, message_size_str, hardware_param):
+    run_stats = loadResultsIndex().getRunStats(traffic_name, topology_name, message_size_str, hardware_param)
+    if run_stats is None: return None
+    return run_stats["max_end_time"]
+
+# Print the most occupied links of a run and the queue occupancy per link role of its topology, if the run logged
+# its port queue states (enable_log_port_queue_state in setup.json)
+def reportLinkHotspots(run_directory, topology, job_completion_time):
+    link_stats = link_analysis.analyzeRunLinks(run_directory, topology, job_completion_time)
+    if link_stats is None: return
+    print("[ANALYSIS] Hotspot links of {}:".format(run_directory))
+    pprint.pprint(link_stats["hotspots"])
+    print("[ANALYSIS] Queue occupancy per link role:")
+    pprint.pprint(link_stats["roles"])
 
 # Generate the traffic heatmaps compared in this work for a given topology size of 64 endhosts.
 def generateTrafficHeatMap(collective_type):
@@ -77,10 +112,10 @@ def generateTrafficHeatMap(collective_type):
                         "inter_group_message_size":100e6,
                         "r": 8, 
                         "l": 1})
-    ring_allreduce_traffic = ring_allreduce_traffic_generator.RingAllReduceTrafficGenerator(p=64, num_server_per_job=64)
-    hierarchical_allreduce_traffic = hierarchical_allreduce_traffic_generator.HierarchicalAllReduceTrafficGenerator(p=64, k=8, num_server_per_job=64)
-    sipco_allreduce_traffic = sipco_allreduce_traffic_generator.SiPCOAllReduceTrafficGenerator(r=8, l=1, num_server_per_job=64)
-    hybrid_parallel_traffic = hybrid_parallel_traffic_generator.HybridParallelTrafficGenerator(p=64, num_mp_nodes=8, model_info=model_info)
+    ring_allreduce_traffic = traffic_registry.createTrafficGenerator("ring_allreduce", p=64, num_server_per_job=64)
+    hierarchical_allreduce_traffic = traffic_registry.createTrafficGenerator("hierarchical_allreduce", p=64, k=8, num_server_per_job=64)
+    sipco_allreduce_traffic = traffic_registry.createTrafficGenerator("sipco_allreduce", r=8, l=1, num_server_per_job=64)
+    hybrid_parallel_traffic = traffic_registry.createTrafficGenerator("hybrid_parallel", p=64, num_mp_nodes=8, model_info=model_info)
     traffics = {
                 "ring_allreduce": ring_allreduce_traffic,
                 "hierarchical_allreduce": hierarchical_allreduce_traffic,
@@ -88,8 +123,8 @@ def generateTrafficHeatMap(collective_type):
                 "hybrid": hybrid_parallel_traffic,
                 }
     for name, traffic in traffics.items():
-        if traffic == "hybrid": events = traffic.plan_arrivals(0)
-        else: events = traffic.plan_arrivals(100e6)
+        if name == "hybrid": events = TRAFFIC_CACHE.getArrivals(traffic, 0)
+        else: events = TRAFFIC_CACHE.getArrivals(traffic, 100e6)
         tm = traffic.generateProbabilityMatrix(events, 64)
         file_name = RESULT_DIRECTORY + "{}_heatmap.png".format(name)
         traffic.drawHeatmap(tm, file_name)
@@ -116,10 +151,10 @@ def analyzeSyntheticTraffic(collective_type):
         for topology in topology_list:
             hardware_param = deriveNetworkHardwareParameterName(routing_scheme, topology.getLinkBW())
             file_dir = "{}{}/{}/{}/{}/".format(RESULT_DIRECTORY,traffic_name,topology.getName(), message_size_str, hardware_param)
-            if os.path.isdir(file_dir):
-                flow_completion_file = file_dir + "/flow_completion.csv.log"
-                job_completion_time = utils.extract_max_fct_from_file(flow_completion_file)
+            job_completion_time = findJobCompletionTime(traffic_name, topology.getName(), message_size_str, hardware_param)
+            if job_completion_time is not None:
                 job_stats[topology.getTopologyName()].append(job_completion_time)
+                reportLinkHotspots(file_dir, topology, job_completion_time)
             else:
                 print("[Error] File doesn't exist: ", file_dir)
     print(job_stats)
@@ -143,15 +178,13 @@ def analyzeMessageSize(collective_type):
     job_stats = defaultdict(list)
     for traffic_name in traffic_names:
         for topology in topology_list:
-            if traffic_name.startswith("sipco") and topology.getName().startswith("Bcube"): continue
-            if traffic_name.startswith("mesh") and topology.getName().startswith("Bcube"): continue
+            if topology_registry.findTopologyKind(topology) == "bcube" and traffic_name.startswith(("sipco", "mesh")): continue
             hardware_param = deriveNetworkHardwareParameterName(routing_scheme, topology.getLinkBW())
             for message_size in message_sizes:
                 message_size_str = utils.extract_byte_string(message_size)
                 file_dir = "{}{}/{}/{}/{}/".format(RESULT_DIRECTORY,traffic_name,topology.getName(), message_size_str, hardware_param)
-                flow_completion_file = file_dir + "flow_completion.csv.log"
-                if os.path.isfile(flow_completion_file):
-                    job_completion_time = utils.extract_max_fct_from_file(flow_completion_file)
+                job_completion_time = findJobCompletionTime(traffic_name, topology.getName(), message_size_str, hardware_param)
+                if job_completion_time is not None:
                     combo_name = traffic_name[0].upper() + "_" +  topology.getTopologyName()
                     job_stats[combo_name].append(job_completion_time)
                 else:
@@ -181,9 +214,8 @@ def analyzeTopologySize(collective_type):
             for traffic_name in traffic_names:
                 hardware_param = deriveNetworkHardwareParameterName(routing_scheme, topology.getLinkBW())
                 file_dir = "{}{}/{}/{}/{}".format(RESULT_DIRECTORY,traffic_name,topology.getName(),message_size_str,hardware_param)
-                if os.path.isdir(file_dir):
-                    flow_completion_file = file_dir + "/flow_completion.csv.log"
-                    job_completion_time = utils.extract_max_fct_from_file(flow_completion_file)
+                job_completion_time = findJobCompletionTime(traffic_name, topology.getName(), message_size_str, hardware_param)
+                if job_completion_time is not None:
                     if num_node == 16 and topology.getName().startswith("sipac") and traffic_name == "sipco_allreduce": 
                         job_completion_time -= 1000000 # reduce tcp resend time that shouldn't be accounted for
                     combo_name = topology.getTopologyName()
@@ -209,25 +241,17 @@ def analyzeHybridParallel(collective_type):
     num_nodes = 64
     num_mp_node = 8
     l = 2 if num_nodes == 512 else 1
-    r = math.ceil(float(num_nodes) ** (1/(float(l)+1)))
-    torus_dim = {16: [4,4], 64: [8,8], 256: [16,16], 512: [32,16], 1024: [32,32]}
-    intra_topo_to_algo_map = {"dgx_superpod_{}nodes".format(num_nodes): "mesh", 
-                                "2D_torus_{}_{}_{}nodes".format(torus_dim[num_nodes][0],torus_dim[num_nodes][1], num_nodes): "mesh", 
-                                "BCube_{}r_{}l".format(r,l): "mesh",
-                                "sipac_{}r_{}l".format(r,l): "sipco"}
-    
-    inter_topo_to_algo_map = {"dgx_superpod_{}nodes".format(num_nodes): "ring", 
-                                "2D_torus_{}_{}_{}nodes".format(torus_dim[num_nodes][0],torus_dim[num_nodes][1], num_nodes): "ring", 
-                                "BCube_{}r_{}l".format(r,l): "ring",
-                                "sipac_{}r_{}l".format(r,l): "sipco"}
+    intra_topo_to_algo_map = {"dgx_superpod": "mesh", "torus": "mesh", "bcube": "mesh", "sipac": "sipco"}
+    inter_topo_to_algo_map = {"dgx_superpod": "ring", "torus": "ring", "bcube": "ring", "sipac": "sipco"}
     routing_scheme = "ecmp"
     job_stats = defaultdict(list)
     for traffic_name in traffic_names:
         for per_cu_bw_gbps in per_cu_bw_gbps_list:
             topology_list = generateTopology(num_nodes, per_cu_bw_gbps, l=l)
             for topology in topology_list:
-                model_info["intra_group_algo_type"] = intra_topo_to_algo_map[topology.getName()]
-                model_info["inter_group_algo_type"] = inter_topo_to_algo_map[topology.getName()]
+                topology_kind = topology_registry.findTopologyKind(topology)
+                model_info["intra_group_algo_type"] = intra_topo_to_algo_map[topology_kind]
+                model_info["inter_group_algo_type"] = inter_topo_to_algo_map[topology_kind]
                 message_size_str = "mp{}_{}_alltoall_{}_{}_allreduce_{}".format(
                     num_mp_node,
                     model_info["intra_group_algo_type"],
@@ -236,9 +260,8 @@ def analyzeHybridParallel(collective_type):
                     utils.extract_byte_string(model_info["inter_group_message_size"]))
                 hardware_param = deriveNetworkHardwareParameterName(routing_scheme, topology.getLinkBW())
                 file_dir = "{}{}/{}/{}/{}/".format(RESULT_DIRECTORY,traffic_name,topology.getName(), message_size_str, hardware_param)
-                if os.path.isdir(file_dir):
-                    flow_completion_file = file_dir + "/flow_completion.csv.log"
-                    job_completion_time = utils.extract_max_fct_from_file(flow_completion_file)
+                job_completion_time = findJobCompletionTime(traffic_name, topology.getName(), message_size_str, hardware_param)
+                if job_completion_time is not None:
                     job_stats[topology.getTopologyName()].append(job_completion_time)
                 else:
                     print("[Error] File doesn't exist: ", file_dir)
@@ -256,20 +279,24 @@ def analyzeHybridParallel(collective_type):
 def main():
     print("[ANALYSIS] Starting analysis ...")
     try:
-        opts, args = getopt.getopt(sys.argv[1:],"he:c:",["exp=", "collective="])
+        opts, args = getopt.getopt(sys.argv[1:],"he:c:j:",["exp=", "collective=", "jobs="])
     except getopt.GetoptError:
-        print('python3 analysis.py -e <experiment> -c <collective_type>')
+        print('python3 analysis.py -e <experiment> -c <collective_type> [-j <num_jobs>]')
         sys.exit(2)
     exp_type = ""
     collective_type = ""
+    global NUM_INGESTION_JOBS
     for opt, arg in opts:
         if opt == '-h':
-            print('python3 analysis.py -e <experiment> -c <collective_type>')
+            print('python3 analysis.py -e <experiment> -c <collective_type> [-j <num_jobs>]')
             sys.exit()
         elif opt in ("-e", "--exp"):
             exp_type = arg
         elif opt in ("-c", "--collective"):
             collective_type = arg
+        elif opt in ("-j", "--jobs"):
+            NUM_INGESTION_JOBS = int(arg)
+    setupAnalysis()
     if exp_type == "basic":
         analyzeSyntheticTraffic(collective_type)
     elif exp_type == "message_size":
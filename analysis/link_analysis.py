@@ -0,0 +1,216 @@
+'''
+Streaming analysis of the Netbench port queue state and throughput logs (enable_log_port_queue_state,
+enable_log_flow_throughput and enable_log_sending_throughput in setup.json).
+
+The logs are read in blocks and reduced to per-link (or per-node) time series downsampled to fixed-width
+bins, so that their memory footprint only depends on the number of links and bins, not on the log size.
+'''
+
+import os
+import numpy as np
+import utilities as utils
+
+# Netbench port queue state log: own id, target id, queue length (packets), buffer occupancy (bits), time (ns),
+# one line each time the output queue of the port own id -> target id changes
+PORT_QUEUE_STATE_LOG_FILENAME = "port_queue_length.csv.log"
+PORT_QUEUE_STATE_COLUMNS = (0, 1, 3, 4)
+# Netbench flow throughput log: flow id, source id, target id, amount (bits), start time (ns), end time (ns)
+FLOW_THROUGHPUT_LOG_FILENAME = "flow_throughput.csv.log"
+FLOW_THROUGHPUT_COLUMNS = (1, 4, 5, 3)
+# Netbench sending throughput log: own id, target id, amount (bits), start time (ns), end time (ns)
+SENDING_THROUGHPUT_LOG_FILENAME = "sending_throughput.csv.log"
+SENDING_THROUGHPUT_COLUMNS = (0, 1, 3, 4, 2)
+# Number of bins of the time series of a run, unless a bin width is given
+DEFAULT_NUM_BINS = 100
+
+# Packs the (own id, target id) pairs of directed links into single integer keys, and back
+def packLinkKeys(src, dst):
+    return (np.asarray(src, dtype=np.int64) << 32) | np.asarray(dst, dtype=np.int64)
+
+def unpackLinkKeys(keys):
+    return np.stack((keys >> 32, keys & 0xffffffff), axis=-1)
+
+# Time series of a set of keyed quantities (e.g. links) integrated over bins of "bin_width_ns". A quantity is described
+# by its steps (e.g. a queue occupancy changing to a new value) and point amounts (e.g. bits sent at a given time).
+# The integral of bin b sums, over the steps at t <= bin end, delta * (time spent in b after t), which is accumulated
+# one block at a time as width * cumsum(steps) - offsets, with the steps and the offsets (delta * (t - bin start))
+# binned where they happen.
+class BinnedTimeSeries(object):
+    def __init__(self, bin_width_ns):
+        self.bin_width = float(bin_width_ns)
+        self.row_of_key = {}
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.steps = np.zeros((0, 0))
+        self.offsets = np.zeros((0, 0))
+        self.peaks = np.full((0, 0), -np.inf)
+        self.is_set_at_start = np.zeros((0, 0), dtype=bool)
+        self.num_bins = 0
+
+    # Returns the rows of "keys", adding the new ones
+    def getRows(self, keys):
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        unique_rows = np.array([self.row_of_key.setdefault(int(key), len(self.row_of_key)) for key in unique_keys], dtype=np.int64)
+        if len(self.row_of_key) > len(self.keys):
+            self.keys = np.concatenate((self.keys, unique_keys[unique_rows >= len(self.keys)][np.argsort(unique_rows[unique_rows >= len(self.keys)])]))
+        return unique_rows[inverse]
+
+    # Grow the arrays (doubling) to hold all the rows and the bins up to "max_bin"
+    def reserve(self, max_bin):
+        self.num_bins = max(self.num_bins, max_bin + 1)
+        num_rows, num_columns = self.steps.shape
+        if len(self.keys) <= num_rows and self.num_bins <= num_columns: return
+        new_num_rows = max(len(self.keys), 2 * num_rows) if len(self.keys) > num_rows else num_rows
+        new_num_columns = max(self.num_bins, 2 * num_columns) if self.num_bins > num_columns else num_columns
+        padding = ((0, new_num_rows - num_rows), (0, new_num_columns - num_columns))
+        self.steps = np.pad(self.steps, padding)
+        self.offsets = np.pad(self.offsets, padding)
+        self.peaks = np.pad(self.peaks, padding, constant_values=-np.inf)
+        self.is_set_at_start = np.pad(self.is_set_at_start, padding)
+
+    def getBins(self, times):
+        return np.maximum(0, np.floor_divide(times, self.bin_width).astype(np.int64))
+
+    # Sum "weights" into the cells (rows, bins) of "array"
+    def accumulate(self, array, rows, bins, weights):
+        cells = rows * array.shape[1] + bins
+        array += np.bincount(cells, weights, minlength=array.size).reshape(array.shape)
+
+    # Add the steps of size "deltas" at "times" to the quantities of "rows", tracking the peak of the new "values" if given
+    def addSteps(self, rows, times, deltas, values=None):
+        if len(rows) == 0: return
+        bins = self.getBins(times)
+        self.reserve(int(bins.max()))
+        self.accumulate(self.steps, rows, bins, deltas)
+        self.accumulate(self.offsets, rows, bins, deltas * (times - bins * self.bin_width))
+        if values is not None:
+            cells = rows * self.peaks.shape[1] + bins
+            self.is_set_at_start.reshape(-1)[cells[times == bins * self.bin_width]] = True
+            order = np.argsort(cells, kind="stable")
+            unique_cells, starts = np.unique(cells[order], return_index=True)
+            peaks = self.peaks.reshape(-1)
+            peaks[unique_cells] = np.maximum(peaks[unique_cells], np.maximum.reduceat(values[order], starts))
+
+    # Add the point "amounts" at "times" to the integrals of the quantities of "rows"
+    def addAmounts(self, rows, times, amounts):
+        if len(rows) == 0: return
+        bins = self.getBins(times)
+        self.reserve(int(bins.max()))
+        self.accumulate(self.offsets, rows, bins, -amounts)
+
+    # Spread "amounts" uniformly over the intervals [start_times, end_times) of the quantities of "rows"
+    def addIntervals(self, rows, start_times, end_times, amounts):
+        durations = end_times - start_times
+        is_point = durations <= 0
+        self.addAmounts(rows[is_point], start_times[is_point], amounts[is_point])
+        rates = amounts[~is_point] / durations[~is_point]
+        self.addSteps(rows[~is_point], start_times[~is_point], rates)
+        self.addSteps(rows[~is_point], end_times[~is_point], -rates)
+
+    def getKeys(self):
+        return self.keys
+
+    # Integral of each quantity (rows ordered as getKeys()) over each bin
+    def getIntegrals(self):
+        num_rows, num_bins = len(self.keys), self.num_bins
+        return self.bin_width * np.cumsum(self.steps[:num_rows, :num_bins], axis=1) - self.offsets[:num_rows, :num_bins]
+
+    # Time-weighted mean of each (step) quantity over each bin
+    def getMeans(self):
+        return self.getIntegrals() / self.bin_width
+
+    # Peak of each (step) quantity over each bin: the highest value set within the bin, or the value carried over from
+    # the previous bin unless it is replaced right at the start of the bin
+    def getPeaks(self):
+        num_rows, num_bins = len(self.keys), self.num_bins
+        start_values = np.cumsum(self.steps[:num_rows, :num_bins], axis=1) - self.steps[:num_rows, :num_bins]
+        start_values[self.is_set_at_start[:num_rows, :num_bins]] = -np.inf
+        return np.maximum(start_values, self.peaks[:num_rows, :num_bins])
+
+# Stream a port queue state log into the time series of the buffer occupancy (bytes) of each directed link
+def analyzePortQueueLog(log_filename, bin_width_ns):
+    print("[ANALYSIS] Reading {}".format(log_filename))
+    series = BinnedTimeSeries(bin_width_ns)
+    last_values = np.zeros(0)
+    for block in utils.read_log_blocks(log_filename):
+        src, dst, occupied_bits, times = utils.parse_fct_block(block, PORT_QUEUE_STATE_COLUMNS)
+        rows = series.getRows(packLinkKeys(src, dst))
+        values = occupied_bits / 8
+        last_values = np.concatenate((last_values, np.zeros(len(series.getKeys()) - len(last_values))))
+        # the lines of a link are in time order: each value steps from the previous one of the link
+        order = np.argsort(rows, kind="stable")
+        sorted_rows, sorted_values = rows[order], values[order]
+        is_first = np.concatenate(([True], sorted_rows[1:] != sorted_rows[:-1])) if len(rows) else np.zeros(0, dtype=bool)
+        previous_values = np.concatenate(([0.], sorted_values[:-1])) if len(rows) else np.zeros(0)
+        previous_values[is_first] = last_values[sorted_rows[is_first]]
+        series.addSteps(sorted_rows, times[order], sorted_values - previous_values, sorted_values)
+        is_last = np.concatenate((sorted_rows[1:] != sorted_rows[:-1], [True])) if len(rows) else np.zeros(0, dtype=bool)
+        last_values[sorted_rows[is_last]] = sorted_values[is_last]
+    return series
+
+# Stream a sending throughput log into the time series of the bits sent by each directed link
+def analyzeSendingThroughputLog(log_filename, bin_width_ns):
+    print("[ANALYSIS] Reading {}".format(log_filename))
+    series = BinnedTimeSeries(bin_width_ns)
+    for block in utils.read_log_blocks(log_filename):
+        src, dst, start_times, end_times, amounts = utils.parse_fct_block(block, SENDING_THROUGHPUT_COLUMNS)
+        series.addIntervals(series.getRows(packLinkKeys(src, dst)), start_times, end_times, amounts)
+    return series
+
+# Stream a flow throughput log into the time series of the bits injected by each source node
+def analyzeFlowThroughputLog(log_filename, bin_width_ns):
+    print("[ANALYSIS] Reading {}".format(log_filename))
+    series = BinnedTimeSeries(bin_width_ns)
+    for block in utils.read_log_blocks(log_filename):
+        src, start_times, end_times, amounts = utils.parse_fct_block(block, FLOW_THROUGHPUT_COLUMNS)
+        series.addIntervals(series.getRows(src.astype(np.int64)), start_times, end_times, amounts)
+    return series
+
+# Rank the links of a queue occupancy (and, optionally, sending throughput) time series by their mean occupancy over
+# the run, labeled with their role in "topology" (see NetworkTopology.getLinkRoles()). Returns the "top" hotspots as
+# dictionaries, from the most to the least occupied.
+def rankHotspotLinks(queue_series, topology, top=10, throughput_series=None, link_bandwidth_gbps=None):
+    links = unpackLinkKeys(queue_series.getKeys())
+    mean_occupancy = queue_series.getMeans().mean(axis=1) if queue_series.num_bins else np.zeros(len(links))
+    peak_occupancy = queue_series.getPeaks().max(axis=1) if queue_series.num_bins else np.zeros(len(links))
+    roles = topology.getLinkRoles(links[:, 0], links[:, 1]) if len(links) else np.zeros(0, dtype=str)
+    utilization = {}
+    if throughput_series is not None and link_bandwidth_gbps and throughput_series.num_bins:
+        bits = throughput_series.getIntegrals().sum(axis=1)
+        duration = throughput_series.num_bins * throughput_series.bin_width
+        utilization = dict(zip(throughput_series.getKeys().tolist(), bits / (duration * link_bandwidth_gbps)))
+    hotspots = []
+    for index in np.argsort(-mean_occupancy, kind="stable")[:top]:
+        hotspots.append({"link": (int(links[index, 0]), int(links[index, 1])),
+                         "role": str(roles[index]),
+                         "mean_occupancy_bytes": float(mean_occupancy[index]),
+                         "peak_occupancy_bytes": float(peak_occupancy[index]),
+                         "utilization": float(utilization[int(queue_series.getKeys()[index])]) if int(queue_series.getKeys()[index]) in utilization else None})
+    return hotspots
+
+# Aggregate the queue occupancy of the links per topology role: {role: {num_links, mean/peak occupancy (bytes)}}
+def summarizeOccupancyByRole(queue_series, topology):
+    links = unpackLinkKeys(queue_series.getKeys())
+    if len(links) == 0 or queue_series.num_bins == 0: return {}
+    roles = topology.getLinkRoles(links[:, 0], links[:, 1])
+    mean_occupancy, peak_occupancy = queue_series.getMeans().mean(axis=1), queue_series.getPeaks().max(axis=1)
+    summary = {}
+    for role in np.unique(roles):
+        is_role = roles == role
+        summary[str(role)] = {"num_links": int(np.count_nonzero(is_role)),
+                              "mean_occupancy_bytes": float(mean_occupancy[is_role].mean()),
+                              "peak_occupancy_bytes": float(peak_occupancy[is_role].max())}
+    return summary
+
+# Analyze the port queue (and sending throughput) logs of a run folder, if they were enabled. The time series are binned
+# into DEFAULT_NUM_BINS over the job completion time unless "bin_width_ns" is given. Returns the hotspot ranking and the
+# per role summary, or None if the run has no port queue state log.
+def analyzeRunLinks(run_directory, topology, job_completion_time=None, bin_width_ns=None, top=10):
+    queue_log_filename = os.path.join(run_directory, PORT_QUEUE_STATE_LOG_FILENAME)
+    if not os.path.isfile(queue_log_filename): return None
+    if bin_width_ns is None:
+        bin_width_ns = max(1., float(job_completion_time) / DEFAULT_NUM_BINS) if job_completion_time else 1000.
+    queue_series = analyzePortQueueLog(queue_log_filename, bin_width_ns)
+    throughput_log_filename = os.path.join(run_directory, SENDING_THROUGHPUT_LOG_FILENAME)
+    throughput_series = analyzeSendingThroughputLog(throughput_log_filename, bin_width_ns) if os.path.isfile(throughput_log_filename) else None
+    return {"hotspots": rankHotspotLinks(queue_series, topology, top, throughput_series, topology.getLinkBW()),
+            "roles": summarizeOccupancyByRole(queue_series, topology)}
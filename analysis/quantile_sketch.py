@@ -0,0 +1,115 @@
+'''
+Mergeable streaming quantile sketch (KLL) of the flow completion statistics.
+'''
+
+import io
+import numpy as np
+
+# Ratio between the capacities of two consecutive levels of the sketch
+CAPACITY_DECAY = 2 / 3
+
+# KLL quantile sketch: the values are held in compactors of increasing weight (level h items weigh 2^h). When the sketch
+# exceeds its capacity, the items of a level are sorted and every other one (random offset) is promoted to the next
+# level. The memory is bounded by ~3k items whatever the number of values, for a rank error in O(1/k) (below 0.1% with
+# the default k). Values are added one block at a time (e.g. a block of a flow completion log) and sketches of different
+# runs or seeds can be merged. Percentiles are exact until the first compaction.
+class QuantileSketch(object):
+    def __init__(self, k=512, seed=0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.compactors = [np.zeros(0)]
+        self.count = 0
+        self.total = 0.
+        self.min_value = float('inf')
+        self.max_value = -float('inf')
+
+    def getCount(self):
+        return self.count
+
+    def getMean(self):
+        return self.total / self.count if self.count else float('nan')
+
+    def getMin(self):
+        return self.min_value if self.count else float('nan')
+
+    def getMax(self):
+        return self.max_value if self.count else float('nan')
+
+    def getNumRetainedItems(self):
+        return sum(len(items) for items in self.compactors)
+
+    # Capacity of a level: the top level holds k items, the ones below hold geometrically less
+    def getCapacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, int(np.ceil(self.k * CAPACITY_DECAY ** depth)))
+
+    # Add a block of values (NaNs are ignored)
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0: return
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.min_value = min(self.min_value, float(values.min()))
+        self.max_value = max(self.max_value, float(values.max()))
+        self.compactors[0] = np.concatenate((self.compactors[0], values))
+        self.compress()
+
+    # Merge the values summarized by another sketch into this one
+    def merge(self, other):
+        if other.count == 0: return
+        while len(self.compactors) < len(other.compactors): self.compactors.append(np.zeros(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate((self.compactors[level], items))
+        self.count += other.count
+        self.total += other.total
+        self.min_value = min(self.min_value, other.min_value)
+        self.max_value = max(self.max_value, other.max_value)
+        self.compress()
+
+    # While the sketch holds more items than its overall capacity, compact the lowest level exceeding its own capacity
+    def compress(self):
+        while self.getNumRetainedItems() > sum(self.getCapacity(level) for level in range(len(self.compactors))):
+            level = next(level for level in range(len(self.compactors)) if len(self.compactors[level]) > self.getCapacity(level))
+            if level + 1 == len(self.compactors): self.compactors.append(np.zeros(0))
+            items = np.sort(self.compactors[level])
+            # an odd item out stays at this level
+            num_compacted = len(items) - len(items) % 2
+            self.compactors[level] = items[num_compacted:]
+            self.compactors[level + 1] = np.concatenate((self.compactors[level + 1], items[int(self.rng.integers(2)):num_compacted:2]))
+
+    # Percentiles "qs" (in [0, 100]) of the values, taking the nearest retained item (as np.percentile with 'nearest'
+    # interpolation, which they match exactly as long as no compaction took place)
+    def getPercentiles(self, qs):
+        qs = np.atleast_1d(np.asarray(qs, dtype=np.float64))
+        if self.count == 0: return np.full(len(qs), float('nan'))
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([np.full(len(items), 2 ** level, dtype=np.int64) for level, items in enumerate(self.compactors)])
+        order = np.argsort(items, kind="stable")
+        items, cumulative_weights = items[order], np.cumsum(weights[order])
+        ranks = np.around((cumulative_weights[-1] - 1) * qs / 100)
+        indices = np.minimum(np.searchsorted(cumulative_weights, ranks, side="right"), len(items) - 1)
+        percentiles = items[indices]
+        # the extremes are tracked exactly
+        percentiles[qs <= 0] = self.min_value
+        percentiles[qs >= 100] = self.max_value
+        return percentiles
+
+    def getPercentile(self, q):
+        return float(self.getPercentiles([q])[0])
+
+    # Serialize the sketch (e.g. to store it in the results index)
+    def toBytes(self):
+        buffer = io.BytesIO()
+        np.savez(buffer, items=np.concatenate(self.compactors), level_sizes=np.array([len(items) for items in self.compactors]),
+                 header=np.array([self.k, self.count, self.total, self.min_value, self.max_value], dtype=np.float64))
+        return buffer.getvalue()
+
+    @staticmethod
+    def fromBytes(data, seed=0):
+        with np.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            k, count, total, min_value, max_value = arrays["header"]
+            sketch = QuantileSketch(int(k), seed)
+            sketch.compactors = np.split(arrays["items"], np.cumsum(arrays["level_sizes"])[:-1])
+        sketch.count, sketch.total, sketch.min_value, sketch.max_value = int(count), float(total), float(min_value), float(max_value)
+        return sketch
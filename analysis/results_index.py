@@ -0,0 +1,122 @@
+'''
+Index of the parsed results of the Netbench simulations.
+'''
+
+import os, re, glob, sqlite3
+from concurrent.futures import ProcessPoolExecutor
+import utilities as utils
+import quantile_sketch
+
+# Name of the flow completion log written by Netbench in the run folder
+FCT_LOG_FILENAME = "flow_completion.csv.log"
+# Columns identifying a run, i.e., its folder under the result directory
+RUN_KEY_COLUMNS = ["traffic", "topology", "message_size", "hardware_param"]
+# Statistics of a run stored in the index, as returned by utils.extract_fct_stats_from_file()
+RUN_STAT_COLUMNS = ["max_end_time"] + \
+                   ["mean_fct"] + [utils.derive_percentile_stat_name(q, "fct") for q in utils.FCT_PERCENTILES] + \
+                   ["mean_slowdown"] + [utils.derive_percentile_stat_name(q, "slowdown") for q in utils.FCT_PERCENTILES] + \
+                   ["num_flows", "num_completed_flows", "num_incomplete_flows"]
+# Quantile sketches of a run stored in the index (serialized), to merge the distributions of several runs
+RUN_SKETCH_COLUMNS = ["fct_sketch", "slowdown_sketch"]
+INDEX_COLUMNS = RUN_KEY_COLUMNS + ["fct_log_mtime_ns", "fct_log_size"] + RUN_STAT_COLUMNS + RUN_SKETCH_COLUMNS
+
+# Returns the link bandwidth (Gbps) and latency (ns) encoded in a hardware parameter name (e.g.
+# "simple_dctcp_oq100t50kb_100g_500ns_ecmp"), or (None, 0) if they are missing
+def deriveLinkParameters(hardware_param):
+    match = re.search(r"_([0-9.]+)g_([0-9]+)ns_", hardware_param)
+    if match is None: return None, 0
+    return float(match.group(1)), int(match.group(2))
+
+# Parse a flow completion log with the link parameters of its run (process pool entry point)
+def parseRunLog(run_key, fct_filename):
+    link_bandwidth_gbps, link_latency_ns = deriveLinkParameters(run_key[3])
+    return utils.extract_fct_stats_from_file(fct_filename, link_bandwidth_gbps, link_latency_ns)
+
+# SQLite index of the per-run statistics found under the result directory, whose run folders are laid out as
+# <traffic>/<topology>/<message size>/<hardware parameter>/ by generate_experiment.py. Each run records the
+# mtime and size of its flow completion log, so that a scan only parses the new or changed logs.
+class ResultsIndex(object):
+    def __init__(self, index_filename, result_directory):
+        self.index_filename = index_filename
+        self.result_directory = result_directory
+        os.makedirs(os.path.dirname(os.path.abspath(index_filename)), exist_ok=True)
+        self.connection = sqlite3.connect(index_filename)
+        # an index written with other statistics is rebuilt from the logs
+        if [row[1] for row in self.connection.execute("PRAGMA table_info(runs)")] not in ([], INDEX_COLUMNS):
+            self.connection.execute("DROP TABLE runs")
+        column_types = ["TEXT"] * len(RUN_KEY_COLUMNS) + ["INTEGER", "INTEGER"] + \
+                       ["INTEGER" if column.startswith("num_") else "REAL" for column in RUN_STAT_COLUMNS] + ["BLOB"] * len(RUN_SKETCH_COLUMNS)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS runs ({}, PRIMARY KEY ({}))".format(
+                                ", ".join("{} {}".format(column, column_type) for column, column_type in zip(INDEX_COLUMNS, column_types)), ", ".join(RUN_KEY_COLUMNS)))
+        self.connection.commit()
+
+    # Returns the {run key: flow completion log filename} of all the runs found under the result directory
+    def findRunLogs(self):
+        run_logs = {}
+        for fct_filename in glob.glob(os.path.join(self.result_directory, "*", "*", "*", "*", FCT_LOG_FILENAME)):
+            run_key = tuple(os.path.relpath(os.path.dirname(fct_filename), self.result_directory).split(os.sep))
+            run_logs[run_key] = fct_filename
+        return run_logs
+
+    # Returns the {run key: (mtime_ns, size)} of the logs recorded in the index
+    def getRecordedLogs(self):
+        cursor = self.connection.execute("SELECT traffic, topology, message_size, hardware_param, fct_log_mtime_ns, fct_log_size FROM runs")
+        return {tuple(row[:4]): tuple(row[4:]) for row in cursor}
+
+    # Returns the {run key: flow completion log filename} of the runs whose logs are new or changed since the last scan,
+    # and removes the runs whose logs disappeared from the index.
+    def findStaleRunLogs(self):
+        run_logs = self.findRunLogs()
+        recorded_logs = self.getRecordedLogs()
+        stale_run_logs = {}
+        for run_key, fct_filename in run_logs.items():
+            st = os.stat(fct_filename)
+            if recorded_logs.get(run_key) != (st.st_mtime_ns, st.st_size): stale_run_logs[run_key] = fct_filename
+        removed_run_keys = [run_key for run_key in recorded_logs if run_key not in run_logs]
+        self.connection.executemany("DELETE FROM runs WHERE traffic=? AND topology=? AND message_size=? AND hardware_param=?", removed_run_keys)
+        self.connection.commit()
+        return stale_run_logs
+
+    # Record the statistics and sketches of a run, along with the mtime and size of the log they were parsed from
+    def recordRun(self, run_key, fct_filename, run_stats):
+        st = os.stat(fct_filename)
+        self.connection.execute("INSERT OR REPLACE INTO runs VALUES ({})".format(",".join("?" * len(INDEX_COLUMNS))),
+                                tuple(run_key) + (st.st_mtime_ns, st.st_size) + tuple(run_stats[column] for column in RUN_STAT_COLUMNS) +
+                                tuple(run_stats[column].toBytes() for column in RUN_SKETCH_COLUMNS))
+
+    # Update the index with the runs whose logs are new or changed. With jobs > 1, the logs are parsed on a process pool
+    # (largest first, to balance the load), while the index is only written by this process. Returns the number of parsed logs.
+    def scan(self, jobs=1):
+        stale_run_logs = self.findStaleRunLogs()
+        run_keys = sorted(stale_run_logs, key=lambda run_key: (-os.path.getsize(stale_run_logs[run_key]), run_key))
+        fct_filenames = [stale_run_logs[run_key] for run_key in run_keys]
+        if jobs > 1 and len(fct_filenames) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(fct_filenames))) as executor:
+                for run_key, fct_filename, run_stats in zip(run_keys, fct_filenames, executor.map(parseRunLog, run_keys, fct_filenames)):
+                    self.recordRun(run_key, fct_filename, run_stats)
+        else:
+            for run_key, fct_filename in zip(run_keys, fct_filenames):
+                self.recordRun(run_key, fct_filename, parseRunLog(run_key, fct_filename))
+        self.connection.commit()
+        print("[ANALYSIS] Results index: parsed {} new or changed flow completion logs".format(len(stale_run_logs)))
+        return len(stale_run_logs)
+
+    # Returns the statistics (dictionary of RUN_STAT_COLUMNS) of a run, or None if the run has no flow completion log
+    def getRunStats(self, traffic, topology, message_size, hardware_param):
+        cursor = self.connection.execute("SELECT {} FROM runs WHERE traffic=? AND topology=? AND message_size=? AND hardware_param=?".format(", ".join(RUN_STAT_COLUMNS)),
+                                         (traffic, topology, message_size, hardware_param))
+        row = cursor.fetchone()
+        if row is None: return None
+        return dict(zip(RUN_STAT_COLUMNS, row))
+
+    # Returns the quantile sketch ("fct_sketch" or "slowdown_sketch") merged over the runs matching the given run key
+    # columns (e.g. all the hardware parameters or seeds of a traffic and topology), or None if no run matches
+    def getMergedSketch(self, sketch_column, **run_key):
+        assert sketch_column in RUN_SKETCH_COLUMNS and all(column in RUN_KEY_COLUMNS for column in run_key)
+        conditions = " AND ".join("{}=?".format(column) for column in run_key) or "1"
+        merged_sketch = None
+        for (data,) in self.connection.execute("SELECT {} FROM runs WHERE {}".format(sketch_column, conditions), tuple(run_key.values())):
+            sketch = quantile_sketch.QuantileSketch.fromBytes(data)
+            if merged_sketch is None: merged_sketch = sketch
+            else: merged_sketch.merge(sketch)
+        return merged_sketch
@@ -1,6 +1,6 @@
 import json
 import numpy as np
-import matplotlib.pyplot as plt
+import quantile_sketch
 
 ## Given a long representing the nanoseconds, returns a string of the time.
 def extract_timing_string(nanoseconds):
@@ -41,15 +41,137 @@ def parseJSON(filename):
         file = json.load(json_file)
     return file
 
+# Netbench flow completion log columns: flow size, flow end time and flow completion time (FCT, i.e., duration)
+FCT_SIZE_COLUMN = 4
+FCT_END_TIME_COLUMN = 6
+FCT_DURATION_COLUMN = 7
+# Percentiles of the FCT and slowdown reported for each run
+FCT_PERCENTILES = [50, 90, 99, 99.9]
+# Size of the blocks in which flow completion logs are read
+FCT_CHUNK_SIZE = 1 << 23
+
+# Parse the (possibly negative) integers of the fields spanning [starts, ends) of the byte array "buffer", one digit
+# position at a time from the right. Returns None if a field is not an integer (e.g. a float).
+def parse_integer_fields(buffer, starts, ends):
+    values = np.zeros(len(starts), dtype=np.int64)
+    if len(starts) == 0: return values
+    lengths = ends - starts
+    negative = buffer[starts] == ord("-")
+    num_digits = lengths - negative
+    if np.any(num_digits <= 0) or num_digits.max() > 18: return None
+    weight = np.int64(1)
+    for offset in range(int(num_digits.max())):
+        # positions past the start of a field hold another character (masked out) of the buffer
+        digits = buffer[ends - 1 - offset] - np.uint8(ord("0"))
+        digits[offset >= num_digits] = 0
+        if digits.max() > 9: return None # (unsigned) characters other than digits
+        values += digits * weight
+        weight *= 10
+    values[negative] *= -1
+    return values
+
+# Parse the "columns" of the complete lines of a block of a flow completion log (slow path, per line)
+def parse_fct_lines(block, columns):
+    rows = [line.split(b",") for line in block.splitlines() if line.strip()]
+    return [np.array([float(row[column]) for row in rows], dtype=np.float64) for column in columns]
+
+# Parse the "columns" (by default, the end time and FCT) of the complete lines of a block of a flow completion log.
+# Lines are split and their integer fields are parsed with vectorized operations on the raw bytes, falling back to a
+# per line parse for blocks that are not made of lines with the same number of fields holding integers.
+def parse_fct_block(block, columns=(FCT_END_TIME_COLUMN, FCT_DURATION_COLUMN)):
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    line_ends = np.flatnonzero(buffer == ord("\n"))
+    commas = np.flatnonzero(buffer == ord(","))
+    num_lines = len(line_ends)
+    if num_lines == 0 or len(commas) % num_lines != 0: return parse_fct_lines(block, columns)
+    num_commas = len(commas) // num_lines
+    if num_commas < max(columns) or num_commas == 0: return parse_fct_lines(block, columns)
+    commas = commas.reshape(num_lines, num_commas)
+    line_starts = np.concatenate(([0], line_ends[:-1] + 1))
+    # every line must hold exactly "num_commas" commas
+    if np.any(commas[:, 0] < line_starts) or np.any(commas[:, -1] > line_ends): return parse_fct_lines(block, columns)
+    values = []
+    for column in columns:
+        field_starts = commas[:, column - 1] + 1 if column > 0 else line_starts
+        field_ends = commas[:, column] if num_commas > column else line_ends - (buffer[line_ends - 1] == ord("\r"))
+        column_values = parse_integer_fields(buffer, field_starts, field_ends)
+        if column_values is None: return parse_fct_lines(block, columns)
+        values.append(column_values.astype(np.float64))
+    return values
+
+# Read a Netbench log in large blocks of complete lines
+def read_log_blocks(log_filename, chunk_size=FCT_CHUNK_SIZE):
+    with open(log_filename, "rb") as f:
+        remainder = b""
+        while True:
+            data = f.read(chunk_size)
+            block = remainder + data
+            if data:
+                # only yield complete lines, the rest goes with the next block
+                last_line_end = block.rfind(b"\n") + 1
+                block, remainder = block[:last_line_end], block[last_line_end:]
+            elif block and not block.endswith(b"\n"):
+                block += b"\n"
+            if block: yield block
+            if not data: break
+
+# Read the "columns" (by default, the end time and FCT) of a flow completion log in large blocks. Yields, for each
+# block, the arrays of the columns followed by the number of flows flagged as incomplete ("FALSE" completion column).
+def read_fct_columns(fct_filename, columns=(FCT_END_TIME_COLUMN, FCT_DURATION_COLUMN), chunk_size=FCT_CHUNK_SIZE):
+    for block in read_log_blocks(fct_filename, chunk_size):
+        yield tuple(parse_fct_block(block, columns)) + (block.count(b",FALSE"),)
+
+# Percentile "q" of an array, taking the nearest data point (as np.percentile with 'nearest' interpolation)
+def compute_nearest_percentile(data, q):
+    if len(data) == 0: return float('nan')
+    index = int(np.around((len(data) - 1) * q / 100))
+    return float(np.partition(data, index)[index])
+
+# Name of the statistic of percentile "q" of a quantity, e.g. "p99_fct" or "p999_slowdown" (99.9th percentile)
+def derive_percentile_stat_name(q, quantity):
+    return "p{}_{}".format("{:g}".format(q).replace(".", ""), quantity)
+
+# Summary statistics (mean and FCT_PERCENTILES) of the values of a quantile sketch
+def summarize_sketch(sketch, quantity):
+    stats = {"mean_" + quantity: sketch.getMean()}
+    for q, percentile in zip(FCT_PERCENTILES, sketch.getPercentiles(FCT_PERCENTILES)):
+        stats[derive_percentile_stat_name(q, quantity)] = float(percentile)
+    return stats
+
+# Given a flow completion time (FCT) file generated by Netbench, compute the statistics of the job in a single pass with
+# bounded memory: the job completion time (JCT, i.e., the max flow end time), the mean and FCT_PERCENTILES of the FCT and
+# of the slowdown, and the number of (in)complete flows. The slowdown of a flow is its FCT over its ideal FCT on an idle
+# link of "link_bandwidth_gbps" and "link_latency_ns" (left out, i.e., NaN, if the bandwidth is unknown). The FCT and
+# slowdown quantile sketches are also returned ("fct_sketch" and "slowdown_sketch") to be merged across runs.
+def extract_fct_stats_from_file(fct_filename, link_bandwidth_gbps=None, link_latency_ns=0):
+    print("[ANALYSIS] Reading {}".format(fct_filename))
+    job_finish_time, num_incomplete_flows = -float('inf'), 0
+    fct_sketch, slowdown_sketch = quantile_sketch.QuantileSketch(), quantile_sketch.QuantileSketch()
+    for end_times, durations, sizes, num_incomplete in read_fct_columns(fct_filename, (FCT_END_TIME_COLUMN, FCT_DURATION_COLUMN, FCT_SIZE_COLUMN)):
+        if len(end_times): job_finish_time = max(job_finish_time, float(end_times.max()))
+        fct_sketch.update(durations)
+        if link_bandwidth_gbps:
+            ideal_durations = sizes * 8 / link_bandwidth_gbps + link_latency_ns
+            slowdown_sketch.update(durations[ideal_durations > 0] / ideal_durations[ideal_durations > 0])
+        num_incomplete_flows += num_incomplete
+    num_flows = fct_sketch.getCount()
+    stats = {"max_end_time": job_finish_time}
+    stats.update(summarize_sketch(fct_sketch, "fct"))
+    stats.update(summarize_sketch(slowdown_sketch, "slowdown"))
+    stats.update({"num_flows": num_flows,
+                  "num_completed_flows": num_flows - num_incomplete_flows,
+                  "num_incomplete_flows": num_incomplete_flows,
+                  "fct_sketch": fct_sketch,
+                  "slowdown_sketch": slowdown_sketch})
+    return stats
+
 # Given a flow completion time (FCT) file generated by Netbench, extract
 # the flow with the longest FCT to be the job completion time (JCT) of the entire job.
 def extract_max_fct_from_file(fct_filename):
     print("[ANALYSIS] Reading {}".format(fct_filename))
     job_finish_time = -float('inf')
-    with open(fct_filename, 'r') as f:
-        for line in f:
-            row = line.split(',')
-            job_finish_time = max(job_finish_time, float(row[6]))
+    for end_times, _, _ in read_fct_columns(fct_filename):
+        if len(end_times): job_finish_time = max(job_finish_time, float(end_times.max()))
     return job_finish_time
 
 # Given a flow completion time (FCT) file generated by Netbench, 
@@ -57,26 +179,25 @@ def extract_max_fct_from_file(fct_filename):
 def extract_avg_fct_from_file(fct_filename):
     print("[ANALYSIS] Reading {}".format(fct_filename))
     total_flow_duration, num_flows = 0, 0
-    with open(fct_filename, 'r') as f:
-        for line in f:
-            row = line.split(',')
-            total_flow_duration += float(row[7])
-            num_flows += 1
+    for _, durations, _ in read_fct_columns(fct_filename):
+        total_flow_duration += float(durations.sum())
+        num_flows += len(durations)
     return total_flow_duration / max(1, num_flows)
 
-# Given a list of numerical "data", compute the stats corresopnding to stat "type"
+# Given a list of numerical "data" (or a quantile sketch of the data), compute the stats corresopnding to stat "type"
+# ("mean" or a percentile, e.g. "99.9")
 def computeListStat(type:str, data:list):
+    if isinstance(data, quantile_sketch.QuantileSketch):
+        return data.getMean() if type == "mean" else data.getPercentile(float(type))
     if type == "mean":
         return np.mean(data)
-    elif type == "99":
-        return np.percentile(data, 99, interpolation='nearest')
-    elif type == "50":
-        return np.percentile(data, 50, interpolation='nearest')
+    else:
+        return compute_nearest_percentile(np.asarray(data, dtype=np.float64), float(type))
 
 ################################################################################################################
 #######################################    PLOTTING FUNCTIONS    ###############################################
 ################################################################################################################
-# Plotting related
+# Plotting related (matplotlib is imported by the plotting functions, so that ingesting the logs does not load it)
 color_cycle = ['darkcyan', 'lime', 'darkred','deeppink', 'blueviolet',  "silver", 'black']
 mark_cycle = ['d', '+', 's', 'x','v','1', 'p', ".", "o", "^", "<", ">", "1", "2", "3", "8", "P"]
 line_styles = ["solid", "dotted", "dashed", "dashdot"]
@@ -85,6 +206,7 @@ legend_fontsize = 8.2
 
 # Ploting function for multi-line chart 
 def plotMultiLineChart(x, y, path=""):
+    import matplotlib.pyplot as plt
     print("[ANALYSIS] Plotting multiline chart to " + path)
     plt.figure(figsize=(3,3))
     for i, (parameter, marker_arg) in enumerate(zip(y["data"].keys(), mark_cycle)):
@@ -110,6 +232,7 @@ def plotMultiLineChart(x, y, path=""):
 
 # Plotting function for multiple multi-column charts on the same plot.
 def plotMultiColBarChartSubplot(x, y, path=""):
+    import matplotlib.pyplot as plt
     print("[ANALYSIS] Plotting bar chart for " + y["label"] + " vs " + x["label"])
     num_pairs = len(x["data"])
     ind = np.arange(num_pairs)
@@ -146,6 +269,7 @@ def plotMultiColBarChartSubplot(x, y, path=""):
 # Plotting function for a single multi-column chart
 # Accepts data columns with different lengths
 def plotMultiColBarChart(x, y, path=""):
+    import matplotlib.pyplot as plt
     print("[ANALYSIS] Plotting bar chart for " + y["label"] + " vs " + x["label"])
     num_pairs = len(x["data"])
     ind = np.arange(num_pairs)
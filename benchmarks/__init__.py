@@ -0,0 +1,3 @@
+__all__ = ["benchmark_suite",
+			"run_benchmarks",
+		   ]
\ No newline at end of file
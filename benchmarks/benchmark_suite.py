@@ -0,0 +1,106 @@
+'''
+Benchmark cases of the experiment generation pipeline: topology wiring and topology file emission of every network
+topology class, and traffic planning and flow arrivals file emission of every synthetic traffic generator.
+'''
+
+import os, math, tempfile
+from network_topology import *
+from traffic.synthetic_traffic import *
+
+# Numbers of servers the cases are generated for
+BENCHMARK_NUM_SERVERS = [16, 64, 256, 1024, 4096]
+# Message size (bytes) of the planned collectives
+BENCHMARK_MESSAGE_SIZE = 1e6
+# Link bandwidth (Gbps) and latency (ns) of the benchmarked topologies
+BENCHMARK_LINK_BW = 100
+BENCHMARK_LINK_LATENCY_NS = 500
+
+# A benchmark case: setup() prepares (untimed) the arguments passed to run(), which is the timed operation
+class BenchmarkCase(object):
+    def __init__(self, name, setup, run):
+        self.name = name
+        self.setup = setup
+        self.run = run
+
+# Returns the builders of all the network topology classes for "num_servers" servers (a square number of at least 16).
+# SiPAC, BCube and torus topologies have one level of sqrt(p) groups, the fat-tree has pods of 16 or 64 servers and the
+# dragonfly has as many servers per switch as switches per group.
+def deriveTopologyBuilders(num_servers):
+    r = int(round(math.sqrt(num_servers)))
+    switches_per_group = 2 ** int(math.log2(num_servers) // 3)
+    num_groups = num_servers // (switches_per_group * switches_per_group)
+    return {"sipac": lambda: sipac_network_topology.SiPACNetworkTopology(r=r, l=1, link_bw=BENCHMARK_LINK_BW, link_latency=BENCHMARK_LINK_LATENCY_NS),
+            "bcube": lambda: bcube_network_topology.BcubeNetworkTopology(r=r, l=1, link_bw=BENCHMARK_LINK_BW),
+            "torus": lambda: nd_torus_network_topology.NDTorusNetworkTopology([r, r], link_bw=BENCHMARK_LINK_BW),
+            "dgx_superpod": lambda: dgx_superpod_network_topology.DGX_Superpod(target_num_gpus=num_servers, link_bw=BENCHMARK_LINK_BW),
+            "fattree": lambda: fattree_customized_network_topology.FatTreeCustomizedNetworkTopology(eps_radix=8 if num_servers < 64 else 16, target_num_servers=num_servers, link_bw=BENCHMARK_LINK_BW),
+            "dragonfly": lambda: dragonfly_network_topology.Dragonfly(G=num_groups, A=switches_per_group, h=math.ceil((num_groups - 1) / switches_per_group), link_bw=BENCHMARK_LINK_BW, concentration=switches_per_group)}
+
+# Returns the builders of all the synthetic traffic generators for "num_servers" servers (a square number of at least 16)
+def deriveTrafficBuilders(num_servers):
+    p, r = num_servers, int(round(math.sqrt(num_servers)))
+    model_info = {"intra_group_comm_type": "ALLTOALL", "intra_group_algo_type": "mesh",
+                  "inter_group_comm_type": "ALLREDUCE", "inter_group_algo_type": "ring",
+                  "intra_group_message_size": BENCHMARK_MESSAGE_SIZE, "inter_group_message_size": BENCHMARK_MESSAGE_SIZE}
+    return {"ring_allreduce": lambda: ring_allreduce_traffic_generator.RingAllReduceTrafficGenerator(p=p, num_server_per_job=p),
+            "ring_allgather": lambda: ring_allgather_traffic_generator.RingAllGatherTrafficGenerator(p=p, num_server_per_job=p),
+            "ring_alltoall": lambda: ring_alltoall_traffic_generator.RingAllToAllTrafficGenerator(p=p, num_server_per_job=p),
+            "hierarchical_allreduce": lambda: hierarchical_allreduce_traffic_generator.HierarchicalAllReduceTrafficGenerator(p=p, k=r, num_server_per_job=p),
+            "hierarchical_allgather": lambda: hierarchical_allgather_traffic_generator.HierarchicalAllGatherTrafficGenerator(p=p, k=r, num_server_per_job=p),
+            "hierarchical_alltoall": lambda: hierarchical_alltoall_traffic_generator.HierarchicalAllToAllTrafficGenerator(p=p, k=r, num_server_per_job=p),
+            "sipco_allreduce": lambda: sipco_allreduce_traffic_generator.SiPCOAllReduceTrafficGenerator(r=r, l=1, num_server_per_job=p),
+            "sipco_allgather": lambda: sipco_allgather_traffic_generator.SiPCOAllGatherTrafficGenerator(r=r, l=1, num_server_per_job=p),
+            "sipco_alltoall": lambda: sipco_alltoall_traffic_generator.SiPCOAllToAllTrafficGenerator(r=r, l=1, num_server_per_job=p),
+            "mesh_allreduce": lambda: mesh_allreduce_traffic_generator.MeshAllReduceTrafficGenerator(p=p, num_server_per_job=p),
+            "mesh_alltoall": lambda: mesh_alltoall_traffic_generator.MeshAllToAllTrafficGenerator(p=p, num_server_per_job=p),
+            "primitive_alltoall": lambda: primitive_alltoall_traffic_generator.PrimitiveAllToAllTrafficGenerator(p=p),
+            "primitive_onetoall": lambda: primitive_onetoall_traffic_generator.PrimitiveOneToAllTrafficGenerator(p=p, src_node=0),
+            "primitive_alltoone": lambda: primitive_alltoone_traffic_generator.PrimitiveAllToOneTrafficGenerator(p=p, dst_node=0),
+            "hybrid_parallel": lambda: hybrid_parallel_traffic_generator.HybridParallelTrafficGenerator(p=p, num_mp_nodes=r, model_info=model_info)}
+
+# Message size of the planned traffic of a generator (hybrid parallel traffic carries its own message sizes)
+def deriveMessageSize(traffic):
+    return 0 if isinstance(traffic, hybrid_parallel_traffic_generator.HybridParallelTrafficGenerator) else BENCHMARK_MESSAGE_SIZE
+
+def wireTopology(build_topology):
+    topology = build_topology()
+    topology.wireNetwork()
+    return topology
+
+def writeTopologyFile(build_topology, directory):
+    filename = os.path.join(directory, "benchmark.topology")
+    wireTopology(build_topology).writeTopologyFile(filename)
+    return filename
+
+def wireNetbenchFileTopology(topology_filename):
+    topology = netbench_file_network_topology.NetbenchFileNetworkTopology(topology_filename, link_bw=BENCHMARK_LINK_BW)
+    topology.wireNetwork()
+    return topology
+
+def planTraffic(traffic):
+    return traffic.plan_arrivals(deriveMessageSize(traffic))
+
+# The flow arrivals file is written on a SiPAC topology (whose servers are its first nodes) to a temporary file
+def setupTrafficFile(build_traffic, num_servers, directory):
+    topology = wireTopology(deriveTopologyBuilders(num_servers)["sipac"])
+    return topology, planTraffic(build_traffic()), os.path.join(directory, "flow_arrivals.txt")
+
+# Returns the benchmark cases for the given numbers of servers, named "<operation>/<topology or traffic>/p<num servers>".
+# Files are written to "directory" (a temporary directory by default).
+def generateBenchmarkCases(num_servers_list=BENCHMARK_NUM_SERVERS, directory=None):
+    directory = directory or tempfile.mkdtemp(prefix="sipac_benchmarks_")
+    cases = []
+    for num_servers in num_servers_list:
+        for topology_name, build_topology in deriveTopologyBuilders(num_servers).items():
+            cases.append(BenchmarkCase("wire/{}/p{}".format(topology_name, num_servers), lambda build_topology=build_topology: (build_topology,), wireTopology))
+            cases.append(BenchmarkCase("topology_file/{}/p{}".format(topology_name, num_servers), lambda build_topology=build_topology: (wireTopology(build_topology),),
+                                       lambda topology: topology.generateTopologyFileString()))
+        # the Netbench file topology reads back the topology file of the SiPAC topology
+        cases.append(BenchmarkCase("wire/netbench_file/p{}".format(num_servers),
+                                   lambda num_servers=num_servers: (writeTopologyFile(deriveTopologyBuilders(num_servers)["sipac"], directory),), wireNetbenchFileTopology))
+        for traffic_name, build_traffic in deriveTrafficBuilders(num_servers).items():
+            cases.append(BenchmarkCase("plan/{}/p{}".format(traffic_name, num_servers), lambda build_traffic=build_traffic: (build_traffic(),), planTraffic))
+            cases.append(BenchmarkCase("traffic_file/{}/p{}".format(traffic_name, num_servers),
+                                       lambda build_traffic=build_traffic, num_servers=num_servers: setupTrafficFile(build_traffic, num_servers, directory),
+                                       lambda topology, events, filename: topology.writeTrafficEventsFile(events, filename)))
+    return cases
@@ -0,0 +1,146 @@
+"""
+Runs the benchmark suite (benchmarks/benchmark_suite.py) and compares it against the stored baselines.
+
+Usage:
+    python3 -m benchmarks.run_benchmarks [options]
+        --sizes= (optional)
+            comma-separated numbers of servers (default: 16,64,256,1024,4096)
+        --filter= (optional)
+            only run the cases whose name contains this string, e.g. "plan/" or "torus"
+        --repeat= (optional)
+            maximum number of timed repetitions of a case, the minimum time is kept (default: 5)
+        --save-baseline (optional)
+            store the results as the baselines of the benchmarked cases
+        --tolerance= (optional)
+            relative slowdown or memory growth over the baseline reported as a regression (default: 0.25)
+        --check (optional)
+            exit with status 1 if any case regressed
+    e.g. "python3 -m benchmarks.run_benchmarks --sizes=16,64 --filter=wire/"
+
+Every case is run once under tracemalloc for its peak memory, then timed (wall time) without it. The results of each run
+are written to benchmarks/results/<timestamp>.json and the baselines are kept in benchmarks/baselines.json.
+"""
+
+import os, sys, getopt, json, time, platform, subprocess, tracemalloc, gc, io, contextlib
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.benchmark_suite import *
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIRECTORY = os.path.join(BENCHMARK_DIRECTORY, "results")
+BASELINES_FILENAME = os.path.join(BENCHMARK_DIRECTORY, "baselines.json")
+# Timed repetitions stop once a case ran for this long (s)
+BENCHMARK_TIME_BUDGET_S = 2.
+# Regressions below these absolute differences are timing/allocation noise
+BENCHMARK_MIN_TIME_DELTA_S = 0.005
+BENCHMARK_MIN_MEMORY_DELTA_BYTES = 1 << 20
+
+# Description of the machine and the revision the results were measured on
+def describeEnvironment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARK_DIRECTORY, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {"git_revision": revision, "python": platform.python_version(), "numpy": np.__version__,
+            "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+# Runs a case: returns its peak traced memory (bytes) and the minimum wall time (s) of up to "repeat" timed runs.
+# The progress messages of the topologies and generators are silenced.
+def measureCase(case, repeat):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return measureSilencedCase(case, repeat)
+
+def measureSilencedCase(case, repeat):
+    args = case.setup()
+    gc.collect()
+    tracemalloc.start()
+    case.run(*args)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    wall_times = []
+    while len(wall_times) < repeat and sum(wall_times) < BENCHMARK_TIME_BUDGET_S:
+        gc.collect()
+        start_time = time.perf_counter()
+        case.run(*args)
+        wall_times.append(time.perf_counter() - start_time)
+    return {"wall_time_s": min(wall_times), "peak_memory_bytes": peak_memory, "repeat": len(wall_times)}
+
+# Compares results against baselines: returns the (name, metric, baseline, result) of every regression over "tolerance"
+def findRegressions(results, baselines, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name not in baselines: continue
+        for metric, min_delta in (("wall_time_s", BENCHMARK_MIN_TIME_DELTA_S), ("peak_memory_bytes", BENCHMARK_MIN_MEMORY_DELTA_BYTES)):
+            baseline = baselines[name][metric]
+            if result[metric] > baseline * (1 + tolerance) and result[metric] - baseline > min_delta:
+                regressions.append((name, metric, baseline, result[metric]))
+    return regressions
+
+def readBaselines():
+    if not os.path.isfile(BASELINES_FILENAME): return {}
+    with open(BASELINES_FILENAME) as f:
+        return json.load(f)["cases"]
+
+def writeJson(filename, content):
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename + ".tmp", "w") as f:
+        json.dump(content, f, indent=2, sort_keys=True)
+    os.replace(filename + ".tmp", filename)
+
+def formatChange(result, baseline, metric):
+    if baseline is None: return "{:>8}".format("new")
+    return "{:>+7.0%}".format(result[metric] / baseline[metric] - 1 if baseline[metric] else 0)
+
+def runBenchmarks(num_servers_list=BENCHMARK_NUM_SERVERS, name_filter="", repeat=5, save_baseline=False, tolerance=0.25):
+    baselines = readBaselines()
+    cases = [case for case in generateBenchmarkCases(num_servers_list) if name_filter in case.name]
+    print("[Benchmark] Running {} cases".format(len(cases)))
+    print("{:<45} {:>12} {:>8} {:>12} {:>8}".format("case", "time (ms)", "vs base", "peak (MiB)", "vs base"))
+    results = {}
+    for case in cases:
+        result = results[case.name] = measureCase(case, repeat)
+        baseline = baselines.get(case.name)
+        print("{:<45} {:>12.2f} {} {:>12.2f} {}".format(case.name, result["wall_time_s"] * 1e3, formatChange(result, baseline, "wall_time_s"),
+                                                         result["peak_memory_bytes"] / (1 << 20), formatChange(result, baseline, "peak_memory_bytes")))
+    environment = describeEnvironment()
+    results_filename = os.path.join(RESULTS_DIRECTORY, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    writeJson(results_filename, {"environment": environment, "cases": results})
+    print("[Benchmark] Results written to {}".format(results_filename))
+    if save_baseline:
+        baselines.update(results)
+        writeJson(BASELINES_FILENAME, {"environment": environment, "cases": baselines})
+        print("[Benchmark] Baselines of {} cases written to {}".format(len(results), BASELINES_FILENAME))
+    regressions = findRegressions(results, baselines, tolerance) if not save_baseline else []
+    for name, metric, baseline, result in regressions:
+        print("[Benchmark] Regression of {}: {} {:.6g} -> {:.6g}".format(name, metric, baseline, result))
+    return results, regressions
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hp:f:r:t:", ["sizes=", "filter=", "repeat=", "save-baseline", "tolerance=", "check"])
+    except getopt.GetoptError:
+        print('python3 -m benchmarks.run_benchmarks [-p <sizes>] [-f <filter>] [-r <repeat>] [-t <tolerance>] [--save-baseline] [--check]')
+        sys.exit(2)
+    num_servers_list, name_filter, repeat, tolerance = BENCHMARK_NUM_SERVERS, "", 5, 0.25
+    save_baseline, check = False, False
+    for opt, arg in opts:
+        if opt == '-h':
+            print('python3 -m benchmarks.run_benchmarks [--sizes <p,...>] [--filter <name>] [--repeat <n>] [--tolerance <fraction>] [--save-baseline] [--check]')
+            sys.exit()
+        elif opt in ("-p", "--sizes"):
+            num_servers_list = [int(size) for size in arg.split(",")]
+        elif opt in ("-f", "--filter"):
+            name_filter = arg
+        elif opt in ("-r", "--repeat"):
+            repeat = max(1, int(arg))
+        elif opt in ("-t", "--tolerance"):
+            tolerance = float(arg)
+        elif opt == "--save-baseline":
+            save_baseline = True
+        elif opt == "--check":
+            check = True
+    _, regressions = runBenchmarks(num_servers_list, name_filter, repeat, save_baseline, tolerance)
+    if check and regressions: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+'''
+Parameters and code versions of the experiment inputs (topologies and traffic generators), which key the manifest hashes
+of generate_experiment.py and the traffic cache.
+'''
+
+import copy, hashlib, inspect, functools
+import numpy as np
+
+# Returns whether a value is made only of plain (JSON) values, including NumPy scalars
+def isPlainValue(value):
+    if value is None or isinstance(value, (bool, int, float, str, np.bool_, np.integer, np.floating)): return True
+    if isinstance(value, (list, tuple)): return all(isPlainValue(entry) for entry in value)
+    if isinstance(value, dict): return all(isinstance(key, str) and isPlainValue(entry) for key, entry in value.items())
+    return False
+
+# JSON encoding of the values json does not support natively: NumPy scalars are encoded as the equal Python scalar
+def encodeJSONValue(value):
+    if isinstance(value, np.generic): return value.item()
+    return str(value)
+
+# Checks that the parameters of an experiment input ("owner_name") are all plain values, which identify the input in
+# its hashes, and returns a copy of them
+def checkParameters(owner_name, parameters):
+    for name, value in parameters.items():
+        if not isPlainValue(value): raise Exception("Parameter {} of {} is not a plain value: {!r}".format(name, owner_name, value))
+    return copy.deepcopy(parameters)
+
+# Version of the code defining the given classes (including their base classes) and modules, computed as the hash of
+# their source files. The code a class delegates to, outside of its base classes, is listed by its CODE_DEPENDENCIES
+# (classes or modules), which are covered as well.
+@functools.lru_cache(maxsize=None)
+def computeCodeVersion(*definitions):
+    source_files = set()
+    pending_definitions, visited_definitions = list(definitions), set()
+    while pending_definitions:
+        definition = pending_definitions.pop()
+        if definition in visited_definitions: continue
+        visited_definitions.add(definition)
+        for source in (definition.__mro__ if inspect.isclass(definition) else (definition,)):
+            if source is object: continue
+            source_files.add(inspect.getsourcefile(source))
+            if inspect.isclass(source): pending_definitions.extend(vars(source).get("CODE_DEPENDENCIES", ()))
+    hasher = hashlib.sha256()
+    for source_file in sorted(source_files):
+        with open(source_file, "rb") as f: hasher.update(f.read())
+    return hasher.hexdigest()
@@ -7,14 +7,28 @@ Usage:
             1. primitive collective experiment
             2. allreduce collective experiment
             3. hybrid parallel collective experiment
-    e.g. "python3 generate_experiments.py --exp_id=1"
+        --sweep= (optional, instead of --exp_id)
+            name of the sweep of the sweep file to generate, e.g. "allreduce"
+        --sweep_file= (optional)
+            declarative sweep specs (default: input_parameters/sweeps.json, see sweep_spec.py)
+        --jobs= (optional)
+            number of worker processes used to generate the experiment files (default: 1)
+        --simulator= (optional)
+            simulator run by the execution script: netbench (default) or fluid (simulation/fluid_simulator.py)
+        --profile (optional)
+            time and memory-track each generation stage, and write the report to temp/profile/<timestamp>
+        --profile_detail= (optional, with --profile)
+            also record a cProfile (cprofile) or the retained allocations (tracemalloc) of each stage
+    e.g. "python3 generate_experiments.py --exp_id=1 --jobs=8"
 """
 
-import os, sys, getopt
-import math
-import utilities
-from network_topology import *
-from traffic.synthetic_traffic import *
+import os, sys, getopt, time, json
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import utilities, profiling, sweep_spec
+from experiment_inputs import computeCodeVersion
+from network_topology import topology_registry
+from traffic.synthetic_traffic import traffic_registry, traffic_cache
 
 
 ####################################################################################################
@@ -22,35 +36,54 @@ from traffic.synthetic_traffic import *
 ####################################################################################################
 
 # Directory Setup
-print("[Setup] Setup directory")
 BASE_DIRECTORY = os.getcwd()
 WORKING_DIRECTORY = BASE_DIRECTORY + "/temp"
 INPUT_DIRECTORY = BASE_DIRECTORY + "/input_parameters"
 EXECUTION_DIRECTORY = BASE_DIRECTORY + "/execution"
-if not os.path.isdir(WORKING_DIRECTORY): os.mkdir(WORKING_DIRECTORY)
-if not os.path.isdir(INPUT_DIRECTORY): os.mkdir(INPUT_DIRECTORY)
-if not os.path.isdir(EXECUTION_DIRECTORY): os.mkdir(EXECUTION_DIRECTORY)
-
-# read parameters from file
-print("[Setup] Read inputs")
-parameter_file_name = INPUT_DIRECTORY + "/setup.json"
-input_parameters = utilities.parseJSON(parameter_file_name)
-
-property_dictionary = {"num_vcs": int(input_parameters["NUM_VCS"]),
-                        "input_queue_size_bytes": int(input_parameters["INPUT_QUEUE_BUFFER_SIZE_BYTES"]),
-                        "output_port_queue_size_bytes": int(input_parameters["OUTPUT_QUEUE_BUFFER_SIZE_BYTES"]),
-                        "output_port_ecn_threshold_k_bytes": int(1/5 * int(input_parameters["OUTPUT_QUEUE_BUFFER_SIZE_BYTES"])),
-                        "enable_log_port_queue_state": input_parameters["enable_log_port_queue_state"],
-                        "enable_log_flow_throughput": input_parameters["enable_log_flow_throughput"],
-                        "enable_log_sending_throughput": input_parameters["enable_log_sending_throughput"],
-                        "network_link_delay_ns": int(input_parameters["NETWORK_LINK_LATENCY_NS"]),
-                        "server_link_delay_ns": int(input_parameters["SERVER_LINK_LATENCY_NS"]),
-                        "injection_link_bw_gbps": int(input_parameters["INJECTION_LINK_BW_GBPS"]),
-                        "transport_layer": input_parameters["TRANSPORT_LAYER"],
-                        "congestion_threshold_bytes": int(input_parameters["CONGESTION_THRESHOLD_BYTES"]),
-                        "stateful_load_balancing": False,
-                        "enable_packet_spraying": False,
-                        }
+MANIFEST_FILENAME = WORKING_DIRECTORY + "/manifest.json"
+STORE_DIRECTORY = WORKING_DIRECTORY + "/.store"
+TRAFFIC_CACHE_DIRECTORY = WORKING_DIRECTORY + "/.traffic_cache"
+PROFILE_DIRECTORY = WORKING_DIRECTORY + "/profile"
+
+# Inputs of the experiments (setup.json), the Netbench properties derived from them and the cache of planned traffic,
+# loaded by setupExperiments()
+input_parameters = {}
+property_dictionary = {}
+TRAFFIC_CACHE = None
+
+# Creates the working directories and reads the inputs of the experiments. Called by main() (and by the pool workers
+# that do not inherit them), so that importing this script has no side effects.
+def setupExperiments():
+    global input_parameters, property_dictionary, TRAFFIC_CACHE
+    print("[Setup] Setup directory")
+    for directory in (WORKING_DIRECTORY, INPUT_DIRECTORY, EXECUTION_DIRECTORY, STORE_DIRECTORY): os.makedirs(directory, exist_ok=True)
+
+    # read parameters from file
+    print("[Setup] Read inputs")
+    parameter_file_name = INPUT_DIRECTORY + "/setup.json"
+    input_parameters = utilities.parseJSON(parameter_file_name)
+
+    # Planned traffic is cached in memory and on disk across runs
+    TRAFFIC_CACHE = traffic_cache.TrafficCache(TRAFFIC_CACHE_DIRECTORY, max_disk_bytes=int(input_parameters.get("TRAFFIC_CACHE_SIZE_BYTES", 1 << 30)))
+
+    property_dictionary = {"num_vcs": int(input_parameters["NUM_VCS"]),
+                            "input_queue_size_bytes": int(input_parameters["INPUT_QUEUE_BUFFER_SIZE_BYTES"]),
+                            "output_port_queue_size_bytes": int(input_parameters["OUTPUT_QUEUE_BUFFER_SIZE_BYTES"]),
+                            "output_port_ecn_threshold_k_bytes": int(1/5 * int(input_parameters["OUTPUT_QUEUE_BUFFER_SIZE_BYTES"])),
+                            "enable_log_port_queue_state": input_parameters["enable_log_port_queue_state"],
+                            "enable_log_flow_throughput": input_parameters["enable_log_flow_throughput"],
+                            "enable_log_sending_throughput": input_parameters["enable_log_sending_throughput"],
+                            "network_link_delay_ns": int(input_parameters["NETWORK_LINK_LATENCY_NS"]),
+                            "server_link_delay_ns": int(input_parameters["SERVER_LINK_LATENCY_NS"]),
+                            "injection_link_bw_gbps": int(input_parameters["INJECTION_LINK_BW_GBPS"]),
+                            "transport_layer": input_parameters["TRANSPORT_LAYER"],
+                            "congestion_threshold_bytes": int(input_parameters["CONGESTION_THRESHOLD_BYTES"]),
+                            "stateful_load_balancing": False,
+                            "enable_packet_spraying": False,
+                            }
+
+# Stage-level profiler of the generation, enabled by --profile
+PROFILER = profiling.StageProfiler()
 
 # Derive the hardware/system parameter name that includes information on:
 # 1) Transport layer protocol and input/output port buffer size
@@ -71,218 +104,295 @@ def deriveNetworkHardwareParameterName(routing_scheme, network_link_bandwidth_gb
     hardware_name += "{}g_{}ns_{}".format(network_link_bandwidth_gbps, int(input_parameters["NETWORK_LINK_LATENCY_NS"]), routing_scheme)
     return protocol_name + "_" + hardware_name
 
-# Given the topology, traffic arrival events, traffic type, routing scheme, message (flow) size, and network bandwidth,
-# generate the simulation parameter files required to run Netbench.
-def createExperimentFiles(topology, traffic_arrival_events, traffic_pattern, routing_scheme, flow_size, network_link_bandwidth_gbps):
-    # Set up
+# Derive the files of a Netbench run: the topology file shared by all message sizes of a traffic pattern, the traffic
+# arrival file of a message (flow) size, and the link delay and simulation config files of a hardware setup.
+def deriveExperimentFilenames(topology, traffic_pattern, routing_scheme, flow_size, network_link_bandwidth_gbps):
     if isinstance(flow_size, float) or isinstance(flow_size, int): flow_size = utilities.extract_byte_string(flow_size)
-    # 1) Traffic Directory
-    traffic_directory = "{}/{}".format(WORKING_DIRECTORY,traffic_pattern)
-    if not os.path.isdir(traffic_directory): os.mkdir(traffic_directory)
-    # 2) Network Topology Directory
-    topology_directory = traffic_directory + "/" + topology.getName()
-    if not os.path.isdir(topology_directory): os.mkdir(topology_directory)
-    topology_filename = "{}/initial_topology.topology".format(topology_directory)
-    with open(topology_filename, "w+") as f: f.write(topology.generateTopologyFileString())
-    # 3) Flow Size Directory
+    topology_directory = "{}/{}/{}".format(WORKING_DIRECTORY, traffic_pattern, topology.getName())
     flow_size_directory = "{}/{}".format(topology_directory, flow_size)
-    if not os.path.isdir(flow_size_directory): os.mkdir(flow_size_directory)
-    traffic_flows_arrival_filename = "{}/flow_arrivals.txt".format(flow_size_directory)
-    traffic_flows_arrival_string, number_of_flows = topology.generateTrafficEventsString(traffic_arrival_events)
-    with open(traffic_flows_arrival_filename, "w+") as f: f.write(traffic_flows_arrival_string)
-    # 4) Hardware Parameter Directory
     hardware_parameter_name = deriveNetworkHardwareParameterName(routing_scheme, network_link_bandwidth_gbps)
     hardware_parameter_directory = "{}/{}".format(flow_size_directory, hardware_parameter_name)
-    if not os.path.isdir(hardware_parameter_directory): os.mkdir(hardware_parameter_directory)
-    link_delay_filename = "{}/link_delay.txt".format(hardware_parameter_directory)
-    with open(link_delay_filename, "w+") as f: f.write(topology.generateLinkDelayFileString())
-    config_file_string = utilities.write_simulation_configuration_file(hardware_parameter_directory,
-                                                                        "",
-                                                                        topology_filename, 
-                                                                        traffic_flows_arrival_filename, 
-                                                                        routing_scheme,
-                                                                        link_delay_filename,
-                                                                        int(input_parameters["SIMULATION_RUNTIME_NS"]),
-                                                                        number_of_flows,
-                                                                        property_dictionary)
-    simulation_config_filename = "{}/simulation_parameters.properties".format(hardware_parameter_directory)
-    with open(simulation_config_filename, "w+") as f:
-        f.write(config_file_string)
-    return simulation_config_filename
-
-# Generate the topologies compared in this work normalized along the per-CU bandwidth
-def generateTopology(target_num_nodes, per_cu_bw_gbps, l=1):
-    ### Topology-related
-    print("[Setup] Generate topologies")
-    p = target_num_nodes
-    r = math.ceil(float(p) ** (1/(float(l)+1)))
-    torus_dim = {16: [4,4], 64: [8,8], 256: [16,16], 512: [32,16], 1024: [32,32]}
-    sipac_network = sipac_network_topology.SiPACNetworkTopology(r=r,l=l,link_bw=per_cu_bw_gbps//((l+1)*(r-1)), link_latency=int(input_parameters["NETWORK_LINK_LATENCY_NS"]), num_wavelengths_per_pair=1)
-    bcube_network = bcube_network_topology.BcubeNetworkTopology(r=r,l=l,link_bw=per_cu_bw_gbps//(l+1), num_wavelengths_per_pair=1)
-    superpod_network = dgx_superpod_network_topology.DGX_Superpod(target_num_gpus=p, link_bw=per_cu_bw_gbps//6) # each gpu is connected to 6 nvswitches with 2 links each = 12 links
-    torus_network = nd_torus_network_topology.NDTorusNetworkTopology(torus_dim[target_num_nodes], link_bw=per_cu_bw_gbps//(2*2))
-    topology_list = [superpod_network, torus_network, bcube_network, sipac_network]
-    return topology_list
-
-# Given a specific topology, generate all-reduce traffic based on different all-reduce algorithms
-def generateAllReduceTraffic(topology):
-    ### Traffic generators
-    print("[Setup] Generate traffic for {}".format(topology.getName()))
-    ring_allreduce_traffic = ring_allreduce_traffic_generator.RingAllReduceTrafficGenerator(p=topology.getNumServers(), num_server_per_job=topology.getNumServers())
-    mesh_allreduce_traffic = mesh_allreduce_traffic_generator.MeshAllReduceTrafficGenerator(p=topology.getNumServers(), num_server_per_job=topology.getNumServers())
-    sipco_allreduce_traffic = None
-    hierarchical_allreduce_traffic = None
-    if topology.getName().startswith("2D"):
-        k=int(topology.getNumServers()**(1/2))
-        hierarchical_allreduce_traffic = hierarchical_allreduce_traffic_generator.HierarchicalAllReduceTrafficGenerator(p=topology.getNumServers(), k=k, num_server_per_job=topology.getNumServers())
-    elif topology.getName().startswith("dgx"):
-        k = topology.getNumServers() / 8
-        assert(k == int(k))
-        hierarchical_allreduce_traffic = hierarchical_allreduce_traffic_generator.HierarchicalAllReduceTrafficGenerator(p=topology.getNumServers(), k=int(k), num_server_per_job=topology.getNumServers())
-    elif topology.getName().startswith("sipac") or topology.getName().startswith("Bcube"):
-        k = (topology.getR()) ** (topology.getL())
-        hierarchical_allreduce_traffic = hierarchical_allreduce_traffic_generator.HierarchicalAllReduceTrafficGenerator(p=topology.getNumServers(), k=int(k), num_server_per_job=topology.getNumServers())
-    if topology.getName().startswith("sipac") or topology.getName().startswith("Bcube"):
-        sipco_allreduce_traffic = sipco_allreduce_traffic_generator.SiPCOAllReduceTrafficGenerator(r=topology.getR(), l=topology.getL(), num_server_per_job=topology.getNumServers())
-
-    traffic_generators = {
-                        "ring_allreduce": ring_allreduce_traffic,
-                        "hierarchical_allreduce": hierarchical_allreduce_traffic,
-                        "sipco_allreduce": sipco_allreduce_traffic,
-                        "mesh_allreduce": mesh_allreduce_traffic,
-                        }
-    return traffic_generators
-
-# Given a specific topology, generate primitive collectives (one-to-all, all-to-one, all-to-all).
-def generatePrimitiveTraffic(topology):
-    primitive_alltoall_traffic = primitive_alltoall_traffic_generator.PrimitiveAllToAllTrafficGenerator(p=topology.getNumServers())
-    primitive_onetoall_traffic = primitive_onetoall_traffic_generator.PrimitiveOneToAllTrafficGenerator(p=topology.getNumServers(), src_node=0)
-    primitive_alltoone_traffic = primitive_alltoone_traffic_generator.PrimitiveAllToOneTrafficGenerator(p=topology.getNumServers(), dst_node=0)
-    traffic_generators = {
-                        "primitive_onetoall": primitive_onetoall_traffic,
-                        "primitive_alltoone": primitive_alltoone_traffic,
-                        "primitive_alltoall": primitive_alltoall_traffic,
-                        }
-    return traffic_generators
-
-# Generate the required files for different types of experiments
-def generateExperimentFiles(num_nodes_list, per_cu_bw_gbps_list, flow_size_bytes, traffic_type):
-    simulation_config_filenames = []
-    for num_nodes in num_nodes_list:
-        l = 2 if num_nodes == 512 else 1
-        for per_cu_bw_gbps in per_cu_bw_gbps_list:
-            topology_list = generateTopology(num_nodes, per_cu_bw_gbps, l=l)
-            for topology in topology_list:
-                topology.wireNetwork()
-                if traffic_type == "primitive": traffic_generators = generatePrimitiveTraffic(topology)
-                elif traffic_type == "allreduce": traffic_generators = generateAllReduceTraffic(topology)
-                else: raise Exception("Unknown traffic type.")
-                for traffic_name, traffic_generator in traffic_generators.items():
-                    if not traffic_generator: continue
-                    for flow_size in flow_size_bytes:
-                        traffic_arrival_events = traffic_generator.plan_arrivals(flow_size)
-                        simulation_config_filename = createExperimentFiles(topology=topology, 
-                                                                        traffic_arrival_events=traffic_arrival_events, 
-                                                                        traffic_pattern=traffic_name, 
-                                                                        routing_scheme="ecmp", 
-                                                                        flow_size=flow_size,
-                                                                        network_link_bandwidth_gbps=topology.getLinkBW())
-                        simulation_config_filenames.append(simulation_config_filename)
-    return simulation_config_filenames
-
-# Experiment parameter setup for all-reduce experiments.
-def generateAllReduceExperiment():
-    print("[Setup] Generate allreduce experiment files")
-    flow_size_bytes = [1e2,1e3,1e4,1e5,1e6,1e7,1e8,1e9]
-    num_nodes_list = [16, 64, 256, 512, 1024]
-    per_cu_bw_gbps_list = [2048]
-    simulation_config_filenames = generateExperimentFiles(num_nodes_list, per_cu_bw_gbps_list, flow_size_bytes, "allreduce")
-    return simulation_config_filenames
-
-# Experiment parameter setup for primitive collective experiments.
-def generatePrimitiveCollectiveExperiment():
-    print("[Setup] Generate primitive experiment files")
-    flow_size_bytes = [1e2,1e3,1e4,1e5,1e6,1e7,1e8]
-    num_nodes_list = [512]
-    per_cu_bw_gbps_list = [2048]
-    simulation_config_filenames = generateExperimentFiles(num_nodes_list, per_cu_bw_gbps_list, flow_size_bytes, "primitive")
-    return simulation_config_filenames
-
-# Experiment parameter setup for hybrid parallel collective experiments.
-def generateHybridParallelExperiment():
-    ### Variable Parameters
-    print("[Setup] Generate hybrid parallel experiment files")
-    num_nodes_list = [64] # 16 , 64, 128, 256, 512, 1024
-    per_cu_bw_gbps_list = [128, 256, 512, 1024, 2048, 4096] # 25 GBps/link * 2 links/nvswitch * 6 nvswitches * 8 Gbps/GBps = 2400 Gbps --> A100 system per-GPU bw
-    num_mp_nodes = [16] # try 64
-    torus_dim = {16: [4,4], 64: [8,8], 256: [16,16], 512: [32,16], 1024: [32,32]}
-    # Need to setup experiment for this
-    model_info = dict({ "intra_group_comm_type":"ALLTOALL", "intra_group_algo_type":"mesh", 
-                        "inter_group_comm_type":"ALLREDUCE", "inter_group_algo_type":"sipco",
-                        "intra_group_message_size":100e6,
-                        "inter_group_message_size":100e6})
-    
-    ### Simulation Setup
-    simulation_config_filenames = []
-    for num_nodes in num_nodes_list:
-        l = 2 if num_nodes == 512 or num_nodes == 64 else 1
-        r = math.ceil(float(num_nodes) ** (1/(float(l)+1)))
-        intra_topo_to_algo_map = {"dgx_superpod_{}nodes".format(num_nodes): "mesh", 
-                                  "2D_torus_{}_{}_{}nodes".format(torus_dim[num_nodes][0],torus_dim[num_nodes][1], num_nodes): "mesh", 
-                                  "BCube_{}r_{}l".format(r,l): "mesh",
-                                  "sipac_{}r_{}l".format(r,l): "sipco"}
-        inter_topo_to_algo_map = {"dgx_superpod_{}nodes".format(num_nodes): "ring", 
-                                  "2D_torus_{}_{}_{}nodes".format(torus_dim[num_nodes][0],torus_dim[num_nodes][1], num_nodes): "ring", 
-                                  "BCube_{}r_{}l".format(r,l): "ring",
-                                  "sipac_{}r_{}l".format(r,l): "sipco"}
-        for per_cu_bw_gbps in per_cu_bw_gbps_list:
-            topology_list = generateTopology(num_nodes, per_cu_bw_gbps, l=l)
-            for topology in topology_list:
-                topology.wireNetwork()
-                model_info["intra_group_algo_type"] = intra_topo_to_algo_map[topology.getName()]
-                model_info["inter_group_algo_type"] = inter_topo_to_algo_map[topology.getName()]
-                if topology.getName().startswith("sipac") or topology.getName().startswith("Bcube"):
-                    model_info["r"] = topology.getR()
-                    model_info["l"] = topology.getL()
-                for num_mp_node in num_mp_nodes:
-                    hybrid_parallel_traffic = hybrid_parallel_traffic_generator.HybridParallelTrafficGenerator(p=topology.getNumServers(), num_mp_nodes=num_mp_node, model_info=model_info)
-                    traffic_arrival_events = hybrid_parallel_traffic.plan_arrivals(0)
-                    simulation_config_filename = createExperimentFiles(
-                        topology=topology, 
-                        traffic_arrival_events=traffic_arrival_events, 
-                        traffic_pattern="hybrid_parallel", 
-                        routing_scheme="ecmp", 
-                        flow_size="mp{}_{}_alltoall_{}_{}_allreduce_{}".format(
-                            num_mp_node,
-                            model_info["intra_group_algo_type"],
-                            utilities.extract_byte_string(model_info["intra_group_message_size"]),
-                            model_info["inter_group_algo_type"],
-                            utilities.extract_byte_string(model_info["inter_group_message_size"])),
-                        network_link_bandwidth_gbps=topology.getLinkBW())
-                    simulation_config_filenames.append(simulation_config_filename)
-    return simulation_config_filenames
+    return {"topology": "{}/initial_topology.topology".format(topology_directory),
+            "flow_arrivals": "{}/flow_arrivals.txt".format(flow_size_directory),
+            "link_delay": "{}/link_delay.txt".format(hardware_parameter_directory),
+            "simulation_config": "{}/simulation_parameters.properties".format(hardware_parameter_directory)}
 
-if __name__ == "__main__":
+# Topology parameters setting the link bandwidth and latency only. The topology file and the traffic arrival file do not
+# depend on them, and are shared by the runs of all link bandwidths and latencies (which set them in their link delay and
+# simulation config files).
+LINK_PARAMETERS = ("link_bw", "link_latency")
+
+# Derive the hash of the inputs of each file of a Netbench run: the topology and traffic generator parameters,
+# the relevant setup.json fields and the version of the code generating the file (for the flow arrivals, the code of the
+# generator and of the generators it plans its traffic with, see experiment_inputs.computeCodeVersion()).
+# Must be called right after deriveExperimentFilenames(), which sets the link bandwidth of the property dictionary.
+def deriveExperimentInputHashes(topology, traffic_generator, filenames, routing_scheme, flow_size):
+    topology_parameters = topology.getParameters()
+    topology_structure_parameters = {key: value for key, value in topology_parameters.items() if key not in LINK_PARAMETERS}
+    topology_hash = utilities.computeContentHash(type(topology).__name__, topology_structure_parameters, computeCodeVersion(type(topology)))
+    flow_arrivals_hash = utilities.computeContentHash(topology_hash, type(traffic_generator).__name__, traffic_generator.getParameters(), 
+                                                        computeCodeVersion(type(traffic_generator)), flow_size)
+    link_delay_hash = utilities.computeContentHash("link_delay", topology_hash, topology_parameters)
+    simulation_config_hash = utilities.computeContentHash(filenames, link_delay_hash, flow_arrivals_hash, routing_scheme, input_parameters["SIMULATION_RUNTIME_NS"], 
+                                                            property_dictionary, computeCodeVersion(utilities))
+    return {"topology": topology_hash,
+            "flow_arrivals": flow_arrivals_hash,
+            "link_delay": link_delay_hash,
+            "simulation_config": simulation_config_hash}
+
+# Files shared by many runs (the topology and link delay files) are kept in a store, where they are named after the
+# hash of their inputs (not of their content), and linked into the run directories. Returns the store filename.
+def deriveStoreFilename(input_hash):
+    return "{}/{}".format(STORE_DIRECTORY, input_hash)
+
+# Link "filename" to its canonical copy in the store, which is only written (by "write_function") if it does not exist yet.
+# Returns whether the canonical copy was written.
+def writeStoredFile(filename, input_hash, write_function):
+    store_filename = deriveStoreFilename(input_hash)
+    is_written = not os.path.isfile(store_filename)
+    if is_written:
+        # the same file may be stored concurrently by several runs: write it atomically
+        temporary_store_filename = "{}.{}.tmp".format(store_filename, os.getpid())
+        write_function(temporary_store_filename)
+        os.replace(temporary_store_filename, store_filename)
+    utilities.linkFile(store_filename, filename)
+    return is_written
+
+# Given the topology, traffic arrival events, traffic type, routing scheme, message (flow) size, network bandwidth, and
+# the input hashes of deriveExperimentInputHashes(), generate the simulation parameter files required to run Netbench.
+# When "stale_files" is given, only these files (keys of deriveExperimentFilenames()) are written, and "number_of_flows" 
+# is the flow count of the existing arrival file. Returns the simulation config filename and the number of flows.
+def createExperimentFiles(topology, traffic_arrival_events, traffic_pattern, routing_scheme, flow_size, network_link_bandwidth_gbps, input_hashes, stale_files=None, number_of_flows=None):
+    # Set up
+    filenames = deriveExperimentFilenames(topology, traffic_pattern, routing_scheme, flow_size, network_link_bandwidth_gbps)
+    if stale_files is None: stale_files = filenames.keys()
+    for filename in filenames.values(): os.makedirs(os.path.dirname(filename), exist_ok=True)
+    # 1) Network Topology File
+    if "topology" in stale_files:
+        with PROFILER.stage("topology_file", filenames["topology"]) as record:
+            if writeStoredFile(filenames["topology"], input_hashes["topology"], topology.writeTopologyFile):
+                record["events"], record["bytes"] = topology.getAdjacency().getNumEdges(), os.path.getsize(filenames["topology"])
+    # 2) Traffic Arrival File (the events are formatted and written in blocks)
+    if "flow_arrivals" in stale_files:
+        with PROFILER.stage("flow_arrivals_file", filenames["flow_arrivals"]) as record:
+            # runs sharing the arrival file may write it concurrently: write it atomically
+            temporary_filename = "{}.{}.tmp".format(filenames["flow_arrivals"], os.getpid())
+            number_of_flows = topology.writeTrafficEventsFile(traffic_arrival_events, temporary_filename)
+            os.replace(temporary_filename, filenames["flow_arrivals"])
+            record["events"], record["bytes"] = number_of_flows, os.path.getsize(filenames["flow_arrivals"])
+    # 3) Link Delay File
+    if "link_delay" in stale_files:
+        def writeLinkDelayFile(link_delay_filename):
+            with open(link_delay_filename, "w+") as f: f.write(topology.generateLinkDelayFileString())
+        with PROFILER.stage("link_delay_file", filenames["link_delay"]) as record:
+            if writeStoredFile(filenames["link_delay"], input_hashes["link_delay"], writeLinkDelayFile):
+                record["bytes"] = os.path.getsize(filenames["link_delay"])
+    # 4) Simulation Config File, which refers to the canonical copies of the stored files
+    if "simulation_config" in stale_files:
+        with PROFILER.stage("simulation_config_file", filenames["simulation_config"]) as record:
+            config_file_string = utilities.write_simulation_configuration_file(os.path.dirname(filenames["simulation_config"]),
+                                                                                "",
+                                                                                deriveStoreFilename(input_hashes["topology"]), 
+                                                                                filenames["flow_arrivals"], 
+                                                                                routing_scheme,
+                                                                                deriveStoreFilename(input_hashes["link_delay"]),
+                                                                                int(input_parameters["SIMULATION_RUNTIME_NS"]),
+                                                                                number_of_flows,
+                                                                                property_dictionary)
+            with open(filenames["simulation_config"], "w+") as f:
+                f.write(config_file_string)
+            record["bytes"] = len(config_file_string)
+    return filenames["simulation_config"], number_of_flows
+
+# Builds the topology of a kind (see network_topology/topology_registry.py) normalized along the per-CU bandwidth.
+# Topologies are cached so that consecutive experiment tasks on the same topology reuse them (and their wiring) within a process.
+@functools.lru_cache(maxsize=4)
+def findTopology(topology_kind, num_nodes, per_cu_bw_gbps, num_levels):
+    with PROFILER.stage("topology_construction", "{}_{}nodes_{}gbps".format(topology_kind, num_nodes, per_cu_bw_gbps)) as record:
+        topology = topology_registry.buildTopology(topology_kind, num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns=int(input_parameters["NETWORK_LINK_LATENCY_NS"]))
+        record["events"] = 1
+    return topology
+
+# Builds the traffic generator of a collective on a topology (see traffic/synthetic_traffic/traffic_registry.py), None if
+# the collective does not run on it. The traffic parameters are JSON encoded, to be hashable.
+@functools.lru_cache(maxsize=16)
+def findTrafficGenerator(topology_kind, num_nodes, per_cu_bw_gbps, num_levels, traffic_name, traffic_parameters_json):
+    topology = findTopology(topology_kind, num_nodes, per_cu_bw_gbps, num_levels)
+    return traffic_registry.buildTrafficGenerator(traffic_name, topology, topology_kind, json.loads(traffic_parameters_json))
+
+def findPointTopology(point):
+    return findTopology(point["topology"], point["num_nodes"], point["per_cu_bw_gbps"], point["num_levels"])
+
+def findPointTrafficGenerator(point):
+    return findTrafficGenerator(point["topology"], point["num_nodes"], point["per_cu_bw_gbps"], point["num_levels"], point["traffic"],
+                                json.dumps(point["traffic_parameters"], sort_keys=True))
+
+# Wires the topology, recording the wiring stage with its number of links
+def wireTopology(topology):
+    with PROFILER.stage("wire_network", topology.getName()) as record:
+        topology.wireNetwork()
+        record["events"] = topology.getAdjacency().getNumEdges()
+
+# Enumerates the experiment tasks of a stream of sweep points (see sweep_spec.py), skipping the collectives that do not
+# run on their topology. Each task is a point and the {file key: (filename, input hash)} dictionary of its files.
+def iterateExperimentTasks(points, routing_scheme="ecmp"):
+    for point in points:
+        traffic_generator = findPointTrafficGenerator(point)
+        if not traffic_generator: continue
+        # the traffic generators only depend on the topology parameters, not on its wiring
+        topology = findPointTopology(point)
+        filenames = deriveExperimentFilenames(topology, point["traffic"], routing_scheme, point["flow_size"], topology.getLinkBW())
+        input_hashes = deriveExperimentInputHashes(topology, traffic_generator, filenames, routing_scheme, point["flow_size"])
+        yield point, {key: (filenames[key], input_hashes[key]) for key in filenames}
+
+# Generates the stale files of a single experiment task and returns its simulation config filename and number of flows.
+# The topology is only wired, and the traffic only planned, when the files depending on them have to be written.
+def runExperimentTask(task):
+    point, input_hashes, stale_files, number_of_flows = task
+    topology = findPointTopology(point)
+    requires_wiring = "flow_arrivals" in stale_files or any(key in stale_files and not os.path.isfile(deriveStoreFilename(input_hashes[key])) for key in ("topology", "link_delay"))
+    if topology.getAdjacency() is None and requires_wiring: wireTopology(topology)
+    traffic_arrival_events = None
+    if "flow_arrivals" in stale_files:
+        with PROFILER.stage("plan_arrivals", "{}/{}/{}".format(topology.getName(), point["traffic"], point["flow_size"])) as record:
+            traffic_arrival_events = TRAFFIC_CACHE.getArrivals(findPointTrafficGenerator(point), point["message_size"])
+            record["events"] = len(traffic_arrival_events)
+    return createExperimentFiles(topology=topology, 
+                                traffic_arrival_events=traffic_arrival_events, 
+                                traffic_pattern=point["traffic"], 
+                                routing_scheme="ecmp", 
+                                flow_size=point["flow_size"],
+                                network_link_bandwidth_gbps=topology.getLinkBW(),
+                                input_hashes=input_hashes,
+                                stale_files=stale_files,
+                                number_of_flows=number_of_flows)
+
+# Runs an experiment task in a pool worker, returning the profiled stages of the task along with its result
+def runProfiledExperimentTask(task):
+    return runExperimentTask(task), PROFILER.popRecords()
+
+# Sets up the profiler of a pool worker like the one of the main process, without the stages recorded before the fork.
+# Workers started without fork (e.g. spawned) read the inputs of the experiments themselves.
+def initializeWorker(profile, profile_detail, profile_directory):
+    global PROFILER
+    PROFILER = profiling.StageProfiler(profile, profile_detail, profile_directory)
+    if not input_parameters: setupExperiments()
+
+# Returns whether a generated file is up to date according to the manifest, i.e., it exists and its inputs did not change
+def isUpToDate(manifest, filename, input_hash):
+    return filename in manifest and manifest[filename]["hash"] == input_hash and os.path.isfile(filename)
+
+# Runs experiment tasks, on a process pool when jobs > 1, and returns their results in task order
+def runExperimentTasks(tasks, jobs=1):
+    if jobs <= 1 or len(tasks) <= 1: return [runExperimentTask(task) for task in tasks]
+    # contiguous tasks share a topology, so hand them out in chunks to maximize topology reuse per worker
+    chunksize = max(1, len(tasks) // (4 * jobs))
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializeWorker, initargs=(PROFILER.isEnabled(), PROFILER.detail, PROFILER.output_directory)) as executor:
+        for result, records in executor.map(runProfiledExperimentTask, tasks, chunksize=chunksize):
+            results.append(result)
+            PROFILER.addRecords(records)
+    return results
+
+# Generate the files of the runs of a stream of sweep points. The files whose inputs did not change since the previous
+# run (according to the manifest) are skipped, and only the simulation config filenames of the runs with changed inputs
+# are returned, in point order. The points are enumerated lazily and only the runs with changed inputs are kept.
+# With jobs > 1, the runs are generated on a process pool.
+def generateExperimentFiles(points, jobs=1, sweep_name=""):
+    manifest = utilities.readManifest(MANIFEST_FILENAME)
+    stale_tasks, stale_input_files, arrivals_filenames, waiting_tasks, scheduled_files = [], [], [], [], set()
+    num_tasks = 0
+    with PROFILER.stage("task_enumeration", sweep_name) as record:
+        for point, input_files in iterateExperimentTasks(points):
+            num_tasks += 1
+            stale_files = [key for key, (filename, input_hash) in input_files.items() if not isUpToDate(manifest, filename, input_hash)]
+            if not stale_files: continue
+            # a file shared by several runs with the same inputs (e.g. the topology file, or the arrivals of the runs that
+            # differ only by their link bandwidth) only needs to be written by one of them
+            shared_files = [key for key in stale_files if input_files[key] in scheduled_files]
+            stale_files = [key for key in stale_files if key not in shared_files]
+            scheduled_files.update(input_files[key] for key in stale_files)
+            number_of_flows = manifest.get(input_files["flow_arrivals"][0], {}).get("num_flows")
+            input_hashes = {key: input_hash for key, (_, input_hash) in input_files.items()}
+            stale_tasks.append((point, input_hashes, stale_files, number_of_flows))
+            stale_input_files.append({key: input_files[key] for key in stale_files})
+            arrivals_filenames.append(input_files["flow_arrivals"][0])
+            waiting_tasks.append("flow_arrivals" in shared_files)
+        record["events"] = num_tasks
+    print("[Setup] {} of {} runs have changed inputs".format(len(stale_tasks), num_tasks))
+    # the runs whose arrivals are written by another run are generated after it, once the number of flows is known
+    results = [None] * len(stale_tasks)
+    for waiting in (False, True):
+        wave = [i for i in range(len(stale_tasks)) if waiting_tasks[i] == waiting]
+        tasks = []
+        for i in wave:
+            point, input_hashes, stale_files, number_of_flows = stale_tasks[i]
+            if waiting: number_of_flows = manifest[arrivals_filenames[i]]["num_flows"]
+            tasks.append((point, input_hashes, stale_files, number_of_flows))
+        # record the inputs of the regenerated files
+        for i, result in zip(wave, runExperimentTasks(tasks, jobs)):
+            results[i] = result
+            for key, (filename, input_hash) in stale_input_files[i].items():
+                manifest[filename] = {"hash": input_hash}
+                if key == "flow_arrivals": manifest[filename]["num_flows"] = result[1]
+    with PROFILER.stage("manifest", MANIFEST_FILENAME) as record:
+        utilities.writeManifest(MANIFEST_FILENAME, manifest)
+        record["events"] = len(manifest)
+    return [simulation_config_filename for simulation_config_filename, _ in results]
+
+# Sweeps (of input_parameters/sweeps.json) run by the experiment numbers
+EXPERIMENT_SWEEPS = {1: "primitive", 2: "allreduce", 3: "hybrid"}
+
+def main():
     try:
-        opts, args = getopt.getopt(sys.argv[1:],"he:",["exp_id="])
+        opts, args = getopt.getopt(sys.argv[1:],"he:j:s:",["exp_id=", "sweep=", "sweep_file=", "jobs=", "simulator=", "profile", "profile_detail="])
     except getopt.GetoptError:
-        print('python3 generate_experiment.py -e <experiment_number>')
+        print('python3 generate_experiment.py (-e <experiment_number> | --sweep <sweep_name>) [--sweep_file <file>] [-j <num_jobs>] [-s <netbench|fluid>] [--profile [--profile_detail <cprofile|tracemalloc>]]')
         sys.exit(2)
     exp_id = 1
+    sweep_name = None
+    sweep_filename = INPUT_DIRECTORY + "/sweeps.json"
+    jobs = 1
+    simulator = "netbench"
+    profile = False
+    profile_detail = None
     for opt, arg in opts:
         if opt == '-h':
-            print('python3 generate_experiment.py -exp_id <experiment_number>')
+            print('python3 generate_experiment.py -exp_id <experiment_number> [--sweep <sweep_name>] [--sweep_file <file>] [--jobs <num_jobs>] [--simulator <netbench|fluid>] [--profile [--profile_detail <cprofile|tracemalloc>]]')
             sys.exit()
         elif opt in ("-e", "--exp_id"):
             exp_id = int(arg)
-    exp_id_map = {1: "primitive", 2: "allreduce", 3: "hybrid"}
-    simulations_config_filenames = []
-    if exp_id == 1:
-        simulations_config_filenames = generatePrimitiveCollectiveExperiment()
-    elif exp_id == 2:
-        simulations_config_filenames = generateAllReduceExperiment()
-    elif exp_id == 3:
-        simulations_config_filenames = generateHybridParallelExperiment()
-    else:
-        print("Invalid Experiment Number")
-    if simulations_config_filenames: utilities.generateBashScript(EXECUTION_DIRECTORY, simulations_config_filenames, exp_id_map[exp_id])
\ No newline at end of file
+        elif opt == "--sweep":
+            sweep_name = arg
+        elif opt == "--sweep_file":
+            sweep_filename = arg
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt in ("-s", "--simulator"):
+            simulator = arg
+        elif opt == "--profile":
+            profile = True
+        elif opt == "--profile_detail":
+            profile_detail = arg
+    if sweep_name is None:
+        if exp_id not in EXPERIMENT_SWEEPS:
+            print("Invalid Experiment Number")
+            sys.exit(2)
+        sweep_name = EXPERIMENT_SWEEPS[exp_id]
+    profile_directory = "{}/{}".format(PROFILE_DIRECTORY, time.strftime("%Y%m%d-%H%M%S"))
+    PROFILER.enable(profile, profile_detail if profile else None, profile_directory)
+    setupExperiments()
+    print("[Setup] Generate {} sweep files".format(sweep_name))
+    points = sweep_spec.iterateSweepPoints(sweep_spec.findSweep(sweep_spec.readSweepSpecs(sweep_filename), sweep_name))
+    simulations_config_filenames = generateExperimentFiles(points, jobs=jobs, sweep_name=sweep_name)
+    # the script only contains the runs with changed inputs, so it is written even if there are none
+    with PROFILER.stage("execution_script", sweep_name) as record:
+        utilities.generateBashScript(EXECUTION_DIRECTORY, simulations_config_filenames, sweep_name, simulator)
+        record["events"] = len(simulations_config_filenames)
+    if PROFILER.isEnabled():
+        PROFILER.printSummary()
+        report_filenames = PROFILER.writeReport(profile_directory, {"sweep": sweep_name, "jobs": jobs, "simulator": simulator, "profile_detail": profile_detail})
+        print("[Profile] Report written to {} and {}".format(*report_filenames))
+
+if __name__ == "__main__":
+    main()
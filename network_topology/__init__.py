@@ -5,4 +5,7 @@ __all__ = ["network_topology",
 			"dgx_superpod_network_topology",
 			"nd_torus_network_topology",
 			"bcube_network_topology",
+			"netbench_file_network_topology",
+			"path_engine",
+			"topology_registry",
 		   ]
\ No newline at end of file
@@ -1,5 +1,6 @@
 import math, pprint
 import os, sys
+import numpy as np
 from network_topology.network_topology import *
 
 
@@ -8,6 +9,7 @@ class DGX_Superpod(NetworkTopology):
     # 2) https://www.microway.com/preconfiguredsystems/nvidia-dgx-a100/?gclid=CjwKCAiAsNKQBhAPEiwAB-I5zSDFlAzweRTnv0GULrFRsg5FnEFWMkIaAUaOA_gFPqltrb0J7BIbBRoCTt8QAvD_BwE
     def __init__(self, target_num_gpus, link_bw):
         NetworkTopology.__init__(self)
+        self.setParameters(target_num_gpus=target_num_gpus, link_bw=link_bw)
         self.name = "dgx_superpod"
         # Counting neetwork devices 
         self.num_gpus_per_dgx = 8
@@ -42,8 +44,8 @@ class DGX_Superpod(NetworkTopology):
         self.pcie_link_bw = 32 * 8
         self.infiniband_link_bw = 200
         self.link_latencies_ns = {"ib_spine": 400, "ib_leaf": 130, "pcie": 110, "nvlink": 9000}
-        # Adjacency Matrix
-        self.adjacency_matrix = [[0]*self.total_num_nodes for _ in range(self.total_num_nodes)]
+        # GPU (index within DGX) to PCIe switch (index within DGX) connections
+        self.gpu_to_pcie_switch = [0, 1, 2, 3, 3, 2, 1, 0]
 
     def getNumServers(self):
         return self.total_num_gpus
@@ -85,81 +87,41 @@ class DGX_Superpod(NetworkTopology):
         print("Network Topology: ")
         pprint.pprint(self.adjacency_list)
     
-    def designIntraDGXTopology(self, group_id):
-        # DGX-2 Intra-node Topology
+    def designIntraDGXTopology(self):
+        # DGX-2 Intra-node Topology, wired for all DGXes at once
         # Each GPU is ocnnected to every NVSwitch within the DGX
-        for gpu in self.gpus[group_id]:
-            for nvswitch in self.nv_switches[group_id]:
-                self.adjacency_matrix[gpu][nvswitch] = 1
-                self.adjacency_matrix[nvswitch][gpu] = 1
-        starting_gpu = self.gpus[group_id][0]
-        starting_pcie_switch = self.pcie_switches[group_id][0]
-        # Finally add the connections to the pcie switches with
-        self.adjacency_matrix[starting_gpu][starting_pcie_switch] = 1
-        self.adjacency_matrix[starting_pcie_switch][starting_gpu] = 1
-        self.adjacency_matrix[starting_gpu+7][starting_pcie_switch] = 1
-        self.adjacency_matrix[starting_pcie_switch][starting_gpu+7] = 1
-        self.adjacency_matrix[starting_gpu+1][starting_pcie_switch+1] = 1
-        self.adjacency_matrix[starting_pcie_switch+1][starting_gpu+1] = 1
-        self.adjacency_matrix[starting_gpu+6][starting_pcie_switch+1] = 1
-        self.adjacency_matrix[starting_pcie_switch+1][starting_gpu+6] = 1
-        self.adjacency_matrix[starting_gpu+2][starting_pcie_switch+2] = 1
-        self.adjacency_matrix[starting_pcie_switch+2][starting_gpu+2] = 1
-        self.adjacency_matrix[starting_gpu+5][starting_pcie_switch+2] = 1
-        self.adjacency_matrix[starting_pcie_switch+2][starting_gpu+5] = 1
-        self.adjacency_matrix[starting_gpu+3][starting_pcie_switch+3] = 1
-        self.adjacency_matrix[starting_pcie_switch+3][starting_gpu+3] = 1
-        self.adjacency_matrix[starting_gpu+4][starting_pcie_switch+3] = 1
-        self.adjacency_matrix[starting_pcie_switch+3][starting_gpu+4] = 1
-        
+        gpus = np.array(self.gpus, dtype=np.int64)
+        nv_switches = np.array(self.nv_switches, dtype=np.int64)
+        self.addLinks(gpus[:, :, None], nv_switches[:, None, :])
+        # Finally add the connections to the pcie switches (GPU 0 and 7 to the first one, 1 and 6 to the second one, etc.)
+        pcie_switches = np.array(self.pcie_switches, dtype=np.int64)
+        self.addLinks(gpus, pcie_switches[:, self.gpu_to_pcie_switch])
+
     def connectDGXToLeafSwitches(self):
-        for su_id in range(self.num_scalable_units):
-            leaf_switches = self.leaf_switches[(su_id)*self.num_leaf_switch_per_scalable_unit:(su_id+1)*self.num_leaf_switch_per_scalable_unit]
-            pcie_switch_group = self.pcie_switches[su_id*self.num_dgx_per_scalable_unit:(su_id+1)*self.num_dgx_per_scalable_unit]
-            for pcie_switches in pcie_switch_group:
-                slow_pt = fast_pt = 0
-                while fast_pt != len(leaf_switches) and slow_pt != len(pcie_switches):
-                    leaf_switch, pcie_switch = leaf_switches[fast_pt], pcie_switches[slow_pt]
-                    self.adjacency_matrix[leaf_switch][pcie_switch] = 1
-                    self.adjacency_matrix[pcie_switch][leaf_switch] = 1
-                    self.adjacency_matrix[leaf_switch+1][pcie_switch] = 1
-                    self.adjacency_matrix[pcie_switch][leaf_switch+1] = 1
-                    fast_pt += 2
-                    slow_pt += 1
-                assert(fast_pt == self.num_leaf_switch_per_pcie_switch * slow_pt)
-            
-    
+        # Each PCIe switch connects to two adjacent leaf switches of its scalable unit
+        assert(self.num_leaf_switch_per_scalable_unit == self.num_leaf_switch_per_pcie_switch * self.num_pcie_switches_per_dgx)
+        leaf_switches = np.array(self.leaf_switches, dtype=np.int64).reshape(self.num_scalable_units, self.num_leaf_switch_per_scalable_unit)
+        pcie_switches = np.array(self.pcie_switches, dtype=np.int64)
+        su_ids = np.arange(self.num_dgx) // self.num_dgx_per_scalable_unit
+        for i in range(self.num_leaf_switch_per_pcie_switch):
+            self.addLinks(leaf_switches[su_ids][:, i::self.num_leaf_switch_per_pcie_switch], pcie_switches)
+
     def connectLeafToSpineSwitches(self):
-        for spine_switch in self.spine_switches:
-            for leaf_switch in self.leaf_switches:
-                self.adjacency_matrix[spine_switch][leaf_switch] = 1
-                self.adjacency_matrix[leaf_switch][spine_switch] = 1
+        spine_switches = np.array(self.spine_switches, dtype=np.int64)
+        leaf_switches = np.array(self.leaf_switches, dtype=np.int64)
+        self.addLinks(spine_switches[:, None], leaf_switches[None, :])
 
     def wireNetwork(self):
         print("[Setup] Wiring DGX_Superpod network.")
-        for group_id in range(self.num_dgx):
-            self.designIntraDGXTopology(group_id)
+        self.initializeAdjacency(self.total_num_nodes)
+        self.designIntraDGXTopology()
         self.connectDGXToLeafSwitches()
         self.connectLeafToSpineSwitches()
-        for src in range(len(self.adjacency_matrix)):
-            self.adjacency_list[src] = {}
-            # add destination switches
-            for dst in range(len(self.adjacency_matrix[src])):
-                if self.adjacency_matrix[src][dst] != 0:
-                    self.adjacency_list[src][dst] = self.adjacency_matrix[src][dst]
+        self.finalizeAdjacency()
         
-    # Generates the topology string used for netbench.
-    def generateTopologyFileString(self):
+    # Generates the header of the topology file used for netbench.
+    def generateTopologyFileHeader(self, num_nodes, num_edges):
         prefix = ""
-        topol_str = ""
-        num_edges = 0
-        for switch_id in self.adjacency_list:
-            for target_switch_id in self.adjacency_list[switch_id]:
-                link_count = int(self.adjacency_list[switch_id][target_switch_id])
-                num_edges += link_count
-                for _ in range(link_count):
-                    topol_str += "{} {}\n".format(switch_id, target_switch_id)
-        num_nodes = len(self.adjacency_list)
         assert(self.total_num_nodes == num_nodes)
         prefix += ("|V|={}".format(num_nodes) + "\n")
         prefix += ("|E|={}".format(num_edges) + "\n")
@@ -168,20 +130,39 @@ class DGX_Superpod(NetworkTopology):
         # ToRs and servers both include pcie switches and gpus
         prefix += "ToRs=incl_range({},{})\n".format(self.pcie_switches[0][0], self.nv_switches[-1][-1])
         prefix += "Servers=incl_range({},{})\n\n".format(self.gpus[0][0], self.gpus[-1][-1])
-        return prefix + topol_str
+        return prefix
     
-    def generateTrafficEventsString(self, trace_events_list):
-        str_builder = ""
-        virtual_servers_offset = self.total_num_switches
-        number_of_flows = 0
-        for (timestamp, src, dst, sum_bytes) in trace_events_list:
-            src_virtual = virtual_servers_offset + src
-            dst_virtual = virtual_servers_offset + dst
-            assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list), "{},{}".format(src_virtual,dst_virtual)
-            if src_virtual != dst_virtual:
-                str_builder += "{},{},{},{}\n".format(timestamp, int(src_virtual), int(dst_virtual), sum_bytes)
-                number_of_flows += 1
-        return str_builder, number_of_flows
+    # Nodes are numbered by tier: spine, leaf, PCIe switches, NVSwitches and GPUs
+    def getNodeRoles(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        tier_offsets = [self.num_spine_switches, self.pcie_offset, self.nvswitch_offset, self.gpu_offset, self.total_num_nodes]
+        tiers = np.array(["spine", "leaf", "pcie", "nvswitch", "gpu", "unknown"])
+        return tiers[np.searchsorted(tier_offsets, nodes, side="right")]
+
+    # Latency (ns) and bandwidth (Gbps) of the links between two tiers, as written by generateLinkDelayFileString()
+    def getTierLinkParameters(self):
+        return {("spine", "leaf"): (self.link_latencies_ns["ib_spine"], self.infiniband_link_bw),
+                ("leaf", "pcie"): (self.link_latencies_ns["ib_leaf"], self.infiniband_link_bw),
+                ("gpu", "pcie"): (self.link_latencies_ns["pcie"], self.pcie_link_bw),
+                ("gpu", "nvswitch"): (self.link_latencies_ns["nvlink"], self.nvlink_bw)}
+
+    # Looks up the parameter "index" (0: latency, 1: bandwidth) of the links src -> dst from the tiers of their endpoints
+    def lookupTierLinkParameters(self, src, dst, index):
+        src_roles, dst_roles = np.broadcast_arrays(self.getNodeRoles(src), self.getNodeRoles(dst))
+        values = np.full(src_roles.shape, np.nan)
+        for (tier, other_tier), parameters in self.getTierLinkParameters().items():
+            values[((src_roles == tier) & (dst_roles == other_tier)) | ((src_roles == other_tier) & (dst_roles == tier))] = parameters[index]
+        return values
+
+    def getLinkLatencies(self, src, dst, default_latency_ns=0):
+        return self.lookupTierLinkParameters(src, dst, 0)
+
+    def getLinkBandwidths(self, src, dst):
+        return self.lookupTierLinkParameters(src, dst, 1)
+
+    # GPUs are numbered after all the switches
+    def mapServerIds(self, server_ids):
+        return server_ids + self.total_num_switches
     
     def checkLinkAdjacencyList(self, src, dst):
         if src in self.adjacency_list and dst in self.adjacency_list:
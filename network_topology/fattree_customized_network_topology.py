@@ -1,8 +1,10 @@
+import numpy as np
 from network_topology.network_topology import *
 
 class FatTreeCustomizedNetworkTopology(NetworkTopology):
     def __init__(self, eps_radix, target_num_servers, link_bw, num_layers=3, oversubscription_ratio=(1,1)):
         NetworkTopology.__init__(self)
+        self.setParameters(eps_radix=eps_radix, target_num_servers=target_num_servers, link_bw=link_bw, num_layers=num_layers, oversubscription_ratio=oversubscription_ratio)
         self.k = eps_radix 
         self.num_layers = num_layers
         self.target_num_servers = target_num_servers
@@ -77,34 +79,19 @@ class FatTreeCustomizedNetworkTopology(NetworkTopology):
         return
 
     def connectAdjacentLayers(self):
+        # core and aggregation layers are abstracted into giant switches, so there are fewer nodes than total_num_nodes
+        self.initializeAdjacency(self.servers[-1][-1] + 1)
         # connect core and aggregation
-        for pod_id in range(self.num_pods):
-            aggregation_switch = self.aggregation_layer_switches[pod_id]
-            if aggregation_switch not in self.adjacency_list: self.adjacency_list[aggregation_switch] = {}
-            for core in self.core_switches:
-                if core not in self.adjacency_list: self.adjacency_list[core] = {}
-                self.adjacency_list[core][aggregation_switch] = max(1, self.num_links_from_aggregation_to_core)
-                self.adjacency_list[aggregation_switch][core] = max(1, self.num_links_from_aggregation_to_core)
+        core_switches = np.array(self.core_switches, dtype=np.int64)
+        aggregation_switches = np.array(self.aggregation_layer_switches, dtype=np.int64)
+        self.addLinks(core_switches[:, None], aggregation_switches[None, :], max(1, self.num_links_from_aggregation_to_core))
         # connect aggregation and ToR
-        for pod_id in range(self.num_pods):
-            aggregation_switch = self.aggregation_layer_switches[pod_id]
-            ToR_switches = self.ToR_layer_switches[pod_id]
-            for ToR in ToR_switches:
-                if ToR not in self.adjacency_list: self.adjacency_list[ToR] = {}
-                self.adjacency_list[aggregation_switch][ToR] = max(1, self.num_links_from_tor_to_aggregation)
-                self.adjacency_list[ToR][aggregation_switch] = max(1, self.num_links_from_tor_to_aggregation)
+        ToR_switches = np.array(self.ToR_layer_switches, dtype=np.int64)
+        self.addLinks(aggregation_switches[:, None], ToR_switches, max(1, self.num_links_from_tor_to_aggregation))
         # connect ToR to servers
-        for pod_id in range(self.num_pods):
-            ToR_switches = self.ToR_layer_switches[pod_id]
-            servers = self.servers[pod_id]
-            server_index = 0
-            for ToR in ToR_switches:
-                for _ in range(self.num_servers_per_tor):
-                    server = servers[server_index]
-                    if server not in self.adjacency_list: self.adjacency_list[server] = {}
-                    self.adjacency_list[ToR][server] = 1
-                    self.adjacency_list[server][ToR] = 1
-                    server_index += 1
+        servers = np.array(self.servers, dtype=np.int64).reshape(self.total_num_tor_switches, self.num_servers_per_tor)
+        self.addLinks(ToR_switches.reshape(-1, 1), servers)
+        self.finalizeAdjacency()
     
     def checkTaperingRatio(self):
         # checks the relative tapering between aggregation layer and core layer
@@ -140,18 +127,9 @@ class FatTreeCustomizedNetworkTopology(NetworkTopology):
         self.checkTorsRadixRequirement()
         self.checkServersRadixRequirement()
 
-    def generateTrafficEventsString(self, trace_events_list):
-        str_builder = ""
-        virtual_servers_offset = self.servers[0][0] # pass over aggregation + ToR switches to get to the servers
-        number_of_flows = 0
-        for (timestamp, src, dst, sum_bytes) in trace_events_list:
-            src_virtual = virtual_servers_offset + src
-            dst_virtual = virtual_servers_offset + dst
-            assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list), "{},{}".format(src_virtual, dst_virtual)
-            if src_virtual != dst_virtual:
-                str_builder += "{},{},{},{}\n".format(timestamp, int(src_virtual), int(dst_virtual), int(sum_bytes))
-                number_of_flows += 1
-        return str_builder, number_of_flows
+    # pass over aggregation + ToR switches to get to the servers
+    def mapServerIds(self, server_ids):
+        return server_ids + self.servers[0][0]
 
     # Generates the traffic events in the form of strings.
     def generate_traffic_events_string_from_probability(self, traffic_probability):
@@ -176,23 +154,14 @@ class FatTreeCustomizedNetworkTopology(NetworkTopology):
         return str_builder
 
 
-    # Generates the topology string used for netbench.
-    def generateTopologyFileString(self):
+    # Generates the header of the topology file used for netbench.
+    def generateTopologyFileHeader(self, num_nodes, num_edges):
         prefix = ""
-        topol_str = ""
-        num_edges = 0
-        for switch_id in self.adjacency_list:
-            for target_switch_id in self.adjacency_list[switch_id]:
-                link_count = int(self.adjacency_list[switch_id][target_switch_id])
-                num_edges += link_count
-                for _ in range(link_count):
-                    topol_str += "{} {}\n".format(switch_id, target_switch_id)
-        num_switches = len(self.adjacency_list)
-        prefix += ("|V|={}".format(num_switches) + "\n")
+        prefix += ("|V|={}".format(num_nodes) + "\n")
         prefix += ("|E|={}".format(num_edges) + "\n")
         prefix += "ToRs=incl_range({},{})\n".format(self.ToR_layer_switches[0][0], self.ToR_layer_switches[-1][-1])
         prefix += "Servers=incl_range({},{})\n".format(self.servers[0][0], self.servers[-1][-1])
         core_switches = [str(x) for x in self.core_switches]
         aggregation_switches = [str(x) for x in self.aggregation_layer_switches]
         prefix += "Switches=set({},{})\n".format(",".join(core_switches), ",".join(aggregation_switches))
-        return prefix + topol_str
\ No newline at end of file
+        return prefix
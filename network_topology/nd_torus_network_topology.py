@@ -1,6 +1,5 @@
 import numpy as np
-from collections import defaultdict
-from network_topology.network_topology import NetworkTopology
+from network_topology.network_topology import NetworkTopology, NormalizeSquareMatrix, openForWriting, writeFormattedRows
 
 def CartProduct(set1, set2):
     cart_prod = []
@@ -9,20 +8,10 @@ def CartProduct(set1, set2):
             cart_prod.append(element1 + element2)
     return cart_prod
 
-def NormalizeSquareMatrix(matrix, norm):
-    num_entries = len(matrix)
-    new_matrix = [0] * num_entries
-    total = sum([sum(x) for x in matrix])
-    multiplicity = float(norm) / total
-    for i in range(num_entries):
-        new_matrix[i] = [0.] * num_entries
-        for j in range(num_entries):
-            new_matrix[i][j] = float(matrix[i][j]) * multiplicity
-    return new_matrix
-
 class NDTorusNetworkTopology(NetworkTopology):
     def __init__(self, numSwitchesInDimension, link_bw):
         NetworkTopology.__init__(self)
+        self.setParameters(numSwitchesInDimension=numSwitchesInDimension, link_bw=link_bw)
         self.numDimensions = len(numSwitchesInDimension)
         self.numSwitchesInDimension = list(numSwitchesInDimension)
         assert(self.numDimensions == len(self.numSwitchesInDimension))
@@ -33,7 +22,6 @@ class NDTorusNetworkTopology(NetworkTopology):
         ## Step 1: generate the switches
         self.CoordToIndex = {}
         self.IndexToCoord = {}
-        self.adjacencyList = {}
         return
     
     def getNumServers(self):
@@ -72,95 +60,63 @@ class NDTorusNetworkTopology(NetworkTopology):
     def wireNetwork(self):
         print("[Setup] Wiring nd torus network.")
         self.createSwitches()
-        for coord in self.CoordToIndex.keys():
-            toConnectCoordinates = []
-            for dim in range(self.numDimensions):
-                ind = coord[dim]
-                neighbor1DimIndex = ind - 1
-                neighbor2DimIndex = ind + 1
-                if ind == 0:
-                    neighbor1DimIndex = self.numSwitchesInDimension[dim] - 1
-                elif ind == self.numSwitchesInDimension[dim] - 1:
-                    neighbor2DimIndex = 0
-                mutableCoordListNeighbor1 = list(coord)
-                mutableCoordListNeighbor1[dim] = neighbor1DimIndex
-                mutableCoordListNeighbor2 = list(coord)
-                mutableCoordListNeighbor2[dim] = neighbor2DimIndex
-                neighbor1Coord = tuple(mutableCoordListNeighbor1)
-                neighbor2Coord = tuple(mutableCoordListNeighbor2)
-                toConnectCoordinates.append(neighbor1Coord)
-                toConnectCoordinates.append(neighbor2Coord)
-            currIndex = self.CoordToIndex[coord]
-            self.adjacencyList[currIndex] = []
-            for neighborCoord in toConnectCoordinates:
-                neighborIndex = self.CoordToIndex[neighborCoord]
-                self.adjacencyList[currIndex].append(neighborIndex)
-        assert(len(self.adjacencyList) == self.total_num_nodes)
+        # indices follow the row-major order of the coordinates, see createSwitches()
+        # a dimension of size 2 yields two parallel links between the same pair, hence accumulate
+        self.initializeAdjacency(self.total_num_nodes, accumulate=True)
+        indices = np.arange(self.total_num_nodes, dtype=np.int64)
+        coords = np.unravel_index(indices, self.numSwitchesInDimension)
+        for dim in range(self.numDimensions):
+            for step in (-1, 1):
+                neighbor_coords = list(coords)
+                neighbor_coords[dim] = (coords[dim] + step) % self.numSwitchesInDimension[dim]
+                neighbors = np.ravel_multi_index(neighbor_coords, self.numSwitchesInDimension)
+                self.addLinks(indices, neighbors, bidirectional=False)
+        self.finalizeAdjacency()
+        assert(len(self.adjacency_list) == self.total_num_nodes)
         assert(self.CheckTopologicalSymmetry())
-        self.standardizeAdjacencyList()
         return
 
-    def standardizeAdjacencyList(self):
-        self.adjacency_list = {}
-        for src in self.adjacencyList.keys():
-            self.adjacency_list[src] = defaultdict(int)
-            for dst in self.adjacencyList[src]:
-                self.adjacency_list[src][dst] += 1
+    # A link connects two nodes whose coordinates only differ along its dimension
+    def getLinkRoles(self, src, dst):
+        src_coords = np.unravel_index(np.asarray(src, dtype=np.int64), self.numSwitchesInDimension)
+        dst_coords = np.unravel_index(np.asarray(dst, dtype=np.int64), self.numSwitchesInDimension)
+        dimensions = np.full(np.shape(src_coords[0]), -1, dtype=np.int64)
+        for dim in range(self.numDimensions):
+            dimensions[src_coords[dim] != dst_coords[dim]] = dim
+        return np.char.add("dim", dimensions.astype(str))
+
+    # Translating the coordinates of all nodes by those of a source takes the source to node 0
+    def getNodeTranslations(self, sources):
+        source_coords = np.unravel_index(np.asarray(sources, dtype=np.int64), self.numSwitchesInDimension)
+        node_coords = np.unravel_index(np.arange(self.total_num_nodes, dtype=np.int64), self.numSwitchesInDimension)
+        translated_coords = [(node_coords[dim][None, :] - source_coords[dim][:, None]) % self.numSwitchesInDimension[dim] for dim in range(self.numDimensions)]
+        return np.ravel_multi_index(translated_coords, self.numSwitchesInDimension)
 
     # checks and see if the network topology is symmetrical (i.e if all links are bidirectional)
     def CheckTopologicalSymmetry(self):
-        for switchIndex in self.adjacencyList.keys():
-            for neighborIndex in self.adjacencyList[switchIndex]:
-                if switchIndex not in self.adjacencyList[neighborIndex]:
-                    return False
-        return True
+        return self.adjacency.isSymmetric()
 
-    ## writes the adjacency matrix into a netbench .topology file format
-    def generateTopologyFileString(self):
+    ## generates the header of the netbench .topology file format
+    def generateTopologyFileHeader(self, num_nodes, num_edges):
         prefix = ""
-        topol_str = ""
-        num_edges = 0
-        for switch_id in self.adjacency_list:
-            for target_switch_id in self.adjacency_list[switch_id]:
-                link_count = int(self.adjacency_list[switch_id][target_switch_id])
-                num_edges += link_count
-                for _ in range(link_count):
-                    topol_str += "{} {}\n".format(switch_id, target_switch_id)
-        num_nodes = len(self.adjacency_list)
         assert(self.total_num_nodes == num_nodes)
         prefix += ("|V|={}".format(num_nodes) + "\n")
         prefix += ("|E|={}".format(num_edges) + "\n")
         prefix += ("Switches=set()\n\n")
         prefix += "ToRs=incl_range({},{})\n".format(0, num_nodes-1)
         prefix += "Servers=incl_range({},{})\n\n".format(0, num_nodes-1)
-        return prefix + topol_str
-    
-    def generateTrafficEventsString(self, trace_events_list):
-        str_builder = ""
-        virtual_servers_offset = 0
-        number_of_flows = 0
-        for (timestamp, src, dst, sum_bytes) in trace_events_list:
-            src_virtual = virtual_servers_offset + src
-            dst_virtual = virtual_servers_offset + dst
-            assert(src_virtual in self.adjacency_list and dst_virtual in self.adjacency_list), "{},{}".format(src_virtual,dst_virtual)
-            if src_virtual != dst_virtual:
-                str_builder += "{},{},{},{}\n".format(timestamp, int(src_virtual), int(dst_virtual), sum_bytes)
-                number_of_flows += 1
-        return str_builder, number_of_flows
+        return prefix
     
     def WriteNetBenchToRTrafficProbabilityFile(self, filename, traffic_matrix_tor_to_tor):
-        numToRs = len(self.adjacencyList.keys())
+        numToRs = self.total_num_nodes
         offset = numToRs
-        pair = 0
         normed_tm = NormalizeSquareMatrix(traffic_matrix_tor_to_tor, 1.)
-        str_builder = "#tor_pair_id,src,dst,pdf_num_bytes\n"
-        for i in range(numToRs):
-            for j in range(numToRs):
-                if i != j and normed_tm[i][j] > 0.:
-                    str_builder += ("{},{},{},{}".format(pair, i + offset, j + offset, "{:.6E}".format(normed_tm[i][j])) + "\n")
-                    pair += 1
-        str_builder += "\n"
-        with open(filename, 'w+') as f:
-            f.write(str_builder)
+        src, dst = np.nonzero(normed_tm > 0.)
+        is_pair = src != dst
+        src, dst = src[is_pair], dst[is_pair]
+        with openForWriting(filename) as f:
+            f.write("#tor_pair_id,src,dst,pdf_num_bytes\n")
+            writeFormattedRows(f, "{},{},{},{:.6E}", [np.arange(len(src)), src + offset, dst + offset, normed_tm[src, dst]])
+            f.write("\n")
         return
 
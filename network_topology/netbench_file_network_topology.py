@@ -0,0 +1,91 @@
+import os, re
+import numpy as np
+from network_topology.network_topology import *
+
+# Parses a node set of a Netbench .topology header: "incl_range(a,b)" or "set(a,b,...)"
+def parseNodeSet(value):
+    value = value.strip()
+    match = re.fullmatch(r"incl_range\((\d+),(\d+)\)", value)
+    if match: return np.arange(int(match.group(1)), int(match.group(2)) + 1, dtype=np.int64)
+    match = re.fullmatch(r"set\(([\d,\s]*)\)", value)
+    if match: return np.array([int(node) for node in match.group(1).split(",") if node.strip()], dtype=np.int64)
+    raise Exception("Unrecognized node set: {}".format(value))
+
+# Topology read back from the files of a Netbench run: the .topology file (header and one "src dst" line per directed
+# link) and the link delay file ("src,dst,latency_ns,bandwidth_gbps" lines). Links missing from the link delay file
+# have the default "link_latency" and "link_bw" of the simulation configuration (link_delay_ns and link_bandwidth_bit_per_ns).
+class NetbenchFileNetworkTopology(NetworkTopology):
+    def __init__(self, topology_filename, link_delay_filename=None, link_bw=1, link_latency=0):
+        NetworkTopology.__init__(self)
+        self.setParameters(topology_filename=topology_filename, link_delay_filename=link_delay_filename, link_bw=link_bw, link_latency=link_latency)
+        self.topology_filename = topology_filename
+        self.link_delay_filename = link_delay_filename
+        self.link_bw = link_bw
+        self.link_latency = link_latency
+        self.node_sets = {}
+        self.link_keys = np.zeros(0, dtype=np.int64)
+        self.link_latencies = np.zeros(0)
+        self.link_bandwidths = np.zeros(0)
+
+    def getName(self):
+        return os.path.splitext(os.path.basename(self.topology_filename))[0]
+
+    def getTopologyName(self):
+        return "Netbench file"
+
+    def getLinkBW(self):
+        return self.link_bw
+
+    def getServers(self):
+        return self.node_sets.get("Servers", np.zeros(0, dtype=np.int64))
+
+    def getNumServers(self):
+        return len(self.getServers())
+
+    def getNumSwitches(self):
+        return self.adjacency.getNumNodes() - self.getNumServers()
+
+    # Servers are numbered in the order of the Servers set of the header
+    def mapServerIds(self, server_ids):
+        return self.getServers()[server_ids]
+
+    def wireNetwork(self):
+        header, edge_lines = {}, []
+        with open(self.topology_filename) as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"): continue
+                if "=" in line:
+                    key, value = line.split("=", 1)
+                    header[key.strip()] = value.strip()
+                else:
+                    edge_lines.append(line)
+        num_nodes = int(header["|V|"])
+        self.node_sets = {key: parseNodeSet(header[key]) for key in ("Servers", "ToRs", "Switches") if key in header}
+        edges = np.array([line.split() for line in edge_lines], dtype=np.int64).reshape(-1, 2)
+        assert(len(edges) == int(header["|E|"])), "Expected {} links, found {}.".format(header["|E|"], len(edges))
+        # one line per parallel link
+        self.initializeAdjacency(num_nodes, accumulate=True)
+        self.addLinks(edges[:, 0], edges[:, 1], bidirectional=False)
+        self.finalizeAdjacency()
+        if self.link_delay_filename and os.path.getsize(self.link_delay_filename) > 0:
+            link_delays = np.loadtxt(self.link_delay_filename, delimiter=",", ndmin=2)
+            link_keys = link_delays[:, 0].astype(np.int64) * num_nodes + link_delays[:, 1].astype(np.int64)
+            # the last line of a link wins
+            link_keys, last_index = np.unique(link_keys[::-1], return_index=True)
+            last_index = len(link_delays) - 1 - last_index
+            self.link_keys, self.link_latencies, self.link_bandwidths = link_keys, link_delays[last_index, 2], link_delays[last_index, 3]
+
+    # Looks up the links src -> dst in the link delay file, returning their "values" or "default_value" if missing
+    def lookupLinks(self, src, dst, values, default_value):
+        src, dst = np.broadcast_arrays(np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64))
+        keys = src * self.adjacency.getNumNodes() + dst
+        position = np.minimum(np.searchsorted(self.link_keys, keys), max(0, len(self.link_keys) - 1))
+        is_listed = (self.link_keys[position] == keys) if len(self.link_keys) else np.zeros(keys.shape, dtype=bool)
+        return np.where(is_listed, values[position] if len(values) else 0., float(default_value))
+
+    def getLinkLatencies(self, src, dst, default_latency_ns=0):
+        return self.lookupLinks(src, dst, self.link_latencies, self.link_latency)
+
+    def getLinkBandwidths(self, src, dst):
+        return self.lookupLinks(src, dst, self.link_bandwidths, self.link_bw)
@@ -1,8 +1,181 @@
-import sys
+import os, sys, io, contextlib
+import numpy as np
+from experiment_inputs import checkParameters
+
+# Number of lines formatted and written at once by the streaming file writers.
+WRITE_CHUNK_SIZE = 1 << 16
+# Bound on the number of (source, edge) pairs expanded at once by the shortest path searches
+PATH_SEARCH_BATCH_SIZE = 1 << 22
+# Directory of the path engines saved by default, shared by the generation, simulation and analysis of the experiments
+PATH_CACHE_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + "/temp/.path_cache"
+
+# Yields a writable text file object given either a path or an already opened file object.
+@contextlib.contextmanager
+def openForWriting(path_or_fileobj):
+    if hasattr(path_or_fileobj, "write"):
+        yield path_or_fileobj
+    else:
+        with open(path_or_fileobj, "w+", buffering=1 << 20) as f:
+            yield f
+
+# Writes the rows of the given integer columns as lines of "fmt" (e.g. "{} {}") in buffered chunks.
+def writeFormattedRows(f, fmt, columns, chunk_size=WRITE_CHUNK_SIZE):
+    formatter = (fmt + "\n").format
+    num_rows = len(columns[0]) if columns else 0
+    for start in range(0, num_rows, chunk_size):
+        chunk = [column[start:start+chunk_size].tolist() for column in columns]
+        f.write("".join(map(formatter, *chunk)))
+
+# Returns the offsets of the concatenated ranges [starts[i], starts[i] + counts[i]), e.g. the CSR entries of a set of rows.
+def expandRanges(starts, counts):
+    return np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(int(np.sum(counts)), dtype=np.int64)
+
+# Digit-wise difference (a - b) mod radix of the base-"radix" representations of a and b over "num_digits" digits.
+def subtractDigits(a, b, radix, num_digits):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64))
+    difference = np.zeros(a.shape, dtype=np.int64)
+    for digit in range(num_digits):
+        digit_weight = radix ** digit
+        difference += ((a // digit_weight - b // digit_weight) % radix) * digit_weight
+    return difference
+
+# Normalize the sum of all entries in a square matrix to 'norm'
+def NormalizeSquareMatrix(matrix, norm):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return matrix * (float(norm) / matrix.sum())
+
+# Sparse (CSR) adjacency structure of a directed multigraph. Links are registered in bulk while
+# a topology is being wired and compressed once by finalize(), so that memory and time scale with
+# the number of links instead of the square of the number of nodes.
+class SparseAdjacency(object):
+    def __init__(self, num_nodes, accumulate=False):
+        self.num_nodes = int(num_nodes)
+        # accumulate=True sums the multiplicities of repeated (src, dst) entries (i.e. parallel links),
+        # otherwise the last assignment wins, which mirrors "adjacency_matrix[src][dst] = multiplicity".
+        self.accumulate = accumulate
+        self.src_chunks = []
+        self.dst_chunks = []
+        self.multiplicity_chunks = []
+        self.indptr = None
+        self.indices = None
+        self.multiplicity = None
+
+    # Registers the links src[i] -> dst[i] (and dst[i] -> src[i] if bidirectional). Arguments can be
+    # scalars or arrays and are broadcast against each other.
+    def addLinks(self, src, dst, multiplicity=1, bidirectional=True):
+        assert(self.indptr is None), "Cannot add links to a finalized adjacency."
+        src, dst, multiplicity = np.broadcast_arrays(np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64), np.asarray(multiplicity, dtype=np.int64))
+        src, dst, multiplicity = src.ravel(), dst.ravel(), multiplicity.ravel()
+        if src.size == 0: return
+        assert(src.min() >= 0 and dst.min() >= 0 and src.max() < self.num_nodes and dst.max() < self.num_nodes), "Link endpoint out of range."
+        self.src_chunks.append(src)
+        self.dst_chunks.append(dst)
+        self.multiplicity_chunks.append(multiplicity)
+        if bidirectional:
+            self.src_chunks.append(dst)
+            self.dst_chunks.append(src)
+            self.multiplicity_chunks.append(multiplicity)
+
+    # Compresses all registered links into CSR form with rows and columns sorted by node id.
+    def finalize(self):
+        if self.indptr is not None: return
+        if self.src_chunks:
+            keys = np.concatenate(self.src_chunks) * self.num_nodes + np.concatenate(self.dst_chunks)
+            multiplicity = np.concatenate(self.multiplicity_chunks)
+        else:
+            keys, multiplicity = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if self.accumulate:
+            keys, inverse = np.unique(keys, return_inverse=True)
+            summed_multiplicity = np.zeros(len(keys), dtype=np.int64)
+            np.add.at(summed_multiplicity, inverse.ravel(), multiplicity)
+            multiplicity = summed_multiplicity
+        else:
+            order = np.argsort(keys, kind="stable")
+            keys, multiplicity = keys[order], multiplicity[order]
+            is_last = np.ones(len(keys), dtype=bool)
+            is_last[:-1] = keys[1:] != keys[:-1]
+            keys, multiplicity = keys[is_last], multiplicity[is_last]
+        # a zero entry in the adjacency matrix means that there is no link
+        keys, multiplicity = keys[multiplicity != 0], multiplicity[multiplicity != 0]
+        src = keys // self.num_nodes
+        self.indptr = np.zeros(self.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=self.num_nodes), out=self.indptr[1:])
+        self.indices = keys % self.num_nodes
+        self.multiplicity = multiplicity
+        self.src_chunks, self.dst_chunks, self.multiplicity_chunks = [], [], []
+
+    def getNumNodes(self):
+        return self.num_nodes
+
+    # Number of directed (src, dst) pairs that are connected, ignoring multiplicity.
+    def getNumEntries(self):
+        return len(self.indices)
+
+    # Number of directed links, counting parallel links separately.
+    def getNumEdges(self):
+        return int(self.multiplicity.sum())
+
+    def getNeighbors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node+1]]
+
+    def getMultiplicities(self, node):
+        return self.multiplicity[self.indptr[node]:self.indptr[node+1]]
+
+    # Sum of the multiplicities of all outgoing links of each node (the row sums of the adjacency matrix).
+    def getDegrees(self):
+        src, _, multiplicity = self.getEdgeArrays()
+        return np.bincount(src, weights=multiplicity, minlength=self.num_nodes).astype(np.int64)
+
+    # Returns the (src, dst, multiplicity) arrays of all connected pairs in CSR order.
+    def getEdgeArrays(self):
+        src = np.repeat(np.arange(self.num_nodes, dtype=np.int64), np.diff(self.indptr))
+        return src, self.indices, self.multiplicity
+
+    def hasLink(self, src, dst):
+        neighbors = self.getNeighbors(src)
+        pos = np.searchsorted(neighbors, dst)
+        return bool(pos < len(neighbors) and neighbors[pos] == dst)
+
+    def isSymmetric(self):
+        src, dst, multiplicity = self.getEdgeArrays()
+        forward = src * self.num_nodes + dst
+        backward = dst * self.num_nodes + src
+        order = np.argsort(backward)
+        return bool(np.array_equal(forward, backward[order]) and np.array_equal(multiplicity, multiplicity[order]))
+
+    def toAdjacencyList(self):
+        adjacency_list = {}
+        indices, multiplicity = self.indices.tolist(), self.multiplicity.tolist()
+        indptr = self.indptr.tolist()
+        for node in range(self.num_nodes):
+            start, end = indptr[node], indptr[node+1]
+            adjacency_list[node] = dict(zip(indices[start:end], multiplicity[start:end]))
+        return adjacency_list
+
+    # Materializes the dense adjacency matrix restricted to the first "num_rows" nodes. Only meant for
+    # small topologies or debugging; the wiring itself never needs it.
+    def toDenseMatrix(self, num_rows=None):
+        num_rows = self.num_nodes if num_rows is None else num_rows
+        matrix = np.zeros((num_rows, num_rows), dtype=np.int64)
+        src, dst, multiplicity = self.getEdgeArrays()
+        mask = (src < num_rows) & (dst < num_rows)
+        matrix[src[mask], dst[mask]] = multiplicity[mask]
+        return matrix
 
 class NetworkTopology(object):
     def __init__(self):
         self.adjacency_list = {}
+        self.adjacency = None
+        self.path_engine = None
+
+    # Records the parameters the topology is built from (the arguments of its constructor), which key its files in the
+    # experiment manifest. They must be plain (JSON) values.
+    def setParameters(self, **parameters):
+        self.parameters = checkParameters(type(self).__name__, parameters)
+
+    def getParameters(self):
+        if not hasattr(self, "parameters"): raise Exception("{} does not record its parameters.".format(type(self).__name__))
+        return dict(self.parameters)
 
     # An abstract function called by external user to wire the network together.
     def wireNetwork(self):
@@ -19,21 +192,174 @@ class NetworkTopology(object):
     def generateLinkDelayFileString(self):
         # should be overwritten by child class if child class wishes to provide different link delays/bandwidths for topology
         return ""
-    
+
     def getName(self):
         raise Exception("Child classes must override this method.")
 
     def getLinkBW(self):
         raise Exception("Child classes must override this method.")
-    
+
+    # Creates an empty sparse adjacency that child classes fill with addLinks() during wiring.
+    def initializeAdjacency(self, num_nodes, accumulate=False):
+        self.adjacency = SparseAdjacency(num_nodes, accumulate=accumulate)
+        self.adjacency_list = {}
+
+    def addLinks(self, src, dst, multiplicity=1, bidirectional=True):
+        self.adjacency.addLinks(src, dst, multiplicity, bidirectional)
+
+    # Compresses the registered links and derives the adjacency list from them.
+    def finalizeAdjacency(self):
+        self.adjacency.finalize()
+        self.adjacency_list = self.adjacency.toAdjacencyList()
+
+    def getAdjacency(self):
+        return self.adjacency
+
+    # Returns the header of the Netbench .topology file (|V|, |E|, ToRs, Servers and Switches lines).
+    def generateTopologyFileHeader(self, num_nodes, num_edges):
+        raise Exception("Child classes must override this method.")
+
+    # Streams the Netbench .topology file to "path_or_fileobj". The header only depends on counts that
+    # are known up front, and the edges (one line per parallel link) are formatted in bulk from the CSR arrays.
+    def writeTopologyFile(self, path_or_fileobj):
+        num_nodes, num_edges = self.adjacency.getNumNodes(), self.adjacency.getNumEdges()
+        src, dst, multiplicity = self.adjacency.getEdgeArrays()
+        if np.any(multiplicity != 1):
+            src, dst = np.repeat(src, multiplicity), np.repeat(dst, multiplicity)
+        with openForWriting(path_or_fileobj) as f:
+            f.write(self.generateTopologyFileHeader(num_nodes, num_edges))
+            writeFormattedRows(f, "{} {}", [src, dst])
+
+    # Generates the topology string used for netbench.
+    def generateTopologyFileString(self):
+        str_builder = io.StringIO()
+        self.writeTopologyFile(str_builder)
+        return str_builder.getvalue()
+
+    # Maps the server (CU) ids used by the traffic generators to node ids in this topology.
+    # Child classes override this if their servers are not the first nodes of the topology.
+    def mapServerIds(self, server_ids):
+        return server_ids
+
+    # Writes the traffic arrival events to the Netbench flow arrivals file "path_or_fileobj" in buffered
+    # blocks and returns the number of flows written. Server ids are remapped and validated with
+    # vectorized operations, and self-flows (after remapping) are dropped.
+    def writeTrafficEventsFile(self, traffic_arrival_events, path_or_fileobj):
+        if hasattr(traffic_arrival_events, "getTimes"):
+            timestamps, src, dst, num_bytes = traffic_arrival_events.getTimes(), traffic_arrival_events.getSources(), traffic_arrival_events.getDestinations(), traffic_arrival_events.getBytes()
+        else:
+            timestamps, src, dst, num_bytes = np.array(list(traffic_arrival_events), dtype=np.int64).reshape(-1, 4).T
+        src = self.mapServerIds(np.asarray(src, dtype=np.int64))
+        dst = self.mapServerIds(np.asarray(dst, dtype=np.int64))
+        num_nodes = len(self.adjacency_list)
+        invalid = (src < 0) | (src >= num_nodes) | (dst < 0) | (dst >= num_nodes)
+        assert(not np.any(invalid)), "{},{}".format(src[invalid][0], dst[invalid][0])
+        is_flow = src != dst
+        with openForWriting(path_or_fileobj) as f:
+            writeFormattedRows(f, "{},{},{},{}", [timestamps[is_flow], src[is_flow], dst[is_flow], num_bytes[is_flow]])
+        return int(np.count_nonzero(is_flow))
+
+    # Generates the flow arrivals string used for netbench, along with the number of flows.
+    def generateTrafficEventsString(self, trace_events_list):
+        str_builder = io.StringIO()
+        number_of_flows = self.writeTrafficEventsFile(trace_events_list, str_builder)
+        return str_builder.getvalue(), number_of_flows
+
+    # Returns the role of each node of "nodes" ("server" or "switch"), used to label the links in the analysis of the
+    # Netbench logs. Child classes override this (or getLinkRoles) to tell their switch tiers or link levels apart.
+    def getNodeRoles(self, nodes):
+        nodes = np.asarray(nodes, dtype=np.int64)
+        servers = self.mapServerIds(np.arange(self.getNumServers(), dtype=np.int64))
+        return np.where(np.isin(nodes, servers), "server", "switch")
+
+    # Returns the role of each directed link src -> dst, by default made of the roles of its endpoints (e.g. "server->switch").
+    def getLinkRoles(self, src, dst):
+        return np.char.add(np.char.add(self.getNodeRoles(src), "->"), self.getNodeRoles(dst))
+
+    # Returns the latency (ns) of each directed link src -> dst, as written to the link delay file. Topologies that leave
+    # the link latency to the Netbench configuration use "default_latency_ns".
+    def getLinkLatencies(self, src, dst, default_latency_ns=0):
+        return np.full(np.broadcast(np.asarray(src), np.asarray(dst)).shape, float(default_latency_ns))
+
+    # Returns the bandwidth (Gbps) of each directed link src -> dst
+    def getLinkBandwidths(self, src, dst):
+        return np.full(np.broadcast(np.asarray(src), np.asarray(dst)).shape, float(self.getLinkBW()))
+
+    # Returns the total bandwidth (Gbps) of the outgoing and of the incoming links of each node, parallel links included
+    def getNodeBandwidths(self):
+        src, dst, multiplicity = self.adjacency.getEdgeArrays()
+        link_bandwidths = multiplicity * self.getLinkBandwidths(src, dst)
+        num_nodes = self.adjacency.getNumNodes()
+        return np.bincount(src, link_bandwidths, minlength=num_nodes), np.bincount(dst, link_bandwidths, minlength=num_nodes)
+
+    # Breadth-first search over the CSR adjacency from each node of "sources" (batched, one frontier for all the sources of
+    # a batch). Returns three (len(sources), num_nodes) arrays describing the shortest (minimum hop) paths: their hop count
+    # (-1 if unreachable), their latency (ns, the lowest among the shortest paths) and their bottleneck bandwidth (Gbps, the
+    # highest among the shortest paths).
+    def computeShortestPathMetrics(self, sources, default_latency_ns=0):
+        sources = np.asarray(sources, dtype=np.int64)
+        num_nodes, indptr, indices = self.adjacency.getNumNodes(), self.adjacency.indptr, self.adjacency.indices
+        edge_src, edge_dst, _ = self.adjacency.getEdgeArrays()
+        edge_latencies = self.getLinkLatencies(edge_src, edge_dst, default_latency_ns)
+        edge_bandwidths = self.getLinkBandwidths(edge_src, edge_dst)
+        hops = np.full((len(sources), num_nodes), -1, dtype=np.int64)
+        latencies = np.full((len(sources), num_nodes), np.inf)
+        bandwidths = np.zeros((len(sources), num_nodes))
+        batch_size = max(1, PATH_SEARCH_BATCH_SIZE // max(1, len(indices)))
+        for batch_start in range(0, len(sources), batch_size):
+            batch = np.arange(batch_start, min(batch_start + batch_size, len(sources)), dtype=np.int64)
+            batch_hops, batch_latencies, batch_bandwidths = hops[batch].reshape(-1), latencies[batch].reshape(-1), bandwidths[batch].reshape(-1)
+            # frontier of (row in batch, node) states, flattened as row * num_nodes + node
+            frontier = np.arange(len(batch), dtype=np.int64) * num_nodes + sources[batch]
+            batch_hops[frontier], batch_latencies[frontier], batch_bandwidths[frontier] = 0, 0., np.inf
+            level = 0
+            while len(frontier):
+                level += 1
+                rows, nodes = frontier // num_nodes, frontier % num_nodes
+                # edges leaving the frontier nodes
+                degrees = indptr[nodes + 1] - indptr[nodes]
+                edges = expandRanges(indptr[nodes], degrees)
+                parents = np.repeat(frontier, degrees)
+                children = np.repeat(rows, degrees) * num_nodes + indices[edges]
+                is_new = batch_hops[children] == -1
+                edges, parents, children = edges[is_new], parents[is_new], children[is_new]
+                np.minimum.at(batch_latencies, children, batch_latencies[parents] + edge_latencies[edges])
+                np.maximum.at(batch_bandwidths, children, np.minimum(batch_bandwidths[parents], edge_bandwidths[edges]))
+                frontier = np.unique(children)
+                batch_hops[frontier] = level
+            hops[batch], latencies[batch], bandwidths[batch] = batch_hops.reshape(len(batch), -1), batch_latencies.reshape(len(batch), -1), batch_bandwidths.reshape(len(batch), -1)
+        return hops, latencies, bandwidths
+
+    # Returns a (len(sources), num_nodes) array whose row i maps every node to its image under an automorphism of the topology
+    # taking the node sources[i] to the first server, or None if the topology has no such symmetry. Child classes whose
+    # servers are all alike (e.g. tori) override this, so that the path engine only searches paths from the first server.
+    def getNodeTranslations(self, sources):
+        return None
+
+    # Returns the path engine (see path_engine.py) of the wired topology, built on the first call. The engine is saved to
+    # <cache_directory>/<getName()>.npz and reloaded from there as long as the adjacency is unchanged (no cache with None).
+    def getPathEngine(self, cache_directory=PATH_CACHE_DIRECTORY, k=2):
+        from network_topology.path_engine import PathEngine
+        if self.path_engine is None or self.path_engine.k != k or self.path_engine.adjacency is not self.adjacency:
+            cache_filename = "{}/{}.npz".format(cache_directory, self.getName()) if cache_directory else None
+            self.path_engine = PathEngine(self, k, cache_filename)
+            if cache_filename is None or not self.path_engine.load(cache_filename): self.path_engine.build()
+        return self.path_engine
+
+    # Dense view of the adjacency, built on demand from the sparse representation.
+    def getAdjacencyMatrix(self):
+        return self.adjacency.toDenseMatrix()
+
     def getNumLinks(self):
         # return number of bidirectional links
+        if self.adjacency is not None and self.adjacency.indptr is not None:
+            return self.adjacency.getNumEdges() // 2
         link_count = 0
         for src in self.adjacency_list.keys():
             for dst in self.adjacency_list[src]:
                 link_count += self.adjacency_list[src][dst]
         return link_count // 2 # bidirectional
-    
+
     def getNumTransceivers(self):
         # if not specified otherwise, the number of transceivers = num bidirectional links * 2
         # if needed, implement in child class to inherit
@@ -45,9 +371,9 @@ class NetworkTopology(object):
         nodes = set()
         while stack:
             node = stack.pop(0)
-            for neighbor in self.adjacency_list[node].keys(): 
+            for neighbor in self.adjacency_list[node].keys():
                 if neighbor not in nodes:
                     stack.append(neighbor)
                 nodes.add(neighbor)
         assert(len(nodes) == len(set(self.adjacency_list.keys())))
-        assert(nodes == set(self.adjacency_list.keys()))
\ No newline at end of file
+        assert(nodes == set(self.adjacency_list.keys()))
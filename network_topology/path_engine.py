@@ -0,0 +1,230 @@
+import os, heapq, hashlib
+import numpy as np
+from network_topology.network_topology import *
+
+# Version of the layout of the path engine cache files, checked when loading them
+PATH_ENGINE_VERSION = 1
+
+# Hash of the CSR adjacency of a topology, identifying the topology a cached path engine was built for
+def computeAdjacencyDigest(adjacency):
+    hasher = hashlib.sha256()
+    for array in (adjacency.indptr, adjacency.indices, adjacency.multiplicity):
+        hasher.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+    return hasher.hexdigest()
+
+# Returns the CSR entry of the link src -> dst
+def findLinkEntry(adjacency, src, dst):
+    return adjacency.indptr[src] + int(np.searchsorted(adjacency.getNeighbors(src), dst))
+
+# Breadth-first search of a shortest (minimum hop) path src -> dst that avoids the banned nodes and CSR entries. Ties are
+# broken towards the lowest node ids, so that paths are deterministic. Returns the nodes of the path, or None if dst is
+# unreachable.
+def findShortestPath(adjacency, src, dst, is_node_banned=None, is_entry_banned=None):
+    indptr, indices = adjacency.indptr, adjacency.indices
+    parents = np.full(adjacency.getNumNodes(), -1, dtype=np.int64)
+    is_visited = np.zeros(adjacency.getNumNodes(), dtype=bool) if is_node_banned is None else is_node_banned.copy()
+    is_visited[src] = True
+    frontier = np.array([src], dtype=np.int64)
+    while not is_visited[dst]:
+        degrees = indptr[frontier + 1] - indptr[frontier]
+        entries = expandRanges(indptr[frontier], degrees)
+        frontier_parents = np.repeat(frontier, degrees)
+        if is_entry_banned is not None:
+            entries, frontier_parents = entries[~is_entry_banned[entries]], frontier_parents[~is_entry_banned[entries]]
+        children = indices[entries]
+        is_new = ~is_visited[children]
+        if not np.any(is_new): return None
+        # the frontier is sorted, so the first occurrence of a child comes from its lowest parent
+        frontier, first_index = np.unique(children[is_new], return_index=True)
+        parents[frontier] = frontier_parents[is_new][first_index]
+        is_visited[frontier] = True
+    path = [dst]
+    while path[-1] != src: path.append(int(parents[path[-1]]))
+    return np.array(path[::-1], dtype=np.int64)
+
+# Yen's algorithm: the k shortest loopless paths src -> dst (by hop count, ties broken lexicographically)
+def findKShortestPaths(adjacency, src, dst, k):
+    path = findShortestPath(adjacency, src, dst)
+    if path is None: return []
+    paths, candidates, seen = [path], [], {tuple(path)}
+    while len(paths) < k:
+        previous_path = paths[-1]
+        for spur_index in range(len(previous_path) - 1):
+            root = previous_path[:spur_index + 1]
+            # leave the root through links that the paths found so far do not use, without revisiting the root
+            is_entry_banned = np.zeros(adjacency.getNumEntries(), dtype=bool)
+            for found_path in paths:
+                if len(found_path) > spur_index + 1 and np.array_equal(found_path[:spur_index + 1], root):
+                    is_entry_banned[findLinkEntry(adjacency, found_path[spur_index], found_path[spur_index + 1])] = True
+            is_node_banned = np.zeros(adjacency.getNumNodes(), dtype=bool)
+            is_node_banned[root[:-1]] = True
+            spur_path = findShortestPath(adjacency, root[-1], dst, is_node_banned, is_entry_banned)
+            if spur_path is None: continue
+            candidate = tuple(root[:-1]) + tuple(spur_path)
+            if candidate not in seen:
+                seen.add(candidate)
+                heapq.heappush(candidates, (len(candidate), candidate))
+        if not candidates: break
+        paths.append(np.array(heapq.heappop(candidates)[1], dtype=np.int64))
+    return paths
+
+# Packs lists of paths into a (len(path_lists), k, max path length) array padded with -1
+def packPaths(path_lists, k):
+    max_length = max([len(path) for paths in path_lists for path in paths] + [1])
+    packed_paths = np.full((len(path_lists), k, max_length), -1, dtype=np.int32)
+    for i, paths in enumerate(path_lists):
+        for j, path in enumerate(paths): packed_paths[i, j, :len(path)] = path
+    return packed_paths
+
+# Shortest paths between the servers of a wired topology. The build computes the hop counts from every server to every node
+# (hop counts are symmetric, since the links are bidirectional), from which the equal-cost (ECMP) next hops and paths
+# towards a server follow hop by hop. The k shortest paths (Yen) used by the "ksp" routing scheme are searched on the first
+# query. Topologies with translation symmetries (see NetworkTopology.getNodeTranslations()) are only searched from their
+# first server, and the results are mapped to the other servers by the automorphisms; the k shortest paths of the other
+# topologies are searched per pair and memoized. Engines are saved to and loaded from "cache_filename" (if given), see
+# NetworkTopology.getPathEngine().
+class PathEngine(object):
+    def __init__(self, topology, k=2, cache_filename=None):
+        self.topology = topology
+        self.k = k
+        self.cache_filename = cache_filename
+        self.adjacency = topology.getAdjacency()
+        self.servers = topology.mapServerIds(np.arange(topology.getNumServers(), dtype=np.int64))
+        self.server_index = np.full(self.adjacency.getNumNodes(), -1, dtype=np.int64)
+        self.server_index[self.servers] = np.arange(len(self.servers), dtype=np.int64)
+        self.hops = None
+        self.translations = None
+        self.inverse_translations = None
+        self.k_shortest_paths = None
+        self.k_shortest_path_memo = {}
+
+    # Node images under the automorphisms of the topology (if any) taking each server to the first one, and their inverses
+    def computeTranslations(self):
+        translations = self.topology.getNodeTranslations(self.servers)
+        if translations is None: return
+        self.translations = translations.astype(np.int32)
+        self.inverse_translations = np.empty_like(self.translations)
+        np.put_along_axis(self.inverse_translations, self.translations.astype(np.int64),
+                          np.broadcast_to(np.arange(self.adjacency.getNumNodes(), dtype=np.int32), self.translations.shape), axis=1)
+
+    def build(self):
+        assert(self.adjacency.isSymmetric()), "The path engine requires bidirectional links."
+        self.computeTranslations()
+        if self.translations is not None:
+            base_hops = self.topology.computeShortestPathMetrics(self.servers[:1])[0][0]
+            self.hops = base_hops[self.translations].astype(np.int16)
+        else:
+            self.hops = self.topology.computeShortestPathMetrics(self.servers)[0].astype(np.int16)
+        if self.cache_filename: self.save(self.cache_filename)
+        return self
+
+    # Search the k shortest paths from the first server to all the servers (topologies with translation symmetries only)
+    def buildKShortestPaths(self):
+        self.k_shortest_paths = packPaths([findKShortestPaths(self.adjacency, self.servers[0], dst, self.k) for dst in self.servers], self.k)
+        if self.cache_filename: self.save(self.cache_filename)
+
+    def save(self, filename):
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        # write the file atomically, since several processes may share the cache directory
+        temporary_filename = "{}.{}.tmp.npz".format(filename, os.getpid())
+        np.savez(temporary_filename, version=PATH_ENGINE_VERSION, digest=computeAdjacencyDigest(self.adjacency), k=self.k, hops=self.hops,
+                 k_shortest_paths=self.k_shortest_paths if self.k_shortest_paths is not None else np.zeros((0, self.k, 0), dtype=np.int32))
+        os.replace(temporary_filename, filename)
+
+    # Loads the engine saved in "filename", returning whether it was built for this topology and k
+    def load(self, filename):
+        if not os.path.isfile(filename): return False
+        with np.load(filename, allow_pickle=False) as saved:
+            if int(saved["version"]) != PATH_ENGINE_VERSION or str(saved["digest"]) != computeAdjacencyDigest(self.adjacency) or int(saved["k"]) != self.k:
+                return False
+            self.hops, k_shortest_paths = saved["hops"], saved["k_shortest_paths"]
+        self.computeTranslations()
+        self.k_shortest_paths = k_shortest_paths if self.translations is not None and len(k_shortest_paths) else None
+        return True
+
+    # Returns the (len(dst), num_nodes) hop counts from every node to each server of "dst"
+    def getHopsToServers(self, dst):
+        server_index = self.server_index[np.asarray(dst, dtype=np.int64)]
+        assert(np.all(server_index >= 0)), "Paths are only computed towards servers."
+        return self.hops[server_index]
+
+    # Returns the hop counts of the shortest paths src -> dst (-1 if unreachable), for any node src and server dst
+    def getHopCounts(self, src, dst):
+        src, dst = np.broadcast_arrays(np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64))
+        return self.hops[self.server_index[dst], src].astype(np.int64)
+
+    # Returns the next hops of "node" on the shortest paths towards the server "dst"
+    def getECMPNextHops(self, node, dst):
+        hops_to_dst = self.getHopsToServers([dst])[0]
+        neighbors = self.adjacency.getNeighbors(node)
+        return neighbors[hops_to_dst[neighbors] == hops_to_dst[node] - 1]
+
+    # Returns all the shortest paths src -> dst as a (num_paths, num_hops + 1) array, sorted lexicographically
+    def getEqualCostPaths(self, src, dst):
+        hops_to_dst = self.getHopsToServers([dst])[0]
+        if hops_to_dst[src] < 0: return np.zeros((0, 0), dtype=np.int64)
+        indptr, indices = self.adjacency.indptr, self.adjacency.indices
+        paths = np.array([[src]], dtype=np.int64)
+        for _ in range(hops_to_dst[src]):
+            last_nodes = paths[:, -1]
+            degrees = indptr[last_nodes + 1] - indptr[last_nodes]
+            next_nodes = indices[expandRanges(indptr[last_nodes], degrees)]
+            paths = np.repeat(paths, degrees, axis=0)
+            is_next_hop = hops_to_dst[next_nodes] == hops_to_dst[paths[:, -1]] - 1
+            paths = np.column_stack((paths[is_next_hop], next_nodes[is_next_hop]))
+        return paths
+
+    # Returns the k shortest paths src -> dst between two servers (fewer if there are not as many loopless paths)
+    def getKShortestPaths(self, src, dst):
+        if self.translations is not None:
+            if self.k_shortest_paths is None: self.buildKShortestPaths()
+            source_index = self.server_index[src]
+            packed_paths = self.k_shortest_paths[self.server_index[self.translations[source_index, dst]]]
+            return [self.inverse_translations[source_index, path[path >= 0]].astype(np.int64) for path in packed_paths if path[0] >= 0]
+        if (src, dst) not in self.k_shortest_path_memo:
+            self.k_shortest_path_memo[(src, dst)] = findKShortestPaths(self.adjacency, src, dst, self.k)
+        return self.k_shortest_path_memo[(src, dst)]
+
+    # Yields the (pair, CSR entry, fraction of the pair traffic) triplets splitting the traffic of each (src[i], dst[i]) pair
+    # over its shortest paths like ECMP: evenly over the next hops at every node, parallel links included. Pairs are routed
+    # hop by hop in batches, so that about PATH_SEARCH_BATCH_SIZE candidate next hops are expanded at once.
+    def iterateECMPFractions(self, src, dst):
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        num_nodes, indptr, indices, multiplicity = self.adjacency.getNumNodes(), self.adjacency.indptr, self.adjacency.indices, self.adjacency.multiplicity
+        server_index = self.server_index[dst]
+        assert(np.all(server_index >= 0)), "Paths are only computed towards servers."
+        batch_size = max(1, PATH_SEARCH_BATCH_SIZE // (max(1, int(np.diff(indptr).max())) * max(1, int(self.hops.max()))))
+        for batch_start in range(0, len(src), batch_size):
+            batch = np.arange(batch_start, min(batch_start + batch_size, len(src)), dtype=np.int64)
+            # (pair, node, fraction of the pair traffic through the node) states, one hop closer to the destination per round
+            state_pairs = batch[self.hops[server_index[batch], src[batch]] > 0]
+            state_nodes, state_fractions = src[state_pairs], np.ones(len(state_pairs))
+            while len(state_pairs):
+                degrees = indptr[state_nodes + 1] - indptr[state_nodes]
+                links = expandRanges(indptr[state_nodes], degrees)
+                states = np.repeat(np.arange(len(state_pairs), dtype=np.int64), degrees)
+                pairs, next_nodes = state_pairs[states], indices[links]
+                is_next_hop = self.hops[server_index[pairs], next_nodes] == self.hops[server_index[pairs], state_nodes[states]] - 1
+                links, states, pairs, next_nodes = links[is_next_hop], states[is_next_hop], pairs[is_next_hop], next_nodes[is_next_hop]
+                weights = multiplicity[links].astype(np.float64)
+                fractions = state_fractions[states] * weights / np.bincount(states, weights, minlength=len(state_pairs))[states]
+                yield pairs, links, fractions
+                is_forwarded = next_nodes != dst[pairs]
+                next_states, inverse = np.unique(pairs[is_forwarded] * num_nodes + next_nodes[is_forwarded], return_inverse=True)
+                state_pairs, state_nodes = next_states // num_nodes, next_states % num_nodes
+                state_fractions = np.bincount(inverse.ravel(), fractions[is_forwarded], minlength=len(next_states))
+
+    # Returns the (pair, CSR entry, fraction of the pair traffic) triplets of the ECMP splits of the pairs, see iterateECMPFractions()
+    def computeECMPFractions(self, src, dst):
+        triplets = list(self.iterateECMPFractions(src, dst))
+        if not triplets: return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return tuple(np.concatenate(column) for column in zip(*triplets))
+
+    # Returns the load of every CSR entry when each pair (src[i], dst[i]) sends weights[i] (e.g. bits) split like ECMP,
+    # without holding the splits of all the pairs at once
+    def computeECMPLinkLoads(self, src, dst, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        loads = np.zeros(self.adjacency.getNumEntries())
+        for pairs, links, fractions in self.iterateECMPFractions(src, dst):
+            loads += np.bincount(links, weights[pairs] * fractions, minlength=len(loads))
+        return loads
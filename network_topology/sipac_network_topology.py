@@ -1,9 +1,11 @@
 import itertools, pprint
+import numpy as np
 from network_topology.network_topology import *
 
 class SiPACNetworkTopology(NetworkTopology):
     def __init__(self, r, l, link_bw, link_latency, num_wavelengths_per_pair=1):
         NetworkTopology.__init__(self)
+        self.setParameters(r=r, l=l, link_bw=link_bw, link_latency=link_latency, num_wavelengths_per_pair=num_wavelengths_per_pair)
         self.name = "sipac"
         self.switch_radix = r
         self.num_levels = l + 1
@@ -16,7 +18,6 @@ class SiPACNetworkTopology(NetworkTopology):
         self.num_gpus = r ** (l+1) # total number of gpus in the topology
         self.gpus = [list(range(i*self.num_gpus_per_group, (i+1)*self.num_gpus_per_group)) for i in range(self.num_groups)]
         self.total_num_optical_switches = r ** l * (l + 1) # not counting the nvswitches. Originally: (r ** l * (l + 1))
-        self.adjacency_matrix = [[0]*(self.num_gpus) for _ in range(self.num_gpus)]
         self.total_num_links = self.total_num_optical_switches * self.switch_radix # physically not logically
         # Links
         self.num_wavelengths_per_pair = num_wavelengths_per_pair
@@ -55,20 +56,13 @@ class SiPACNetworkTopology(NetworkTopology):
     def getLinkBW(self):
         return self.link_bw
     
-    def getAdjacencyMatrix(self):
-        return self.adjacency_matrix
-    
     def designIntraGroupTopology(self):
         # V1: exactly like a level-0 bcube
         # All GPUs connect to a non-blocking OCS which is effectively an all-to-all fullmesh
-        self.gpu_groups = []
-        for i in range(self.num_groups):
-            self.gpu_groups.append(list(range(i*self.num_gpus_per_group, (i+1)*self.num_gpus_per_group)))
-            for j in range(i*self.num_gpus_per_group, (i+1)*self.num_gpus_per_group):
-                for k in range(j, (i+1)*self.num_gpus_per_group):
-                    if j != k:
-                        self.adjacency_matrix[j][k] = self.num_wavelengths_per_pair
-                        self.adjacency_matrix[k][j] = self.num_wavelengths_per_pair
+        self.gpu_groups = [list(range(i*self.num_gpus_per_group, (i+1)*self.num_gpus_per_group)) for i in range(self.num_groups)]
+        gpu_groups = np.array(self.gpu_groups, dtype=np.int64)
+        src_index, dst_index = np.triu_indices(self.num_gpus_per_group, k=1)
+        self.addLinks(gpu_groups[:, src_index], gpu_groups[:, dst_index], self.num_wavelengths_per_pair)
         return
 
     def designInterGroupTopology(self, level):
@@ -85,60 +79,50 @@ class SiPACNetworkTopology(NetworkTopology):
     def connectSameIndexNodes(self, group_list):
         # group_list is a list of lists with same length
         # this function connects the nodes of the same index in each of the lists in a full mesh
-        num_gpus_per_group = len(group_list[0])
-        for gpu_id in range(num_gpus_per_group):
-            for src_group_id in range(len(group_list)):
-                src_gpu = group_list[src_group_id][gpu_id]
-                for dst_group_id in range(src_group_id+1, len(group_list)):
-                    dst_gpu = group_list[dst_group_id][gpu_id]
-                    assert(src_group_id != dst_group_id and src_gpu != dst_gpu)
-                    self.adjacency_matrix[src_gpu][dst_gpu] = self.num_wavelengths_per_pair
-                    self.adjacency_matrix[dst_gpu][src_gpu] = self.num_wavelengths_per_pair
+        group_array = np.array(group_list, dtype=np.int64)
+        src_group_ids, dst_group_ids = np.triu_indices(len(group_list), k=1)
+        src_gpus, dst_gpus = group_array[src_group_ids], group_array[dst_group_ids]
+        assert(not np.any(src_gpus == dst_gpus))
+        self.addLinks(src_gpus, dst_gpus, self.num_wavelengths_per_pair)
     
     def wireNetwork(self):
         print("[Setup] Wiring SiPAC network.")
+        # All servers (GPUs) overlap with ToRs
+        self.initializeAdjacency(self.num_gpus)
         self.designIntraGroupTopology()
         for level in range(1, self.num_levels):
             self.designInterGroupTopology(level)
-        # All servers (GPUs) overlap with ToRs
-        for src in range(len(self.adjacency_matrix)):
-            self.adjacency_list[src] = {}
-            # add destination switches
-            for dst in range(len(self.adjacency_matrix[src])):
-                if self.adjacency_matrix[src][dst] != 0:
-                    self.adjacency_list[src][dst] = self.adjacency_matrix[src][dst]
+        self.finalizeAdjacency()
     
-    # Generates the topology string used for netbench.
-    def generateTopologyFileString(self):
+    # A link of level l connects two GPUs whose ids, written in base r, only differ in their l-th digit
+    # (level 0 links are intra-group), see designIntraGroupTopology() and designInterGroupTopology().
+    def getLinkRoles(self, src, dst):
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        levels = np.full(np.broadcast(src, dst).shape, -1, dtype=np.int64)
+        for level in range(self.num_levels):
+            digit_weight = self.num_gpus_per_group ** level
+            levels[(src // digit_weight) % self.num_gpus_per_group != (dst // digit_weight) % self.num_gpus_per_group] = level
+        return np.char.add("level", levels.astype(str))
+
+    # Subtracting the base-r digits of a source from those of all GPUs keeps the GPUs linked by a level l link differing only
+    # in their l-th digit, and takes the source to GPU 0
+    def getNodeTranslations(self, sources):
+        return subtractDigits(np.arange(self.num_gpus, dtype=np.int64)[None, :], np.asarray(sources, dtype=np.int64)[:, None], self.num_gpus_per_group, self.num_levels)
+
+    # Transparent switching involves 2x link latency since it connects two endpoints with two links (see generateLinkDelayFileString).
+    def getLinkLatencies(self, src, dst, default_latency_ns=0):
+        return np.full(np.broadcast(np.asarray(src), np.asarray(dst)).shape, float(self.link_latency * 2))
+
+    # Generates the header of the topology file used for netbench.
+    def generateTopologyFileHeader(self, num_nodes, num_edges):
         prefix = ""
-        topol_str = ""
-        num_edges = 0
-        for switch_id in self.adjacency_list:
-            for target_switch_id in self.adjacency_list[switch_id]:
-                link_count = int(self.adjacency_list[switch_id][target_switch_id])
-                num_edges += link_count
-                for _ in range(link_count):
-                    topol_str += "{} {}\n".format(switch_id, target_switch_id)
-        num_switches = len(self.adjacency_list)
-        prefix += ("|V|={}".format(num_switches) + "\n")
+        prefix += ("|V|={}".format(num_nodes) + "\n")
         prefix += ("|E|={}".format(num_edges) + "\n")
         prefix += "ToRs=incl_range({},{})\n".format(self.gpus[0][0], self.gpus[-1][-1])
         prefix += "Servers=incl_range({},{})\n".format(self.gpus[0][0], self.gpus[-1][-1])
         prefix += ("Switches=set()\n\n")
-        return prefix + topol_str
+        return prefix
     
-    def generateTrafficEventsString(self, trace_events_list):
-        str_builder = ""
-        number_of_flows = 0
-        gpu_offset = 0
-        for (timestamp, src, dst, sum_bytes) in trace_events_list:
-            src, dst = src + gpu_offset, dst + gpu_offset
-            assert(src in self.adjacency_list and dst in self.adjacency_list)
-            if src != dst:
-                str_builder += "{},{},{},{}\n".format(timestamp, int(src), int(dst), sum_bytes)
-                number_of_flows += 1
-        return str_builder, number_of_flows
-
     def checkLinkAdjacencyList(self, src, dst):
         if src in self.adjacency_list and dst in self.adjacency_list:
             if dst in self.adjacency_list[src] and src in self.adjacency_list[dst]: return True
@@ -0,0 +1,76 @@
+import importlib, math
+
+'''
+Registry of the network topology classes, imported on first use so that looking up one topology does not import the others.
+'''
+
+# Topology class of each topology kind: (module, class name)
+TOPOLOGY_CLASSES = {"sipac": ("network_topology.sipac_network_topology", "SiPACNetworkTopology"),
+                    "bcube": ("network_topology.bcube_network_topology", "BcubeNetworkTopology"),
+                    "dgx_superpod": ("network_topology.dgx_superpod_network_topology", "DGX_Superpod"),
+                    "torus": ("network_topology.nd_torus_network_topology", "NDTorusNetworkTopology"),
+                    "fattree": ("network_topology.fattree_customized_network_topology", "FatTreeCustomizedNetworkTopology"),
+                    "dragonfly": ("network_topology.dragonfly_network_topology", "Dragonfly"),
+                    "netbench_file": ("network_topology.netbench_file_network_topology", "NetbenchFileNetworkTopology"),
+                    }
+
+def getTopologyKinds():
+    return list(TOPOLOGY_CLASSES.keys())
+
+# Returns the topology class of a topology kind, importing its module
+def findTopologyClass(kind):
+    if kind not in TOPOLOGY_CLASSES: raise Exception("Unknown topology: {}".format(kind))
+    module_name, class_name = TOPOLOGY_CLASSES[kind]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def createTopology(kind, **parameters):
+    return findTopologyClass(kind)(**parameters)
+
+# Returns the topology kind of a topology instance (None if its class is not registered)
+def findTopologyKind(topology):
+    for kind, (module_name, class_name) in TOPOLOGY_CLASSES.items():
+        if type(topology).__module__ == module_name and type(topology).__name__ == class_name: return kind
+    return None
+
+####################################################################################################
+# Builders of the topologies compared in this work, normalized along the per-CU bandwidth
+####################################################################################################
+
+# Topology kinds compared in the experiments, in the order in which their runs are generated
+COMPARED_TOPOLOGY_KINDS = ["dgx_superpod", "torus", "bcube", "sipac"]
+
+# Dimensions of the 2D torus of "num_nodes" nodes that is the closest to a square, largest dimension first
+# (e.g. 32x16 for 512 nodes)
+def deriveTorusDimensions(num_nodes):
+    first_dimension = next(d for d in range(math.isqrt(num_nodes), num_nodes + 1) if num_nodes % d == 0 and d * d >= num_nodes)
+    return [first_dimension, num_nodes // first_dimension]
+
+# Radix of the SiPAC/BCube topologies with "num_levels" levels of "num_nodes" nodes
+def deriveRadix(num_nodes, num_levels):
+    return math.ceil(float(num_nodes) ** (1/(float(num_levels)+1)))
+
+def buildSiPAC(num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns):
+    r = deriveRadix(num_nodes, num_levels)
+    return createTopology("sipac", r=r, l=num_levels, link_bw=per_cu_bw_gbps//((num_levels+1)*(r-1)), link_latency=link_latency_ns, num_wavelengths_per_pair=1)
+
+def buildBCube(num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns):
+    return createTopology("bcube", r=deriveRadix(num_nodes, num_levels), l=num_levels, link_bw=per_cu_bw_gbps//(num_levels+1), num_wavelengths_per_pair=1)
+
+# each gpu is connected to 6 nvswitches with 2 links each = 12 links
+def buildDGXSuperpod(num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns):
+    return createTopology("dgx_superpod", target_num_gpus=num_nodes, link_bw=per_cu_bw_gbps//6)
+
+def buildTorus(num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns):
+    return createTopology("torus", numSwitchesInDimension=deriveTorusDimensions(num_nodes), link_bw=per_cu_bw_gbps//(2*2))
+
+# Builder of each compared topology kind: (num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns) -> topology.
+# The number of levels only applies to the SiPAC and BCube topologies.
+TOPOLOGY_BUILDERS = {"dgx_superpod": buildDGXSuperpod,
+                     "torus": buildTorus,
+                     "bcube": buildBCube,
+                     "sipac": buildSiPAC,
+                     }
+
+def buildTopology(kind, num_nodes, per_cu_bw_gbps, num_levels=1, link_latency_ns=0):
+    if kind not in TOPOLOGY_BUILDERS: raise Exception("No builder for topology: {}".format(kind))
+    return TOPOLOGY_BUILDERS[kind](num_nodes, per_cu_bw_gbps, num_levels, link_latency_ns)
@@ -0,0 +1,155 @@
+'''
+Stage-level profiling of the experiment generation (generate_experiment.py --profile).
+'''
+
+import os, time, json, csv, resource, contextlib
+import cProfile, tracemalloc
+
+# Kinds of per-stage details a profiler can record on top of the wall time, CPU time and resident memory of the stages
+PROFILE_DETAILS = ("cprofile", "tracemalloc")
+# Number of allocation sites of the tracemalloc snapshots of the stages
+TRACEMALLOC_TOP_LINES = 25
+# Columns of the CSV report, one row per stage
+PROFILE_REPORT_COLUMNS = ["stage", "label", "pid", "wall_time_s", "cpu_time_s", "max_rss_bytes", "rss_growth_bytes", "peak_memory_bytes",
+                          "events", "bytes", "events_per_s", "bytes_per_s"]
+
+# Records the wall time, CPU time and memory of the (possibly nested) stages of a run, along with the number of events
+# (e.g. flows or links) and bytes each stage handled. A disabled profiler only hands out records to fill.
+# The memory of a stage is the peak resident set size of the process when it ends and how much the stage raised it.
+# With detail="tracemalloc", the peak memory allocated by each stage is also traced (which slows down Python code
+# several times), and the allocations retained by the stage of each name that peaked the highest are dumped as
+# <stage>.<pid>.tracemalloc.txt; with detail="cprofile", each stage name gets a cProfile of the code run by its stages
+# (excluding their nested stages), dumped as <stage>.<pid>.prof. Both are written to "output_directory".
+class StageProfiler(object):
+    def __init__(self, enabled=False, detail=None, output_directory=None):
+        self.records = []
+        self.stack = []
+        self.profiles = {}
+        self.snapshot_peaks = {}
+        self.enable(enabled, detail, output_directory)
+
+    def enable(self, enabled=True, detail=None, output_directory=None):
+        if detail is not None and detail not in PROFILE_DETAILS: raise Exception("Unknown profile detail: {}".format(detail))
+        self.enabled, self.detail, self.output_directory = enabled, detail, output_directory
+        self.trace_memory = enabled and detail == "tracemalloc"
+        if self.trace_memory and not tracemalloc.is_tracing(): tracemalloc.start()
+        if self.output_directory and detail: os.makedirs(self.output_directory, exist_ok=True)
+
+    def isEnabled(self):
+        return self.enabled
+
+    # Context manager timing a stage, yielding its record: the caller sets its "events" and "bytes" counts.
+    # The "label" tells apart the stages of the same name (e.g. the file or topology they work on).
+    @contextlib.contextmanager
+    def stage(self, name, label=""):
+        record = {"stage": name, "label": label, "pid": os.getpid(), "events": 0, "bytes": 0}
+        if not self.enabled:
+            yield record
+            return
+        frame = self.startStage(record)
+        try:
+            yield record
+        finally:
+            self.stopStage(frame)
+
+    def startStage(self, record):
+        frame = {"record": record, "child_peak": 0, "snapshot": None}
+        if self.detail == "cprofile":
+            if self.stack: self.profiles[self.stack[-1]["record"]["stage"]].disable()
+            self.profiles.setdefault(record["stage"], cProfile.Profile()).enable()
+        if self.trace_memory:
+            frame["snapshot"] = tracemalloc.take_snapshot()
+            # the peak of the enclosing stage so far is kept before resetting the peak for this one
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            if self.stack: self.stack[-1]["child_peak"] = max(self.stack[-1]["child_peak"], peak_memory)
+            tracemalloc.reset_peak()
+            frame["start_memory"] = current_memory
+        frame["start_max_rss"] = measureMaxRSS()
+        frame["start_wall_time"], frame["start_cpu_time"] = time.perf_counter(), time.process_time()
+        self.stack.append(frame)
+        return frame
+
+    def stopStage(self, frame):
+        wall_time, cpu_time = time.perf_counter() - frame["start_wall_time"], time.process_time() - frame["start_cpu_time"]
+        self.stack.pop()
+        record = frame["record"]
+        if self.detail == "cprofile":
+            self.profiles[record["stage"]].disable()
+            if self.stack: self.profiles[self.stack[-1]["record"]["stage"]].enable()
+        max_rss = measureMaxRSS()
+        record.update({"wall_time_s": wall_time, "cpu_time_s": cpu_time, "max_rss_bytes": max_rss, "rss_growth_bytes": max_rss - frame["start_max_rss"],
+                       "peak_memory_bytes": None,
+                       "events_per_s": record["events"] / wall_time if wall_time > 0 else 0.,
+                       "bytes_per_s": record["bytes"] / wall_time if wall_time > 0 else 0.})
+        if self.trace_memory:
+            peak_memory = max(tracemalloc.get_traced_memory()[1], frame["child_peak"])
+            if self.stack: self.stack[-1]["child_peak"] = max(self.stack[-1]["child_peak"], peak_memory)
+            record["peak_memory_bytes"] = peak_memory - frame["start_memory"]
+            if record["peak_memory_bytes"] > self.snapshot_peaks.get(record["stage"], -1):
+                self.snapshot_peaks[record["stage"]] = record["peak_memory_bytes"]
+                self.writeSnapshotDifference(record, frame["snapshot"], tracemalloc.take_snapshot())
+        self.records.append(record)
+
+    def deriveDetailFilename(self, stage, extension):
+        return os.path.join(self.output_directory, "{}.{}.{}".format(stage, os.getpid(), extension))
+
+    def writeSnapshotDifference(self, record, start_snapshot, end_snapshot):
+        statistics = end_snapshot.compare_to(start_snapshot, "lineno")[:TRACEMALLOC_TOP_LINES]
+        with open(self.deriveDetailFilename(record["stage"], "tracemalloc.txt"), "w+") as f:
+            f.write("# {} {}: peak {} bytes over {:.3f} s\n".format(record["stage"], record["label"], record["peak_memory_bytes"], record["wall_time_s"]))
+            for statistic in statistics: f.write("{}\n".format(statistic))
+
+    # Dumps the cProfile of each stage name (cumulative over the stages run so far in this process)
+    def dumpProfiles(self):
+        if self.detail != "cprofile": return
+        for stage, profile in self.profiles.items(): profile.dump_stats(self.deriveDetailFilename(stage, "prof"))
+
+    # Returns the records of the stages completed since the last call, e.g. to send them from a pool worker
+    def popRecords(self):
+        self.dumpProfiles()
+        records, self.records = self.records, []
+        return records
+
+    def addRecords(self, records):
+        self.records.extend(records)
+
+    # Totals of the records of each stage name, in the order in which the stages first completed
+    def summarizeRecords(self):
+        summary = {}
+        for record in self.records:
+            totals = summary.setdefault(record["stage"], {"count": 0, "wall_time_s": 0., "cpu_time_s": 0., "max_rss_bytes": 0, "rss_growth_bytes": 0,
+                                                          "peak_memory_bytes": None, "events": 0, "bytes": 0})
+            totals["count"] += 1
+            for key in ("wall_time_s", "cpu_time_s", "rss_growth_bytes", "events", "bytes"): totals[key] += record[key]
+            totals["max_rss_bytes"] = max(totals["max_rss_bytes"], record["max_rss_bytes"])
+            if record["peak_memory_bytes"] is not None: totals["peak_memory_bytes"] = max(totals["peak_memory_bytes"] or 0, record["peak_memory_bytes"])
+        for totals in summary.values():
+            totals["events_per_s"] = totals["events"] / totals["wall_time_s"] if totals["wall_time_s"] > 0 else 0.
+            totals["bytes_per_s"] = totals["bytes"] / totals["wall_time_s"] if totals["wall_time_s"] > 0 else 0.
+        return summary
+
+    # Writes the JSON (summary and records) and CSV (records) reports of the run to "directory"; returns their filenames.
+    def writeReport(self, directory, metadata=None):
+        os.makedirs(directory, exist_ok=True)
+        self.dumpProfiles()
+        json_filename, csv_filename = os.path.join(directory, "profile.json"), os.path.join(directory, "profile.csv")
+        with open(json_filename, "w+") as f:
+            json.dump({"metadata": metadata or {}, "summary": self.summarizeRecords(), "stages": self.records}, f, indent=1)
+        with open(csv_filename, "w+", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PROFILE_REPORT_COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(self.records)
+        return json_filename, csv_filename
+
+    # Prints the summary of the stages, slowest first, with their traced peak memory if any (their peak RSS otherwise)
+    def printSummary(self):
+        summary = self.summarizeRecords()
+        memory_key = "peak_memory_bytes" if self.trace_memory else "max_rss_bytes"
+        print("[Profile] {:<24} {:>7} {:>11} {:>12} {:>14} {:>14}".format("stage", "count", "time (s)", "peak (MiB)" if self.trace_memory else "rss (MiB)", "events/s", "MB/s"))
+        for stage, totals in sorted(summary.items(), key=lambda item: -item[1]["wall_time_s"]):
+            print("[Profile] {:<24} {:>7} {:>11.3f} {:>12.2f} {:>14.0f} {:>14.2f}".format(stage, totals["count"], totals["wall_time_s"], (totals[memory_key] or 0) / (1 << 20),
+                                                                                       totals["events_per_s"], totals["bytes_per_s"] / 1e6))
+
+# Peak resident set size of the process (bytes)
+def measureMaxRSS():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,5 @@
+__all__ = ["fluid_simulator",
+		   "local_runner",
+		   "shared_queue",
+		   "stub_simulator",
+		   ]
\ No newline at end of file
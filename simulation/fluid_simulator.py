@@ -0,0 +1,163 @@
+"""
+Flow-level (fluid) simulator of the Netbench runs generated by generate_experiment.py.
+
+Usage:
+    python3 -m simulation.fluid_simulator <simulation_parameters.properties> [<simulation_parameters.properties> ...]
+
+The simulator reads the same files as Netbench (the simulation configuration, the .topology file, the link delay file and
+the flow arrivals file) and writes the flow_completion.csv.log of the run to its run folder, in the Netbench column
+layout, so that analysis/analysis.py works unchanged. It trades packet-level fidelity (queueing, congestion control,
+packetization) for speed:
+    1) Each flow is split over all its shortest paths like ECMP, evenly over the next hops (parallel links included)
+       at every node.
+    2) The rates of the active flows are max-min fair, allocated by progressive filling over the link capacities.
+    3) The rates are reallocated each time a flow completes, and a flow completes when its last bit is sent plus the
+       latency of its paths.
+    4) The time column of the flow arrivals file is the step of the collective schedule ("traffic_arrivals_file_auto"):
+       the flows of a step start once all the flows of the previous step completed.
+"""
+
+import os, sys
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from network_topology import *
+
+# Name of the flow completion log written in the run folder, as Netbench does
+FLOW_COMPLETION_LOG_FILENAME = "flow_completion.csv.log"
+# Relative tolerance of the rate allocation and of the flow completions
+FLUID_TOLERANCE = 1e-9
+
+# Reads a Netbench simulation configuration (.properties) file into a dictionary
+def readSimulationConfiguration(config_filename):
+    config = {}
+    with open(config_filename) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line: continue
+            key, value = line.split("=", 1)
+            config[key.strip()] = value.strip()
+    return config
+
+# Reads a flow arrivals file ("time,src,dst,bytes" lines) into int64 columns
+def readFlowArrivals(flow_arrivals_filename):
+    if os.path.getsize(flow_arrivals_filename) == 0: return [np.zeros(0, dtype=np.int64) for _ in range(4)]
+    return list(np.loadtxt(flow_arrivals_filename, delimiter=",", dtype=np.int64, ndmin=2).T)
+
+# Max-min fair rates by progressive filling: the rates of all the flows that are not frozen grow at the same pace until a
+# link saturates, which freezes the flows crossing it. A flow crosses link entry_link[i] with a share entry_fraction[i]
+# of its rate (its ECMP split). Only the flows flagged in "is_active" get a rate.
+def allocateMaxMinRates(is_active, entry_flow, entry_link, entry_fraction, capacities):
+    rates = np.zeros(len(is_active))
+    is_frozen = ~is_active
+    residual_capacities = capacities.astype(np.float64)
+    while True:
+        is_live = ~is_frozen[entry_flow]
+        if not np.any(is_live): break
+        demands = np.bincount(entry_link[is_live], entry_fraction[is_live], minlength=len(capacities))
+        is_loaded = demands > 0
+        increment = np.min(residual_capacities[is_loaded] / demands[is_loaded])
+        rates[~is_frozen] += increment
+        residual_capacities -= increment * demands
+        is_saturated = is_loaded & (residual_capacities <= FLUID_TOLERANCE * capacities)
+        is_frozen[entry_flow[is_live & is_saturated[entry_link]]] = True
+    return rates
+
+class FluidSimulator(object):
+    def __init__(self, config_filename):
+        self.config = readSimulationConfiguration(config_filename)
+        self.topology = netbench_file_network_topology.NetbenchFileNetworkTopology(self.config["scenario_topology_file"],
+                                                                                  self.config.get("link_delay_filename"),
+                                                                                  link_bw=float(self.config["link_bandwidth_bit_per_ns"]),
+                                                                                  link_latency=float(self.config["link_delay_ns"]))
+        self.run_time_ns = float(self.config.get("run_time_ns", np.inf))
+        self.run_directory = os.path.join(self.config["run_folder_base_dir"], self.config.get("run_folder_name", ""))
+
+    # Simulate the run. Returns the flow completion log columns: flow id, source, target, sent bytes, total bytes,
+    # start time, end time, duration and whether the flow completed.
+    def run(self):
+        self.topology.wireNetwork()
+        adjacency = self.topology.getAdjacency()
+        link_src, link_dst, link_multiplicity = adjacency.getEdgeArrays()
+        capacities = link_multiplicity * self.topology.getLinkBandwidths(link_src, link_dst)
+        link_latencies = self.topology.getLinkLatencies(link_src, link_dst)
+        steps, src, dst, num_bytes = readFlowArrivals(self.config["traffic_arrivals_filename"])
+        num_flows = len(src)
+        print("[Simulation] {} flows on {} nodes and {} links".format(num_flows, adjacency.getNumNodes(), len(capacities)))
+        # flows share the ECMP splits of their (src, dst) pair
+        pairs, flow_pair = np.unique(src * adjacency.getNumNodes() + dst, return_inverse=True)
+        flow_pair = flow_pair.ravel()
+        entry_pair, entry_link, entry_fraction = self.topology.getPathEngine().computeECMPFractions(pairs // adjacency.getNumNodes(), pairs % adjacency.getNumNodes())
+        order = np.argsort(entry_pair, kind="stable")
+        entry_pair, entry_link, entry_fraction = entry_pair[order], entry_link[order], entry_fraction[order]
+        pair_entry_counts = np.bincount(entry_pair, minlength=len(pairs))
+        pair_entry_starts = np.cumsum(pair_entry_counts) - pair_entry_counts
+        pair_latencies = np.bincount(entry_pair, entry_fraction * link_latencies[entry_link], minlength=len(pairs))
+        total_bits = num_bytes * 8.
+        sent_bits = np.zeros(num_flows)
+        # flows of the steps that never started start (and end) with the end of the run
+        start_times, end_times = np.full(num_flows, self.run_time_ns if np.isfinite(self.run_time_ns) else 0.), np.full(num_flows, np.nan)
+        step_start_time = 0.
+        for step in np.unique(steps):
+            if step_start_time >= self.run_time_ns: break
+            step_flows = np.flatnonzero(steps == step)
+            start_times[step_flows] = step_start_time
+            # the split entries of the flows of the step, indexed by the position of the flow in the step
+            counts = pair_entry_counts[flow_pair[step_flows]]
+            entries = pair_entry_starts[flow_pair[step_flows]]
+            step_entry_flow = np.repeat(np.arange(len(step_flows), dtype=np.int64), counts)
+            step_entries = network_topology.expandRanges(entries, counts)
+            step_entry_link, step_entry_fraction = entry_link[step_entries], entry_fraction[step_entries]
+            remaining_bits = total_bits[step_flows].copy()
+            # flows without data complete right away, flows without paths never do
+            is_active = (remaining_bits > 0) & (counts > 0)
+            data_end_times = np.where((remaining_bits <= 0) & (counts > 0), step_start_time, np.nan)
+            time = step_start_time
+            while np.any(is_active):
+                rates = allocateMaxMinRates(is_active, step_entry_flow, step_entry_link, step_entry_fraction, capacities)
+                time_step = np.min(remaining_bits[is_active] / rates[is_active])
+                if time + time_step >= self.run_time_ns:
+                    remaining_bits[is_active] -= rates[is_active] * (self.run_time_ns - time)
+                    time = self.run_time_ns
+                    break
+                time += time_step
+                remaining_bits[is_active] -= rates[is_active] * time_step
+                is_completed = is_active & (remaining_bits <= FLUID_TOLERANCE * total_bits[step_flows])
+                remaining_bits[is_completed] = 0
+                data_end_times[is_completed] = time
+                is_active &= ~is_completed
+            sent_bits[step_flows] = total_bits[step_flows] - np.maximum(remaining_bits, 0)
+            step_end_times = data_end_times + pair_latencies[flow_pair[step_flows]]
+            is_completed = step_end_times <= self.run_time_ns
+            end_times[step_flows[is_completed]] = step_end_times[is_completed]
+            step_start_time = np.max(step_end_times) if np.all(is_completed) else self.run_time_ns
+        is_completed = ~np.isnan(end_times)
+        print("[Simulation] {} of {} flows completed, last one at {:.0f} ns".format(int(is_completed.sum()), num_flows, np.nanmax(end_times) if is_completed.any() else 0))
+        # like Netbench, unfinished flows end with the run
+        end_times = np.ceil(np.where(is_completed, end_times, max(self.run_time_ns if np.isfinite(self.run_time_ns) else 0, 0))).astype(np.int64)
+        start_times = np.round(start_times).astype(np.int64)
+        return {"flow_id": np.arange(num_flows, dtype=np.int64), "source_id": src, "target_id": dst,
+                "sent_bytes": np.round(sent_bits / 8).astype(np.int64), "total_size_bytes": num_bytes,
+                "start_time": start_times, "end_time": end_times, "duration": end_times - start_times, "completed": is_completed}
+
+    # Writes the flow completion log of the run in the Netbench column layout
+    def writeFlowCompletionLog(self, flows, fct_filename=None):
+        if fct_filename is None: fct_filename = os.path.join(self.run_directory, FLOW_COMPLETION_LOG_FILENAME)
+        os.makedirs(os.path.dirname(os.path.abspath(fct_filename)), exist_ok=True)
+        completed = np.where(flows["completed"], "TRUE", "FALSE")
+        columns = [flows[column] for column in ("flow_id", "source_id", "target_id", "sent_bytes", "total_size_bytes", "start_time", "end_time", "duration")] + [completed]
+        with network_topology.openForWriting(fct_filename) as f:
+            network_topology.writeFormattedRows(f, ",".join(["{}"] * len(columns)), columns)
+        print("[Simulation] Flow completion log written to {}".format(fct_filename))
+        return fct_filename
+
+def main():
+    if len(sys.argv) < 2:
+        print("python3 -m simulation.fluid_simulator <simulation_parameters.properties> [...]")
+        sys.exit(2)
+    for config_filename in sys.argv[1:]:
+        print("[Simulation] Running {}".format(config_filename))
+        simulator = FluidSimulator(config_filename)
+        simulator.writeFlowCompletionLog(simulator.run())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Runs the simulations generated by generate_experiment.py on a bounded pool of local processes.
+
+Usage:
+    python3 -m simulation.local_runner [options] <execution script or simulation_parameters.properties> [...]
+        --jobs= (optional)
+            maximum number of concurrent runs (default: number of cores)
+        --memory_per_run= (optional)
+            estimated peak memory of a run in bytes (default: estimated from its number of flows, or from the peak
+            memory of its previous attempts)
+        --memory_budget= (optional)
+            memory the concurrent runs may use in total in bytes (default: the available memory of the host)
+        --retries= (optional)
+            number of times a failed run is retried (default: 1)
+        --simulator= (optional)
+            netbench (default, run from $NETBENCH_HOME), fluid (simulation/fluid_simulator.py) or stub
+            (simulation/stub_simulator.py)
+        --command= (optional)
+            command a simulation config is appended to, instead of the simulator's, e.g.
+            "python3 -m simulation.stub_simulator --duration=1"
+        --status_file= (optional)
+            JSON lines record of the attempts (default: execution/run_status.jsonl)
+        --force (optional)
+            also rerun the runs that already have a flow completion log (with --queue, only along with --enqueue: the
+            done runs are queued again)
+        --queue= (optional)
+            shared queue directory of the shard/lease mode (see simulation/shared_queue.py)
+        --enqueue (optional, with --queue)
+            add the runs of the arguments to the queue and exit, instead of running them
+        --shards= (optional, with --enqueue)
+            number of shards the queued runs are split into, balanced by their predicted costs (default: 1)
+        --shard= (optional, with --queue)
+            shard whose runs this worker claims first (default: 0)
+        --heartbeat= (optional, with --queue)
+            interval at which a worker refreshes the leases of its runs in seconds (default: 30)
+        --lease_timeout= (optional, with --queue)
+            time after which a lease not refreshed is reclaimed by other workers in seconds (default: 300)
+    e.g. "python3 -m simulation.local_runner --jobs=4 execution/automated_execution_allreduce.sh"
+    e.g. "python3 -m simulation.local_runner --queue=/nfs/queue --enqueue --shards=4 execution/automated_execution_allreduce.sh",
+         then "python3 -m simulation.local_runner --queue=/nfs/queue --shard=<0..3>" on each of the 4 hosts
+
+A run is complete once its run folder has a flow_completion.csv.log, and is skipped then. Every attempt is appended to the
+status file with its exit status, wall time and peak resident memory, and the output of a run goes to run.log in its
+run folder. An interrupted runner is resumed by running it again: runs whose last attempt started but never finished are
+rerun even if they left a (partial) flow completion log.
+"""
+
+import os, sys, getopt, json, time, shlex, socket, subprocess, collections
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.fluid_simulator import readSimulationConfiguration, FLOW_COMPLETION_LOG_FILENAME
+
+SIPAC_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_STATUS_FILENAME = os.path.join(SIPAC_DIRECTORY, "execution", "run_status.jsonl")
+# Name of the output log of a run in its run folder
+RUN_LOG_FILENAME = "run.log"
+# Memory estimate of a run without recorded attempts: the simulator itself (a JVM for Netbench) plus its flows
+RUN_BASE_MEMORY_BYTES = 1 << 30
+RUN_MEMORY_PER_FLOW_BYTES = 4 << 10
+# Margin over the peak memory of the previous attempts of a run
+RUN_MEMORY_MARGIN = 1.25
+
+# Command and working directory of each simulator
+def deriveSimulatorCommand(simulator):
+    if simulator == "netbench":
+        if "NETBENCH_HOME" not in os.environ: raise Exception("NETBENCH_HOME is not set")
+        return ["java", "-jar", "-ea", "NetBench.jar"], os.environ["NETBENCH_HOME"]
+    if simulator == "fluid": return [sys.executable, "-m", "simulation.fluid_simulator"], SIPAC_DIRECTORY
+    if simulator == "stub": return [sys.executable, "-m", "simulation.stub_simulator"], SIPAC_DIRECTORY
+    raise Exception("Unknown simulator: {}".format(simulator))
+
+# Simulation configs of an execution script of utilities.generateBashScript(), one run per line
+def readExecutionScript(script_filename):
+    config_filenames = []
+    with open(script_filename) as f:
+        for line in f:
+            tokens = line.split()
+            if tokens and tokens[-1].endswith(".properties"): config_filenames.append(tokens[-1])
+    return config_filenames
+
+# Simulation configs of the arguments: execution scripts and simulation configs
+def readConfigFilenames(arguments):
+    config_filenames = []
+    for argument in arguments:
+        config_filenames.extend(readExecutionScript(argument) if argument.endswith(".sh") else [argument])
+    return config_filenames
+
+# Memory available to new processes on the host (bytes)
+def measureAvailableMemory():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"): return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+def countCores():
+    return len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+
+# Reads the attempts of the status file, in the order in which they were recorded
+def readStatusRecords(status_filename):
+    records = []
+    if not status_filename or not os.path.isfile(status_filename): return records
+    with open(status_filename) as f:
+        for line in f:
+            # the last line of an interrupted runner may be truncated
+            try: records.append(json.loads(line))
+            except ValueError: continue
+    return records
+
+# A simulation run: its config, the run folder its logs go to and its estimated peak memory
+class SimulationRun(object):
+    def __init__(self, config_filename):
+        self.config_filename = os.path.abspath(config_filename)
+        config = readSimulationConfiguration(self.config_filename)
+        self.run_directory = os.path.join(config["run_folder_base_dir"], config.get("run_folder_name", ""))
+        num_flows = config.get("finish_when_first_flows_finish", "None")
+        self.num_flows = int(num_flows) if num_flows.isdigit() else 0
+        self.memory_bytes = RUN_BASE_MEMORY_BYTES + RUN_MEMORY_PER_FLOW_BYTES * self.num_flows
+        self.attempts = 0
+
+    def getFlowCompletionLogFilename(self):
+        return os.path.join(self.run_directory, FLOW_COMPLETION_LOG_FILENAME)
+
+    def isComplete(self):
+        return os.path.isfile(self.getFlowCompletionLogFilename())
+
+# Runs simulations on at most "jobs" concurrent processes whose estimated peak memory fits in "memory_budget" (a run
+# larger than the budget runs alone). Failed runs are retried up to "retries" times, after the other pending runs.
+class LocalRunner(object):
+    def __init__(self, command, working_directory, jobs=None, memory_budget=None, memory_per_run=None, retries=1, status_filename=DEFAULT_STATUS_FILENAME, force=False):
+        self.command = command
+        self.working_directory = working_directory
+        self.jobs = jobs or countCores()
+        self.memory_budget = memory_budget or measureAvailableMemory()
+        self.memory_per_run = memory_per_run
+        self.retries = retries
+        self.status_filename = status_filename
+        self.force = force
+        self.hostname = socket.gethostname()
+
+    # Appends an attempt to the status file
+    def recordStatus(self, run, status, **fields):
+        record = dict({"config": run.config_filename, "attempt": run.attempts, "status": status, "host": self.hostname, "time": time.time()}, **fields)
+        if not self.status_filename: return record
+        os.makedirs(os.path.dirname(os.path.abspath(self.status_filename)), exist_ok=True)
+        with open(self.status_filename, "a") as f: f.write(json.dumps(record) + "\n")
+        return record
+
+    def readStatusRecords(self):
+        return readStatusRecords(self.status_filename)
+
+    # Peak memory of the previous attempts of each config according to the status records
+    def readPeakMemory(self, records):
+        peak_memory = collections.defaultdict(int)
+        for record in records: peak_memory[record["config"]] = max(peak_memory[record["config"]], record.get("max_rss_bytes") or 0)
+        return peak_memory
+
+    def estimateRunMemory(self, run, peak_memory):
+        if self.memory_per_run: run.memory_bytes = self.memory_per_run
+        elif peak_memory[run.config_filename]: run.memory_bytes = int(peak_memory[run.config_filename] * RUN_MEMORY_MARGIN)
+
+    # Returns the runs of the configs still to run, with their memory estimates refined by the status file
+    def findPendingRuns(self, config_filenames):
+        records = self.readStatusRecords()
+        last_records = {record["config"]: record for record in records}
+        peak_memory = self.readPeakMemory(records)
+        runs, seen_configs = [], set()
+        for config_filename in config_filenames:
+            run = SimulationRun(config_filename)
+            if run.config_filename in seen_configs: continue
+            seen_configs.add(run.config_filename)
+            # a run interrupted after it started may have left a partial log
+            is_interrupted = last_records.get(run.config_filename, {}).get("status") == "started"
+            if run.isComplete() and not is_interrupted and not self.force: continue
+            self.estimateRunMemory(run, peak_memory)
+            runs.append(run)
+        return runs
+
+    def startRun(self, run):
+        run.attempts += 1
+        os.makedirs(run.run_directory, exist_ok=True)
+        # a previous partial log must not pass for the result of this attempt
+        if os.path.isfile(run.getFlowCompletionLogFilename()): os.remove(run.getFlowCompletionLogFilename())
+        self.recordStatus(run, "started", memory_estimate_bytes=run.memory_bytes)
+        with open(os.path.join(run.run_directory, RUN_LOG_FILENAME), "w") as log_file:
+            process = subprocess.Popen(self.command + [run.config_filename], cwd=self.working_directory, stdout=log_file, stderr=subprocess.STDOUT)
+        return process
+
+    # Records a finished attempt from the exit status and resource usage of its process; returns whether it succeeded
+    def finishRun(self, run, process, start_time, wait_status, resource_usage):
+        process.returncode = exit_code = os.waitstatus_to_exitcode(wait_status)
+        # a run succeeds when it exits normally and wrote its flow completion log
+        is_succeeded = exit_code == 0 and run.isComplete()
+        self.recordStatus(run, "succeeded" if is_succeeded else "failed", exit_code=exit_code, wall_time_s=time.time() - start_time,
+                          max_rss_bytes=resource_usage.ru_maxrss * 1024)
+        return is_succeeded
+
+    # Returns the next run to start with at most "available_memory" bytes, or None. The first pending run that fits
+    # starts, or the first one if nothing runs ("is_idle").
+    def selectNextRun(self, available_memory, is_idle):
+        run = next((run for run in self.pending if run.memory_bytes <= available_memory), None)
+        if run is None and is_idle and self.pending: run = self.pending[0]
+        if run is not None: self.pending.remove(run)
+        return run
+
+    # Called once the last attempt of a run finished: a failed run is retried after the other pending runs
+    def completeRun(self, run, is_succeeded):
+        if is_succeeded:
+            self.succeeded.append(run.config_filename)
+            print("[Runner] Completed {} ({} to go)".format(run.config_filename, len(self.pending) + len(self.running)))
+        elif run.attempts <= self.retries:
+            print("[Runner] Retrying {} (attempt {} failed)".format(run.config_filename, run.attempts))
+            self.pending.append(run)
+        else:
+            self.failed.append(run.config_filename)
+            print("[Runner] Failed {} after {} attempts, see {}".format(run.config_filename, run.attempts, os.path.join(run.run_directory, RUN_LOG_FILENAME)))
+
+    # Called when nothing runs and no run could start: returns whether to wait for more runs (never, for local runs)
+    def waitForRuns(self):
+        return False
+
+    # Waits for a run process to exit; returns its pid, wait status and resource usage
+    def waitForProcess(self):
+        return os.wait4(-1, 0)
+
+    # Called when the runner stops, with the runs it interrupted
+    def stopRuns(self, interrupted_runs):
+        pass
+
+    # Runs the simulations of the configs; returns the configs of the succeeded and failed runs
+    def run(self, config_filenames):
+        self.pending = collections.deque(self.findPendingRuns(config_filenames))
+        print("[Runner] {} of {} runs to go on up to {} processes within {:.1f} GiB".format(len(self.pending), len(config_filenames), self.jobs, self.memory_budget / (1 << 30)))
+        return self.runPending()
+
+    def runPending(self):
+        self.running, self.succeeded, self.failed = {}, [], []
+        try:
+            while True:
+                used_memory = sum(run.memory_bytes for run, _, _ in self.running.values())
+                while len(self.running) < self.jobs:
+                    run = self.selectNextRun(self.memory_budget - used_memory, not self.running)
+                    if run is None: break
+                    process = self.startRun(run)
+                    self.running[process.pid] = (run, process, time.time())
+                    used_memory += run.memory_bytes
+                if not self.running:
+                    if self.waitForRuns(): continue
+                    break
+                pid, wait_status, resource_usage = self.waitForProcess()
+                if pid not in self.running: continue
+                run, process, start_time = self.running.pop(pid)
+                self.completeRun(run, self.finishRun(run, process, start_time, wait_status, resource_usage))
+        finally:
+            # the runs of an interrupted runner stay "started" in the status file, and are rerun on resumption
+            for _, process, _ in self.running.values():
+                process.kill()
+                process.wait()
+            self.stopRuns([run for run, _, _ in self.running.values()])
+        print("[Runner] {} runs completed, {} failed".format(len(self.succeeded), len(self.failed)))
+        return self.succeeded, self.failed
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "hj:s:", ["jobs=", "memory_per_run=", "memory_budget=", "retries=", "simulator=", "command=", "status_file=", "force",
+                                                           "queue=", "enqueue", "shards=", "shard=", "heartbeat=", "lease_timeout="])
+    except getopt.GetoptError:
+        print("python3 -m simulation.local_runner [-j <jobs>] [--memory_per_run <bytes>] [--memory_budget <bytes>] [--retries <n>] [-s <netbench|fluid|stub>] [--command <command>] [--status_file <file>] [--force] <execution script or config> [...]")
+        sys.exit(2)
+    jobs, memory_per_run, memory_budget, retries = None, None, None, 1
+    simulator, command, status_filename, force = "netbench", None, DEFAULT_STATUS_FILENAME, False
+    queue_directory, enqueue, num_shards, shard, heartbeat_interval, lease_timeout = None, False, 1, 0, None, None
+    for opt, arg in opts:
+        if opt == "-h":
+            print("python3 -m simulation.local_runner [--jobs <jobs>] [--memory_per_run <bytes>] [--memory_budget <bytes>] [--retries <n>] [--simulator <netbench|fluid|stub>] [--command <command>] [--status_file <file>] [--force] <execution script or config> [...]")
+            sys.exit()
+        elif opt in ("-j", "--jobs"):
+            jobs = int(arg)
+        elif opt == "--memory_per_run":
+            memory_per_run = int(float(arg))
+        elif opt == "--memory_budget":
+            memory_budget = int(float(arg))
+        elif opt == "--retries":
+            retries = int(arg)
+        elif opt in ("-s", "--simulator"):
+            simulator = arg
+        elif opt == "--command":
+            command = arg
+        elif opt == "--status_file":
+            status_filename = arg
+        elif opt == "--force":
+            force = True
+        elif opt == "--queue":
+            queue_directory = arg
+        elif opt == "--enqueue":
+            enqueue = True
+        elif opt == "--shards":
+            num_shards = int(arg)
+        elif opt == "--shard":
+            shard = int(arg)
+        elif opt == "--heartbeat":
+            heartbeat_interval = float(arg)
+        elif opt == "--lease_timeout":
+            lease_timeout = float(arg)
+    if not args and not queue_directory or enqueue and not queue_directory:
+        print("python3 -m simulation.local_runner [options] <execution script or config> [...]")
+        sys.exit(2)
+    if queue_directory:
+        # the shard/lease mode is only imported when used
+        from simulation import shared_queue
+        if enqueue:
+            shared_queue.enqueueRuns(queue_directory, readConfigFilenames(args), num_shards, force)
+            return
+        # the workers of a queue run the runs that are queued, which --force --enqueue queues again
+        if force:
+            print("[Runner] --force applies to --enqueue in the queue mode, to queue the done runs again")
+            sys.exit(2)
+    if command: command, working_directory = shlex.split(command), os.getcwd()
+    else: command, working_directory = deriveSimulatorCommand(simulator)
+    if queue_directory:
+        runner = shared_queue.SharedQueueRunner(queue_directory, command, working_directory, shard, jobs, memory_budget, memory_per_run, retries,
+                                                heartbeat_interval or shared_queue.QUEUE_HEARTBEAT_INTERVAL_S, lease_timeout or shared_queue.QUEUE_LEASE_TIMEOUT_S)
+    else:
+        runner = LocalRunner(command, working_directory, jobs, memory_budget, memory_per_run, retries, status_filename, force)
+    try:
+        _, failed = runner.run(readConfigFilenames(args))
+    except KeyboardInterrupt:
+        print("[Runner] Interrupted, run again to resume")
+        sys.exit(130)
+    if failed: sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+'''
+Shard/lease mode of the local runner (simulation/local_runner.py): runs are shared by the workers of several hosts through
+a queue directory on a shared (e.g. NFS) volume.
+'''
+
+import os, sys, json, time, socket, hashlib, heapq
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from simulation.fluid_simulator import readSimulationConfiguration
+from simulation.local_runner import LocalRunner, SimulationRun, readStatusRecords
+
+# A worker refreshes the leases of its runs this often (s), and a lease not refreshed for QUEUE_LEASE_TIMEOUT_S is stale
+QUEUE_HEARTBEAT_INTERVAL_S = 30.
+QUEUE_LEASE_TIMEOUT_S = 300.
+# Interval at which a worker checks its runs for exits, and looks for runs to claim when it has none (s)
+QUEUE_POLL_INTERVAL_S = 0.5
+QUEUE_IDLE_INTERVAL_S = 10.
+
+# Layout of the queue directory: the description of each run (runs/<run id>.json), their leases
+# (leases/<run id>.lease), completion and failure markers (done/<run id>, failed/<run id>.json), the attempts recorded
+# by each worker (status/<host>.<pid>.jsonl) and the clocks of the workers (clocks/<host>.<pid>)
+QUEUE_SUBDIRECTORIES = ["runs", "leases", "done", "failed", "status", "clocks"]
+
+def deriveRunId(config_filename):
+    return hashlib.sha1(os.path.abspath(config_filename).encode()).hexdigest()[:16]
+
+def writeJSONAtomically(filename, content):
+    temporary_filename = "{}.{}.{}.tmp".format(filename, socket.gethostname(), os.getpid())
+    with open(temporary_filename, "w") as f: json.dump(content, f)
+    os.replace(temporary_filename, filename)
+
+def readJSON(filename):
+    try:
+        with open(filename) as f: return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Predicted cost of a run: its number of flows times the bytes they carry, which grows like the simulated events
+def predictRunCost(run):
+    config = readSimulationConfiguration(run.config_filename)
+    num_bytes = 0
+    if os.path.isfile(config["traffic_arrivals_filename"]) and os.path.getsize(config["traffic_arrivals_filename"]) > 0:
+        num_bytes = int(np.loadtxt(config["traffic_arrivals_filename"], delimiter=",", dtype=np.int64, ndmin=2, usecols=3).sum())
+    return max(run.num_flows, 1) * max(num_bytes, 1)
+
+# Deterministically assigns the runs ({run id: cost}) to "num_shards" shards of balanced total costs: the costliest runs
+# first (ties broken by run id), each to the shard of the lowest total cost so far (ties broken by shard index)
+def assignShards(run_costs, num_shards):
+    shard_costs = [(0, shard) for shard in range(num_shards)]
+    shards = {}
+    for run_id, cost in sorted(run_costs.items(), key=lambda item: (-item[1], item[0])):
+        shard_cost, shard = heapq.heappop(shard_costs)
+        shards[run_id] = shard
+        heapq.heappush(shard_costs, (shard_cost + cost, shard))
+    return shards
+
+def createQueueDirectories(queue_directory):
+    for subdirectory in QUEUE_SUBDIRECTORIES: os.makedirs(os.path.join(queue_directory, subdirectory), exist_ok=True)
+
+# Reads the attempts recorded by all the workers of a queue, in time order
+def readQueueStatusRecords(queue_directory):
+    records = []
+    for filename in sorted(os.listdir(os.path.join(queue_directory, "status"))):
+        if filename.endswith(".jsonl"): records.extend(readStatusRecords(os.path.join(queue_directory, "status", filename)))
+    return sorted(records, key=lambda record: record.get("time", 0))
+
+# Adds the runs of the configs that are not complete yet to the queue, split into "num_shards" shards balanced by their
+# predicted costs. The shards of the runs already queued and not done are reassigned along with them, and failed runs
+# are queued again. A run whose last attempt in the queue started but never ended may have left a partial flow
+# completion log, so it is only complete once marked done. With "force", all the runs are queued again, done or not.
+def enqueueRuns(queue_directory, config_filenames, num_shards=1, force=False):
+    createQueueDirectories(queue_directory)
+    last_records = {record["config"]: record for record in readQueueStatusRecords(queue_directory)}
+    runs = {}
+    for config_filename in config_filenames:
+        run = SimulationRun(config_filename)
+        run_id = deriveRunId(run.config_filename)
+        if force:
+            if os.path.exists(os.path.join(queue_directory, "done", run_id)): os.remove(os.path.join(queue_directory, "done", run_id))
+            runs[run_id] = run
+            continue
+        if os.path.exists(os.path.join(queue_directory, "done", run_id)): continue
+        is_interrupted = last_records.get(run.config_filename, {}).get("status") == "started"
+        if not run.isComplete() or is_interrupted: runs[run_id] = run
+    for filename in os.listdir(os.path.join(queue_directory, "runs")):
+        run_id = filename[:-len(".json")]
+        if not filename.endswith(".json") or run_id in runs or os.path.exists(os.path.join(queue_directory, "done", run_id)): continue
+        description = readJSON(os.path.join(queue_directory, "runs", filename))
+        if description: runs[run_id] = SimulationRun(description["config"])
+    run_costs = {run_id: predictRunCost(run) for run_id, run in runs.items()}
+    shards = assignShards(run_costs, num_shards)
+    for run_id, run in runs.items():
+        # the failed runs queued again get a new chance
+        if os.path.exists(os.path.join(queue_directory, "failed", run_id + ".json")): os.remove(os.path.join(queue_directory, "failed", run_id + ".json"))
+        writeJSONAtomically(os.path.join(queue_directory, "runs", run_id + ".json"), {"config": run.config_filename, "cost": run_costs[run_id], "shard": shards[run_id]})
+    writeJSONAtomically(os.path.join(queue_directory, "queue.json"), {"num_shards": num_shards})
+    shard_costs = [sum(cost for run_id, cost in run_costs.items() if shards[run_id] == shard) for shard in range(num_shards)]
+    print("[Queue] {} runs in {} shards of predicted costs {}".format(len(runs), num_shards, ", ".join("{:.3g}".format(cost) for cost in shard_costs)))
+    return shards
+
+# Runs the runs of a queue directory along with the workers of other hosts. A worker first claims the runs of its shard,
+# costliest first, then the runs left in the other shards. A run is claimed by creating its lease file, atomically even
+# over NFS (by hard-linking a file of the worker to it), and the worker refreshes (touches) the leases of its runs every
+# "heartbeat_interval" seconds. The lease of a worker that stopped refreshing it for "lease_timeout" seconds (according
+# to the clock of the shared volume) is reclaimed by the other workers, which rerun its run. A run is done once it is
+# marked done, and failed once its attempts on the worker that claimed it all failed: a flow completion log alone may
+# be the partial log of a worker that stopped. The worker stops once no
+# run is left to claim and no other worker holds a lease.
+class SharedQueueRunner(LocalRunner):
+    def __init__(self, queue_directory, command, working_directory, shard=0, jobs=None, memory_budget=None, memory_per_run=None, retries=1,
+                 heartbeat_interval=QUEUE_HEARTBEAT_INTERVAL_S, lease_timeout=QUEUE_LEASE_TIMEOUT_S):
+        createQueueDirectories(queue_directory)
+        self.queue_directory = queue_directory
+        self.worker_id = "{}.{}".format(socket.gethostname(), os.getpid())
+        super().__init__(command, working_directory, jobs, memory_budget, memory_per_run, retries, self.deriveQueueFilename("status", self.worker_id + ".jsonl"))
+        self.shard = shard
+        self.heartbeat_interval = heartbeat_interval
+        self.lease_timeout = lease_timeout
+        self.last_heartbeat_time = 0.
+        # runs that failed an attempt and are retried under the lease of this worker
+        self.retried_runs = []
+        # ids of the runs known to be done or failed, which are never claimed again
+        self.finished_run_ids = set()
+        self.queued_runs = []
+
+    def deriveQueueFilename(self, subdirectory, filename):
+        return os.path.join(self.queue_directory, subdirectory, filename)
+
+    # The attempts of all the workers refine the memory estimates of the runs
+    def readStatusRecords(self):
+        return readQueueStatusRecords(self.queue_directory)
+
+    # Current time of the shared volume, the reference of the lease timeouts whatever the clocks of the hosts
+    def measureQueueTime(self):
+        clock_filename = self.deriveQueueFilename("clocks", self.worker_id)
+        with open(clock_filename, "a"): os.utime(clock_filename)
+        return os.stat(clock_filename).st_mtime
+
+    # Reads the runs of the queue: the runs of the shard of this worker first, then the others, costliest first
+    def readQueuedRuns(self):
+        queued_runs = []
+        for filename in os.listdir(os.path.join(self.queue_directory, "runs")):
+            if not filename.endswith(".json"): continue
+            description = readJSON(self.deriveQueueFilename("runs", filename))
+            if description: queued_runs.append((description["shard"] != self.shard, -description["cost"], filename[:-len(".json")], description["config"]))
+        return [(run_id, config_filename) for _, _, run_id, config_filename in sorted(queued_runs)]
+
+    # Returns whether a run is done or failed according to its markers
+    def isRunFinished(self, run_id):
+        if run_id in self.finished_run_ids: return True
+        is_finished = os.path.exists(self.deriveQueueFilename("done", run_id)) or os.path.exists(self.deriveQueueFilename("failed", run_id + ".json"))
+        if is_finished: self.finished_run_ids.add(run_id)
+        return is_finished
+
+    # Claims the lease of a run; returns whether this worker holds it
+    def claimLease(self, run_id):
+        lease_filename = self.deriveQueueFilename("leases", run_id + ".lease")
+        claim_filename = "{}.{}.claim".format(lease_filename, self.worker_id)
+        with open(claim_filename, "w") as f: json.dump({"worker": self.worker_id, "time": time.time()}, f)
+        try:
+            os.link(claim_filename, lease_filename)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(claim_filename)
+
+    def isLeaseHolder(self, run_id):
+        lease = readJSON(self.deriveQueueFilename("leases", run_id + ".lease"))
+        return lease is not None and lease["worker"] == self.worker_id
+
+    def releaseLease(self, run_id):
+        if not self.isLeaseHolder(run_id): return
+        try: os.remove(self.deriveQueueFilename("leases", run_id + ".lease"))
+        except FileNotFoundError: pass
+
+    # Removes a stale lease; returns whether the run can be claimed. The lease is renamed first so that only one worker
+    # removes it, and restored if it was refreshed in the meantime.
+    def reclaimStaleLease(self, run_id, queue_time):
+        lease_filename = self.deriveQueueFilename("leases", run_id + ".lease")
+        try:
+            if queue_time - os.stat(lease_filename).st_mtime < self.lease_timeout: return False
+            reclaimed_filename = "{}.{}.reclaimed".format(lease_filename, self.worker_id)
+            os.rename(lease_filename, reclaimed_filename)
+        except FileNotFoundError:
+            return True
+        if queue_time - os.stat(reclaimed_filename).st_mtime < self.lease_timeout:
+            try: os.link(reclaimed_filename, lease_filename)
+            except FileExistsError: pass
+            os.remove(reclaimed_filename)
+            return False
+        print("[Queue] Reclaimed the stale lease of {} held by {}".format(run_id, (readJSON(reclaimed_filename) or {}).get("worker")))
+        os.remove(reclaimed_filename)
+        return True
+
+    # Claims the first unfinished run of the queue that fits in "available_memory" bytes (or any if this worker is idle)
+    def selectNextRun(self, available_memory, is_idle):
+        if self.retried_runs: return self.retried_runs.pop(0)
+        if not self.queued_runs: self.queued_runs = self.readQueuedRuns()
+        peak_memory, queue_time = None, None
+        running_run_ids = set(run.run_id for run, _, _ in self.running.values())
+        for run_id, config_filename in self.queued_runs:
+            if run_id in running_run_ids or self.isRunFinished(run_id): continue
+            if os.path.exists(self.deriveQueueFilename("leases", run_id + ".lease")):
+                if queue_time is None: queue_time = self.measureQueueTime()
+                if not self.reclaimStaleLease(run_id, queue_time): continue
+            run = SimulationRun(config_filename)
+            if peak_memory is None: peak_memory = self.readPeakMemory(self.readStatusRecords())
+            self.estimateRunMemory(run, peak_memory)
+            if run.memory_bytes > available_memory and not is_idle: continue
+            if not self.claimLease(run_id): continue
+            run.run_id = run_id
+            return run
+        return None
+
+    def completeRun(self, run, is_succeeded):
+        if is_succeeded:
+            with open(self.deriveQueueFilename("done", run.run_id), "w") as f: f.write(self.worker_id + "\n")
+            self.succeeded.append(run.config_filename)
+            print("[Queue] Completed {}".format(run.config_filename))
+        elif run.attempts <= self.retries:
+            print("[Queue] Retrying {} (attempt {} failed)".format(run.config_filename, run.attempts))
+            self.retried_runs.append(run)
+            return
+        else:
+            writeJSONAtomically(self.deriveQueueFilename("failed", run.run_id + ".json"), {"config": run.config_filename, "worker": self.worker_id, "attempts": run.attempts})
+            self.failed.append(run.config_filename)
+            print("[Queue] Failed {} after {} attempts".format(run.config_filename, run.attempts))
+        self.finished_run_ids.add(run.run_id)
+        self.releaseLease(run.run_id)
+
+    # Waits for the runs of other workers while they hold leases, which may turn stale; stops once none is left
+    def waitForRuns(self):
+        self.queued_runs = self.readQueuedRuns()
+        if not any(os.path.exists(self.deriveQueueFilename("leases", run_id + ".lease")) for run_id, _ in self.queued_runs if run_id not in self.finished_run_ids):
+            return False
+        time.sleep(QUEUE_IDLE_INTERVAL_S)
+        return True
+
+    # Refreshes the leases of the runs of this worker. The run of a lease this worker lost (reclaimed by another worker
+    # after a partition, say) is stopped, without recording it as done or failed.
+    def sendHeartbeats(self):
+        for pid, (run, process, start_time) in list(self.running.items()):
+            if not self.isLeaseHolder(run.run_id):
+                print("[Queue] Lost the lease of {}, stopping it".format(run.config_filename))
+                process.kill()
+                process.wait()
+                del self.running[pid]
+                continue
+            # a lease reclaimed in the meantime is found lost by the next heartbeat
+            try: os.utime(self.deriveQueueFilename("leases", run.run_id + ".lease"))
+            except FileNotFoundError: pass
+        self.last_heartbeat_time = time.time()
+
+    # Polls the runs for exits, sending the heartbeats of their leases in the meantime
+    def waitForProcess(self):
+        while True:
+            if time.time() - self.last_heartbeat_time >= self.heartbeat_interval: self.sendHeartbeats()
+            if not self.running: return 0, 0, None
+            pid, wait_status, resource_usage = os.wait4(-1, os.WNOHANG)
+            if pid != 0: return pid, wait_status, resource_usage
+            time.sleep(QUEUE_POLL_INTERVAL_S)
+
+    # The leases of the runs of a stopped worker are released, so that the other workers rerun them right away
+    def stopRuns(self, interrupted_runs):
+        for run in interrupted_runs + self.retried_runs: self.releaseLease(run.run_id)
+
+    def run(self, config_filenames=None):
+        print("[Queue] Worker {} of shard {} on up to {} processes within {:.1f} GiB".format(self.worker_id, self.shard, self.jobs, self.memory_budget / (1 << 30)))
+        return self.runPending()
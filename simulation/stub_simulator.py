@@ -0,0 +1,84 @@
+"""
+Stand-in for Netbench in tests of the run scheduling (simulation/local_runner.py).
+
+Usage:
+    python3 -m simulation.stub_simulator [options] <simulation_parameters.properties>
+        --duration= (optional)
+            seconds the run lasts (default: 0)
+        --memory= (optional)
+            bytes of memory the run holds while it lasts (default: 0)
+        --exit_code= (optional)
+            exit status of the run, a failed run writes no flow completion log (default: 0)
+        --fail_attempts= (optional)
+            number of attempts of the run that fail (exit status 1) before it succeeds, counted in the run folder (default: 0)
+
+The stub reads the simulation configuration like Netbench and writes the flow_completion.csv.log of the run to its run
+folder, in which every flow of the flow arrivals file completes instantly when the run starts.
+"""
+
+import os, sys, getopt, time
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from network_topology import network_topology
+from simulation.fluid_simulator import readSimulationConfiguration, readFlowArrivals, FLOW_COMPLETION_LOG_FILENAME
+
+# File of the run folder counting the attempts of the run
+STUB_ATTEMPTS_FILENAME = "stub_attempts.txt"
+
+# Counts an attempt of the run in its run folder and returns the number of attempts so far
+def countAttempt(run_directory):
+    attempts_filename = os.path.join(run_directory, STUB_ATTEMPTS_FILENAME)
+    attempts = 0
+    if os.path.isfile(attempts_filename):
+        with open(attempts_filename) as f: attempts = int(f.read().strip() or 0)
+    with open(attempts_filename, "w") as f: f.write("{}\n".format(attempts + 1))
+    return attempts + 1
+
+# Writes the flow completion log of the flows of the arrivals file, all of them completed at time 0
+def writeFlowCompletionLog(config, fct_filename):
+    _, src, dst, num_bytes = readFlowArrivals(config["traffic_arrivals_filename"])
+    zeros = np.zeros(len(src), dtype=np.int64)
+    columns = [np.arange(len(src), dtype=np.int64), src, dst, num_bytes, num_bytes, zeros, zeros, zeros, np.full(len(src), "TRUE")]
+    with network_topology.openForWriting(fct_filename) as f:
+        network_topology.writeFormattedRows(f, ",".join(["{}"] * len(columns)), columns)
+    return len(src)
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "h", ["duration=", "memory=", "exit_code=", "fail_attempts="])
+    except getopt.GetoptError:
+        print("python3 -m simulation.stub_simulator [--duration <s>] [--memory <bytes>] [--exit_code <status>] [--fail_attempts <n>] <simulation_parameters.properties>")
+        sys.exit(2)
+    duration, memory, exit_code, fail_attempts = 0., 0, 0, 0
+    for opt, arg in opts:
+        if opt == "-h":
+            print("python3 -m simulation.stub_simulator [--duration <s>] [--memory <bytes>] [--exit_code <status>] [--fail_attempts <n>] <simulation_parameters.properties>")
+            sys.exit()
+        elif opt == "--duration":
+            duration = float(arg)
+        elif opt == "--memory":
+            memory = int(float(arg))
+        elif opt == "--exit_code":
+            exit_code = int(arg)
+        elif opt == "--fail_attempts":
+            fail_attempts = int(arg)
+    if len(args) != 1:
+        print("python3 -m simulation.stub_simulator [options] <simulation_parameters.properties>")
+        sys.exit(2)
+    config = readSimulationConfiguration(args[0])
+    run_directory = os.path.join(config["run_folder_base_dir"], config.get("run_folder_name", ""))
+    os.makedirs(run_directory, exist_ok=True)
+    attempt = countAttempt(run_directory)
+    # the memory is touched so that it counts in the resident set size of the run
+    held_memory = np.ones(memory // 8, dtype=np.int64) if memory > 0 else None
+    time.sleep(duration)
+    if exit_code != 0: sys.exit(exit_code)
+    if attempt <= fail_attempts:
+        print("[Stub] Attempt {} of the run fails".format(attempt))
+        sys.exit(1)
+    num_flows = writeFlowCompletionLog(config, os.path.join(run_directory, FLOW_COMPLETION_LOG_FILENAME))
+    print("[Stub] {} flows completed".format(num_flows))
+    del held_memory
+
+if __name__ == '__main__':
+    main()
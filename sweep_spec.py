@@ -0,0 +1,92 @@
+'''
+Declarative experiment sweeps (input_parameters/sweeps.json), expanded lazily into experiment points.
+'''
+
+import json, hashlib, itertools
+import utilities
+
+# Point fields a sweep spec enumerates, in the order in which they vary (the last one fastest)
+SWEEP_AXES = ["num_nodes", "per_cu_bw_gbps", "topology", "traffic", "traffic_parameters", "message_size"]
+
+# Read the sweep specs file: a dictionary of named sweeps, each a spec or a list of specs (their union)
+def readSweepSpecs(filename):
+    return utilities.parseJSON(filename)
+
+# Returns the specs of the named sweep
+def findSweep(sweep_specs, sweep_name):
+    if sweep_name not in sweep_specs: raise Exception("Unknown sweep: {} (available: {})".format(sweep_name, ", ".join(sweep_specs.keys())))
+    specs = sweep_specs[sweep_name]
+    return specs if isinstance(specs, list) else [specs]
+
+# Resolves the per-topology values of a spec: {"by_topology": {"<topology kind>": value, "default": value}} anywhere in
+# "value" (e.g. the algorithms of a hybrid parallel model) is replaced by the value of "topology_kind"
+def resolveTopologyValues(value, topology_kind):
+    if isinstance(value, dict):
+        if "by_topology" in value:
+            values = value["by_topology"]
+            if topology_kind not in values and "default" not in values: raise Exception("No value for topology {}: {}".format(topology_kind, values))
+            return resolveTopologyValues(values.get(topology_kind, values.get("default")), topology_kind)
+        return {key: resolveTopologyValues(entry, topology_kind) for key, entry in value.items()}
+    if isinstance(value, list): return [resolveTopologyValues(entry, topology_kind) for entry in value]
+    return value
+
+# Number of levels of the SiPAC/BCube topologies of "num_nodes" nodes: "num_levels" is a number or a dictionary
+# from numbers of nodes (as strings) to numbers of levels, with an optional "default" (1 if missing)
+def deriveNumLevels(num_levels, num_nodes):
+    if isinstance(num_levels, dict): return int(num_levels.get(str(num_nodes), num_levels.get("default", 1)))
+    return int(num_levels)
+
+# Returns whether a point matches a filter: a dictionary from point fields (or traffic parameters) to a value or a list
+# of accepted values
+def matchesFilter(point, point_filter):
+    for key, accepted in point_filter.items():
+        value = point["traffic_parameters"].get(key) if key not in point and key in point["traffic_parameters"] else point.get(key)
+        if value not in (accepted if isinstance(accepted, list) else [accepted]): return False
+    return True
+
+# Directory name of the message (flow) size of a point: the message size, or for hybrid parallel traffic the
+# parallelism and collectives of its model
+def deriveFlowSize(point):
+    parameters = point["traffic_parameters"]
+    if "model_info" not in parameters: return point["message_size"]
+    model_info = parameters["model_info"]
+    return "mp{}_{}_alltoall_{}_{}_allreduce_{}".format(
+            parameters["num_mp_nodes"],
+            model_info["intra_group_algo_type"],
+            utilities.extract_byte_string(model_info["intra_group_message_size"]),
+            model_info["inter_group_algo_type"],
+            utilities.extract_byte_string(model_info["inter_group_message_size"]))
+
+# Expands the traffic parameters of a spec, {"<name>": [values]}, into the dictionaries of their Cartesian product
+def iterateTrafficParameters(traffic_parameters):
+    names = list(traffic_parameters.keys())
+    for values in itertools.product(*[traffic_parameters[name] for name in names]):
+        yield dict(zip(names, values))
+
+# Lazily expands a spec into its experiment points, in the order of SWEEP_AXES. A spec has the lists "num_nodes",
+# "per_cu_bw_gbps", "topologies" (topology kinds), "traffic" (traffic names) and optionally "message_sizes" ([0] by
+# default), "traffic_parameters" ({"<name>": [values]}), "num_levels" (see deriveNumLevels()), and the "include" and
+# "exclude" lists of filters (see matchesFilter()): a point is kept if it matches any include filter (if there are
+# any) and none of the exclude filters.
+def iterateSpecPoints(spec):
+    axes = itertools.product(spec["num_nodes"], spec["per_cu_bw_gbps"], spec["topologies"], spec["traffic"],
+                             iterateTrafficParameters(spec.get("traffic_parameters", {})), spec.get("message_sizes", [0]))
+    for num_nodes, per_cu_bw_gbps, topology_kind, traffic_name, traffic_parameters, message_size in axes:
+        point = {"num_nodes": num_nodes, "per_cu_bw_gbps": per_cu_bw_gbps, "num_levels": deriveNumLevels(spec.get("num_levels", 1), num_nodes),
+                 "topology": topology_kind, "traffic": traffic_name, "traffic_parameters": resolveTopologyValues(traffic_parameters, topology_kind),
+                 "message_size": message_size}
+        if spec.get("include") and not any(matchesFilter(point, point_filter) for point_filter in spec["include"]): continue
+        if any(matchesFilter(point, point_filter) for point_filter in spec.get("exclude", [])): continue
+        point["flow_size"] = deriveFlowSize(point)
+        yield point
+
+# Lazily expands the specs of a sweep into their distinct experiment points. Only a digest of the points already
+# generated is kept, so sweeps of many points are never materialized.
+def iterateSweepPoints(specs):
+    seen_points = set()
+    for spec in specs:
+        for point in iterateSpecPoints(spec):
+            digest = hashlib.blake2b(json.dumps(point, sort_keys=True).encode(), digest_size=16).digest()
+            if digest in seen_points: continue
+            seen_points.add(digest)
+            yield point
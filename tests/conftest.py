@@ -0,0 +1,6 @@
+'''
+The tests import the modules of the repository like its scripts do, from its root directory.
+'''
+
+import os, sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
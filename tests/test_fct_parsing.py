@@ -0,0 +1,72 @@
+'''
+Tests of the block parser of the flow completion logs (analysis/utilities.py), against the per line parse it replaced.
+'''
+
+import os, sys, importlib.util
+import numpy as np
+import pytest
+
+ANALYSIS_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis")
+sys.path.append(ANALYSIS_DIRECTORY)
+# analysis/utilities.py is loaded under another name than the utilities.py of the root directory
+specification = importlib.util.spec_from_file_location("analysis_utilities", os.path.join(ANALYSIS_DIRECTORY, "utilities.py"))
+analysis_utilities = importlib.util.module_from_spec(specification)
+specification.loader.exec_module(analysis_utilities)
+
+COLUMNS = (analysis_utilities.FCT_END_TIME_COLUMN, analysis_utilities.FCT_DURATION_COLUMN, analysis_utilities.FCT_SIZE_COLUMN)
+
+# Flow completion logs of Netbench ("id,src,dst,size,size,start,end,duration,completed" lines) and of their variants
+INTEGER_LOG = "".join("{},{},{},{},{},{},{},{},{}\n".format(flow, flow % 7, flow % 5, 1000 * flow, 1000 * flow, 10 * flow, 10 * flow + 3 * flow ** 2,
+                                                           3 * flow ** 2, "TRUE" if flow % 4 else "FALSE") for flow in range(200))
+FCT_LOGS = {"integers": INTEGER_LOG,
+            "floats": "0,1,2,1000,1000,0,12.5,12.5,TRUE\n1,2,3,2000,2000,5,20,15,TRUE\n",
+            "crlf": INTEGER_LOG.replace("\n", "\r\n"),
+            "blank_lines": "\n" + "\n\n".join(INTEGER_LOG.split("\n", 100)),
+            "no_final_newline": INTEGER_LOG.rstrip("\n"),
+            "negative_values": "0,1,2,1000,1000,0,-5,-12,TRUE\n1,2,3,-2000,2000,5,20,15,TRUE\n",
+            "duration_last": "".join("{},{},{},{},{},{},{},{}\n".format(flow, 0, 1, 1000, 1000, 0, 7 * flow, 7 * flow) for flow in range(50)),
+            "duration_last_crlf": "0,0,1,1000,1000,0,7,7\r\n1,0,1,1000,1000,0,14,14\r\n",
+            "empty": ""}
+
+# Per line parse of the log, as the analysis did before the block parser
+def parseLogLines(text, columns):
+    rows = [line.split(",") for line in text.splitlines() if line.strip()]
+    return [np.array([float(row[column]) for row in rows]) for column in columns]
+
+def writeLog(tmp_path, text):
+    fct_filename = str(tmp_path / "flow_completion.csv.log")
+    with open(fct_filename, "w", newline="") as f: f.write(text)
+    return fct_filename
+
+@pytest.mark.parametrize("log_name", sorted(FCT_LOGS))
+@pytest.mark.parametrize("chunk_size", [7, 64, 1 << 23])
+def test_block_parse_matches_the_per_line_parse(tmp_path, log_name, chunk_size):
+    text = FCT_LOGS[log_name]
+    fct_filename = writeLog(tmp_path, text)
+    blocks = list(analysis_utilities.read_fct_columns(fct_filename, COLUMNS, chunk_size=chunk_size))
+    for column_index, expected_values in enumerate(parseLogLines(text, COLUMNS)):
+        values = np.concatenate([block[column_index] for block in blocks]) if blocks else np.zeros(0)
+        assert values.dtype == np.float64
+        np.testing.assert_array_equal(values, expected_values)
+    assert sum(block[-1] for block in blocks) == text.count(",FALSE")
+
+def test_integer_fields_parse_like_int():
+    block = b"12,-7,0,123456789012345678,-1\n"
+    fields = block[:-1].split(b",")
+    buffer = np.frombuffer(block, dtype=np.uint8)
+    ends = np.cumsum([len(field) + 1 for field in fields]) - 1
+    starts = ends - np.array([len(field) for field in fields])
+    np.testing.assert_array_equal(analysis_utilities.parse_integer_fields(buffer, starts, ends), [int(field) for field in fields])
+    assert analysis_utilities.parse_integer_fields(np.frombuffer(b"1.5\n", dtype=np.uint8), np.array([0]), np.array([3])) is None
+
+def test_job_statistics_match_the_per_line_parse(tmp_path):
+    fct_filename = writeLog(tmp_path, INTEGER_LOG)
+    end_times, durations = parseLogLines(INTEGER_LOG, (analysis_utilities.FCT_END_TIME_COLUMN, analysis_utilities.FCT_DURATION_COLUMN))
+    assert analysis_utilities.extract_max_fct_from_file(fct_filename) == end_times.max()
+    assert analysis_utilities.extract_avg_fct_from_file(fct_filename) == pytest.approx(durations.mean())
+    stats = analysis_utilities.extract_fct_stats_from_file(fct_filename)
+    assert stats["max_end_time"] == end_times.max()
+    assert stats["mean_fct"] == pytest.approx(durations.mean())
+    for q in analysis_utilities.FCT_PERCENTILES:
+        assert stats[analysis_utilities.derive_percentile_stat_name(q, "fct")] == np.percentile(durations, q, method="nearest")
+    assert (stats["num_flows"], stats["num_incomplete_flows"]) == (200, INTEGER_LOG.count(",FALSE"))
@@ -0,0 +1,49 @@
+'''
+Tests of the input hashes of the experiment files (generate_experiment.py), which decide the files that are regenerated.
+'''
+
+import sys, importlib
+import generate_experiment
+from experiment_inputs import computeCodeVersion
+from network_topology import topology_registry
+from traffic.synthetic_traffic import traffic_registry, hybrid_parallel_traffic_generator
+
+FILENAMES = {"topology": "initial_topology.topology", "flow_arrivals": "flow_arrivals.txt", "link_delay": "link_delay.txt",
+             "simulation_config": "simulation_parameters.properties"}
+MODEL_INFO = {"intra_group_comm_type": "ALLTOALL", "intra_group_algo_type": "mesh", "inter_group_comm_type": "ALLREDUCE",
+              "inter_group_algo_type": "ring", "intra_group_message_size": 1e6, "inter_group_message_size": 1e6}
+
+def deriveSiPACHashes(monkeypatch, per_cu_bw_gbps, link_latency_ns):
+    monkeypatch.setattr(generate_experiment, "input_parameters", {"SIMULATION_RUNTIME_NS": 1000})
+    monkeypatch.setattr(generate_experiment, "property_dictionary", {"network_link_bw_gbps": per_cu_bw_gbps})
+    topology = topology_registry.buildTopology("sipac", 64, per_cu_bw_gbps, 2, link_latency_ns=link_latency_ns)
+    traffic_generator = traffic_registry.buildTrafficGenerator("sipco_allreduce", topology, "sipac")
+    return generate_experiment.deriveExperimentInputHashes(topology, traffic_generator, FILENAMES, "ecmp", "1.0MB")
+
+def test_link_parameters_only_change_the_link_delay_and_config_files(monkeypatch):
+    hashes = deriveSiPACHashes(monkeypatch, 1024, 10)
+    for other_hashes in (deriveSiPACHashes(monkeypatch, 2048, 10), deriveSiPACHashes(monkeypatch, 1024, 20)):
+        assert other_hashes["topology"] == hashes["topology"]
+        assert other_hashes["flow_arrivals"] == hashes["flow_arrivals"]
+        assert other_hashes["link_delay"] != hashes["link_delay"]
+        assert other_hashes["simulation_config"] != hashes["simulation_config"]
+
+def test_editing_a_component_generator_changes_the_hybrid_arrivals_hash(tmp_path, monkeypatch):
+    (tmp_path / "hashed_component_generator.py").write_text("NUM_REPETITIONS = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "hashed_component_generator", raising=False)
+    component_module = importlib.import_module("hashed_component_generator")
+    hybrid_class = hybrid_parallel_traffic_generator.HybridParallelTrafficGenerator
+    monkeypatch.setattr(hybrid_class, "CODE_DEPENDENCIES", hybrid_class.CODE_DEPENDENCIES + (component_module,))
+    monkeypatch.setattr(generate_experiment, "input_parameters", {"SIMULATION_RUNTIME_NS": 1000})
+    monkeypatch.setattr(generate_experiment, "property_dictionary", {"network_link_bw_gbps": 1024})
+    topology = topology_registry.buildTopology("torus", 64, 1024)
+    traffic_generator = hybrid_class(p=64, num_mp_nodes=16, model_info=MODEL_INFO)
+    computeCodeVersion.cache_clear()
+    hashes = generate_experiment.deriveExperimentInputHashes(topology, traffic_generator, FILENAMES, "ecmp", "hybrid")
+    (tmp_path / "hashed_component_generator.py").write_text("NUM_REPETITIONS = 2\n")
+    computeCodeVersion.cache_clear()
+    edited_hashes = generate_experiment.deriveExperimentInputHashes(topology, traffic_generator, FILENAMES, "ecmp", "hybrid")
+    assert edited_hashes["topology"] == hashes["topology"]
+    assert edited_hashes["flow_arrivals"] != hashes["flow_arrivals"]
+    computeCodeVersion.cache_clear()
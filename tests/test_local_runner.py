@@ -0,0 +1,62 @@
+'''
+Tests of the local runner (simulation/local_runner.py), which runs the stub simulator (simulation/stub_simulator.py) in
+place of Netbench.
+'''
+
+import os, sys
+from simulation import local_runner, stub_simulator
+from simulation.local_runner import LocalRunner, SimulationRun
+
+NUM_FLOWS = 3
+
+# Writes the simulation config of a run of NUM_FLOWS flows, whose run folder is "<directory>/<name>"
+def createRunConfig(directory, name):
+    flow_arrivals_filename = os.path.join(str(directory), name + "_flow_arrivals.txt")
+    with open(flow_arrivals_filename, "w") as f:
+        for flow in range(NUM_FLOWS): f.write("0,{},{},1000\n".format(flow, flow + 1))
+    config_filename = os.path.join(str(directory), name + ".properties")
+    with open(config_filename, "w") as f:
+        f.write("run_folder_base_dir={}\n".format(os.path.join(str(directory), name)))
+        f.write("traffic_arrivals_filename={}\n".format(flow_arrivals_filename))
+        f.write("finish_when_first_flows_finish={}\n".format(NUM_FLOWS))
+    return config_filename
+
+def deriveStubCommand(*options):
+    return [sys.executable, "-m", "simulation.stub_simulator"] + list(options)
+
+def countLogLines(run):
+    with open(run.getFlowCompletionLogFilename()) as f: return len(f.readlines())
+
+def countAttempts(run):
+    with open(os.path.join(run.run_directory, stub_simulator.STUB_ATTEMPTS_FILENAME)) as f: return int(f.read())
+
+def createLocalRunner(tmp_path, *options, retries=1):
+    return LocalRunner(deriveStubCommand(*options), local_runner.SIPAC_DIRECTORY, jobs=2, memory_budget=1 << 40, memory_per_run=1, retries=retries,
+                       status_filename=str(tmp_path / "run_status.jsonl"))
+
+def test_failed_run_is_retried_until_it_succeeds(tmp_path):
+    config_filename = createRunConfig(tmp_path, "run")
+    succeeded, failed = createLocalRunner(tmp_path, "--fail_attempts=1").run([config_filename])
+    assert (succeeded, failed) == ([config_filename], [])
+    statuses = [record["status"] for record in local_runner.readStatusRecords(str(tmp_path / "run_status.jsonl"))]
+    assert statuses == ["started", "failed", "started", "succeeded"]
+    assert countLogLines(SimulationRun(config_filename)) == NUM_FLOWS
+
+def test_run_fails_once_its_retries_are_exhausted(tmp_path):
+    config_filename = createRunConfig(tmp_path, "run")
+    succeeded, failed = createLocalRunner(tmp_path, "--fail_attempts=2", retries=1).run([config_filename])
+    assert (succeeded, failed) == ([], [config_filename])
+    assert not SimulationRun(config_filename).isComplete()
+
+def test_interrupted_run_is_rerun_on_resumption(tmp_path):
+    interrupted_config_filename, complete_config_filename = createRunConfig(tmp_path, "interrupted"), createRunConfig(tmp_path, "complete")
+    runner = createLocalRunner(tmp_path)
+    for config_filename, status in ((interrupted_config_filename, "started"), (complete_config_filename, "succeeded")):
+        run = SimulationRun(config_filename)
+        os.makedirs(run.run_directory)
+        with open(run.getFlowCompletionLogFilename(), "w") as f: f.write("0,0,1\n")
+        runner.recordStatus(run, status)
+    assert [run.config_filename for run in runner.findPendingRuns([interrupted_config_filename, complete_config_filename])] == [interrupted_config_filename]
+    succeeded, failed = runner.run([interrupted_config_filename, complete_config_filename])
+    assert (succeeded, failed) == ([interrupted_config_filename], [])
+    assert countLogLines(SimulationRun(interrupted_config_filename)) == NUM_FLOWS
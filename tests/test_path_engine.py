@@ -0,0 +1,41 @@
+'''
+Tests of the disk cache of the path engines of the topologies.
+'''
+
+import os, inspect
+import numpy as np
+from network_topology import network_topology, path_engine
+from network_topology.nd_torus_network_topology import NDTorusNetworkTopology
+
+def createTopology(numSwitchesInDimension=(4, 4)):
+    topology = NDTorusNetworkTopology(list(numSwitchesInDimension), 100)
+    topology.wireNetwork()
+    return topology
+
+def test_engines_are_cached_by_default():
+    cache_directory = inspect.signature(network_topology.NetworkTopology.getPathEngine).parameters["cache_directory"]
+    assert cache_directory.default == network_topology.PATH_CACHE_DIRECTORY
+    assert network_topology.PATH_CACHE_DIRECTORY.endswith("/temp/.path_cache")
+
+def test_cached_engine_is_reloaded(tmp_path, monkeypatch):
+    engine = createTopology().getPathEngine(str(tmp_path))
+    cache_filename = str(tmp_path / "{}.npz".format(createTopology().getName()))
+    assert os.path.isfile(cache_filename)
+    def failBuild(self): raise Exception("The cached path engine was built again")
+    monkeypatch.setattr(path_engine.PathEngine, "build", failBuild)
+    reloaded_engine = createTopology().getPathEngine(str(tmp_path))
+    np.testing.assert_array_equal(reloaded_engine.hops, engine.hops)
+
+def test_engine_of_another_wiring_is_built_again(tmp_path):
+    topology = createTopology()
+    topology.getPathEngine(str(tmp_path))
+    # same name, other wiring: the saved engine does not match the adjacency
+    other_topology = createTopology((2, 8))
+    other_topology.getName = topology.getName
+    assert not path_engine.PathEngine(other_topology).load(str(tmp_path / "{}.npz".format(topology.getName())))
+    engine = other_topology.getPathEngine(str(tmp_path))
+    assert engine.hops.shape[0] == other_topology.getNumServers()
+
+def test_engine_without_cache_directory():
+    engine = createTopology().getPathEngine(None)
+    assert engine.cache_filename is None
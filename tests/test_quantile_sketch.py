@@ -0,0 +1,86 @@
+'''
+Tests of the quantile sketch of the flow completion statistics (analysis/quantile_sketch.py), against np.percentile.
+'''
+
+import os, sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analysis"))
+import quantile_sketch
+
+PERCENTILES = [0, 1, 10, 25, 50, 75, 90, 99, 99.9, 100]
+# Rank error allowed of the percentiles once the sketch compacted its values
+MAX_RANK_ERROR = 0.01
+
+# Values of the tests: a heavy tailed distribution of flow completion times, with ties
+def createValues(num_values, seed=0):
+    return np.around(np.random.default_rng(seed).lognormal(10, 2, num_values))
+
+def createSketch(values, block_size=1000, k=512, seed=0):
+    sketch = quantile_sketch.QuantileSketch(k, seed)
+    for start in range(0, len(values), block_size): sketch.update(values[start:start + block_size])
+    return sketch
+
+# Largest distance, as a fraction of the number of values, between the rank of each percentile of the sketch and the
+# rank of the percentile among the values
+def computeRankError(sketch, values):
+    sorted_values = np.sort(values)
+    errors = []
+    for q, percentile in zip(PERCENTILES, sketch.getPercentiles(PERCENTILES)):
+        rank = q / 100 * (len(values) - 1)
+        lowest_rank, highest_rank = np.searchsorted(sorted_values, percentile, "left"), np.searchsorted(sorted_values, percentile, "right") - 1
+        errors.append(max(0, lowest_rank - rank, rank - highest_rank) / len(values))
+    return max(errors)
+
+def checkMoments(sketch, values):
+    assert sketch.getCount() == len(values)
+    assert np.isclose(sketch.getMean(), values.mean())
+    assert (sketch.getMin(), sketch.getMax()) == (values.min(), values.max())
+
+def test_percentiles_are_exact_below_k_values():
+    for num_values in (1, 2, 17, 512):
+        values = createValues(num_values)
+        sketch = createSketch(values, block_size=7)
+        np.testing.assert_array_equal(sketch.getPercentiles(PERCENTILES), np.percentile(values, PERCENTILES, method="nearest"))
+        checkMoments(sketch, values)
+
+def test_rank_error_is_bounded():
+    values = createValues(200000)
+    sketch = createSketch(values)
+    assert sketch.getNumRetainedItems() <= 3 * sketch.k
+    assert computeRankError(sketch, values) <= MAX_RANK_ERROR
+    checkMoments(sketch, values)
+    assert (sketch.getPercentile(0), sketch.getPercentile(100)) == (values.min(), values.max())
+
+def test_merged_sketches_match_the_whole():
+    values = createValues(100000)
+    merged_sketch = quantile_sketch.QuantileSketch()
+    for seed, run_values in enumerate(np.array_split(values, 5)): merged_sketch.merge(createSketch(run_values, seed=seed))
+    merged_sketch.merge(quantile_sketch.QuantileSketch())
+    checkMoments(merged_sketch, values)
+    assert computeRankError(merged_sketch, values) <= MAX_RANK_ERROR
+    # below k values in total, merging loses nothing
+    small_values = createValues(300)
+    merged_sketch = createSketch(small_values[:100])
+    merged_sketch.merge(createSketch(small_values[100:]))
+    np.testing.assert_array_equal(merged_sketch.getPercentiles(PERCENTILES), np.percentile(small_values, PERCENTILES, method="nearest"))
+
+def test_serialization_round_trip():
+    values = createValues(50000)
+    sketch = createSketch(values)
+    restored_sketch = quantile_sketch.QuantileSketch.fromBytes(sketch.toBytes())
+    assert restored_sketch.k == sketch.k
+    np.testing.assert_array_equal(restored_sketch.getPercentiles(PERCENTILES), sketch.getPercentiles(PERCENTILES))
+    checkMoments(restored_sketch, values)
+    # a restored sketch is merged as the sketch itself
+    other_values = createValues(50000, seed=1)
+    restored_sketch.merge(createSketch(other_values))
+    all_values = np.concatenate((values, other_values))
+    checkMoments(restored_sketch, all_values)
+    assert computeRankError(restored_sketch, all_values) <= MAX_RANK_ERROR
+
+def test_empty_sketch():
+    sketch = quantile_sketch.QuantileSketch.fromBytes(quantile_sketch.QuantileSketch().toBytes())
+    sketch.update([float("nan")])
+    assert sketch.getCount() == 0
+    assert all(np.isnan([sketch.getMean(), sketch.getMin(), sketch.getMax(), sketch.getPercentile(50)]))
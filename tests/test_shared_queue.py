@@ -0,0 +1,81 @@
+'''
+Tests of the shard/lease mode of the local runner (simulation/shared_queue.py), whose workers run the stub simulator.
+'''
+
+import os, json
+from simulation import local_runner, shared_queue
+from simulation.local_runner import SimulationRun
+from test_local_runner import NUM_FLOWS, createRunConfig, deriveStubCommand, countLogLines, countAttempts
+
+def createQueueRunner(queue_directory, worker_id):
+    runner = shared_queue.SharedQueueRunner(queue_directory, deriveStubCommand(), local_runner.SIPAC_DIRECTORY, jobs=2, memory_budget=1 << 40,
+                                            memory_per_run=1, heartbeat_interval=0.1, lease_timeout=1.)
+    runner.worker_id = worker_id
+    return runner
+
+# Makes the lease of a run look like it was claimed by "worker_id", which stopped refreshing it long ago
+def createStaleLease(queue_directory, run_id, worker_id):
+    lease_filename = os.path.join(queue_directory, "leases", run_id + ".lease")
+    with open(lease_filename, "w") as f: json.dump({"worker": worker_id, "time": 0}, f)
+    os.utime(lease_filename, (0, 0))
+
+def test_stale_lease_is_reclaimed_by_another_worker(tmp_path):
+    queue_directory = str(tmp_path / "queue")
+    config_filename = createRunConfig(tmp_path, "run")
+    shared_queue.enqueueRuns(queue_directory, [config_filename])
+    run_id = shared_queue.deriveRunId(config_filename)
+    stopped_runner = createQueueRunner(queue_directory, "stopped_host.1")
+    assert stopped_runner.claimLease(run_id)
+    os.utime(os.path.join(queue_directory, "leases", run_id + ".lease"), (0, 0))
+    succeeded, failed = createQueueRunner(queue_directory, "live_host.2").run()
+    assert (succeeded, failed) == ([config_filename], [])
+    assert not stopped_runner.isLeaseHolder(run_id)
+    assert os.path.exists(os.path.join(queue_directory, "done", run_id))
+
+def test_fresh_lease_is_not_reclaimed(tmp_path):
+    queue_directory = str(tmp_path / "queue")
+    config_filename = createRunConfig(tmp_path, "run")
+    shared_queue.enqueueRuns(queue_directory, [config_filename])
+    run_id = shared_queue.deriveRunId(config_filename)
+    assert createQueueRunner(queue_directory, "live_host.1").claimLease(run_id)
+    queue_time = createQueueRunner(queue_directory, "live_host.2").measureQueueTime()
+    assert not createQueueRunner(queue_directory, "live_host.2").reclaimStaleLease(run_id, queue_time)
+
+def test_only_done_and_failed_markers_finish_a_queued_run(tmp_path):
+    queue_directory = str(tmp_path / "queue")
+    partial_config_filename, done_config_filename = createRunConfig(tmp_path, "partial"), createRunConfig(tmp_path, "done")
+    shared_queue.enqueueRuns(queue_directory, [partial_config_filename, done_config_filename])
+    # a stopped worker left a partial log and a stale lease behind
+    partial_run = SimulationRun(partial_config_filename)
+    os.makedirs(partial_run.run_directory)
+    with open(partial_run.getFlowCompletionLogFilename(), "w") as f: f.write("0,0,1\n")
+    createStaleLease(queue_directory, shared_queue.deriveRunId(partial_config_filename), "stopped_host.1")
+    # another run is marked done without a log: it is not run again
+    with open(os.path.join(queue_directory, "done", shared_queue.deriveRunId(done_config_filename)), "w") as f: f.write("stopped_host.1\n")
+    succeeded, failed = createQueueRunner(queue_directory, "live_host.2").run()
+    assert (succeeded, failed) == ([partial_config_filename], [])
+    assert countLogLines(partial_run) == NUM_FLOWS
+    assert not SimulationRun(done_config_filename).isComplete()
+
+def test_interrupted_run_with_a_log_is_queued_again(tmp_path):
+    queue_directory = str(tmp_path / "queue")
+    interrupted_config_filename, complete_config_filename = createRunConfig(tmp_path, "interrupted"), createRunConfig(tmp_path, "complete")
+    runner = createQueueRunner(queue_directory, "stopped_host.1")
+    for config_filename, status in ((interrupted_config_filename, "started"), (complete_config_filename, "succeeded")):
+        run = SimulationRun(config_filename)
+        os.makedirs(run.run_directory)
+        with open(run.getFlowCompletionLogFilename(), "w") as f: f.write("0,0,1\n")
+        runner.recordStatus(run, status)
+    shards = shared_queue.enqueueRuns(queue_directory, [interrupted_config_filename, complete_config_filename])
+    assert list(shards) == [shared_queue.deriveRunId(interrupted_config_filename)]
+
+def test_forced_enqueue_queues_done_runs_again(tmp_path):
+    queue_directory = str(tmp_path / "queue")
+    config_filename = createRunConfig(tmp_path, "run")
+    shared_queue.enqueueRuns(queue_directory, [config_filename])
+    assert createQueueRunner(queue_directory, "host.1").run() == ([config_filename], [])
+    assert shared_queue.enqueueRuns(queue_directory, [config_filename]) == {}
+    run_id = shared_queue.deriveRunId(config_filename)
+    assert list(shared_queue.enqueueRuns(queue_directory, [config_filename], force=True)) == [run_id]
+    assert createQueueRunner(queue_directory, "host.2").run() == ([config_filename], [])
+    assert countAttempts(SimulationRun(config_filename)) == 2
@@ -0,0 +1,78 @@
+'''
+Tests of the traffic cache keys (traffic/synthetic_traffic/traffic_cache.py) and of the code versions they include.
+'''
+
+import sys, importlib
+from experiment_inputs import computeCodeVersion
+from traffic.synthetic_traffic import traffic_cache, hybrid_parallel_traffic_generator, sipco_allreduce_traffic_generator
+
+COMPONENT_MODULE = """
+from traffic.synthetic_traffic.ring_allreduce_traffic_generator import RingAllReduceTrafficGenerator
+
+def planComponent(p, total_message_size, start_time):
+    return RingAllReduceTrafficGenerator(p, p).plan_arrivals(total_message_size, start_time)
+"""
+
+COMPOSITE_MODULE = """
+import cache_component_generator
+from traffic.synthetic_traffic.synthetic_traffic_generator import SyntheticTrafficGenerator
+
+class CompositeTrafficGenerator(SyntheticTrafficGenerator):
+    CODE_DEPENDENCIES = (cache_component_generator,)
+
+    def __init__(self, p):
+        SyntheticTrafficGenerator.__init__(self, p)
+        self.setParameters(p=p)
+        self.num_plans = 0
+
+    def plan_arrivals(self, total_message_size, start_time=0):
+        self.num_plans += 1
+        return cache_component_generator.planComponent(self.num_nodes, total_message_size, start_time)
+"""
+
+# Imports the composite generator of COMPOSITE_MODULE, which plans its traffic with the module COMPONENT_MODULE
+def importCompositeGenerator(module_directory, monkeypatch):
+    (module_directory / "cache_component_generator.py").write_text(COMPONENT_MODULE)
+    (module_directory / "cache_composite_generator.py").write_text(COMPOSITE_MODULE)
+    monkeypatch.syspath_prepend(str(module_directory))
+    for module_name in ("cache_component_generator", "cache_composite_generator"): monkeypatch.delitem(sys.modules, module_name, raising=False)
+    return importlib.import_module("cache_composite_generator")
+
+def test_cache_hits_in_memory_and_on_disk(tmp_path, monkeypatch):
+    composite = importCompositeGenerator(tmp_path, monkeypatch)
+    cache_directory = str(tmp_path / "cache")
+    traffic_generator = composite.CompositeTrafficGenerator(4)
+    cache = traffic_cache.TrafficCache(cache_directory)
+    arrivals = cache.getArrivals(traffic_generator, 1000)
+    assert cache.getArrivals(traffic_generator, 1000) == arrivals
+    assert traffic_generator.num_plans == 1
+    traffic_generator = composite.CompositeTrafficGenerator(4)
+    assert traffic_cache.TrafficCache(cache_directory).getArrivals(traffic_generator, 1000) == arrivals
+    assert traffic_generator.num_plans == 0
+
+def test_editing_a_component_module_misses_the_cache(tmp_path, monkeypatch):
+    composite = importCompositeGenerator(tmp_path, monkeypatch)
+    cache_directory = str(tmp_path / "cache")
+    traffic_generator = composite.CompositeTrafficGenerator(4)
+    cache = traffic_cache.TrafficCache(cache_directory)
+    cache.getArrivals(traffic_generator, 1000)
+    key = cache.deriveKey(traffic_generator, "arrivals", 1000, 0)
+    with open(tmp_path / "cache_component_generator.py", "a") as f: f.write("# edited\n")
+    computeCodeVersion.cache_clear()
+    assert cache.deriveKey(traffic_generator, "arrivals", 1000, 0) != key
+    traffic_generator = composite.CompositeTrafficGenerator(4)
+    traffic_cache.TrafficCache(cache_directory).getArrivals(traffic_generator, 1000)
+    assert traffic_generator.num_plans == 1
+
+def test_planning_does_not_change_the_key():
+    cache = traffic_cache.TrafficCache()
+    traffic_generator = sipco_allreduce_traffic_generator.SiPCOAllReduceTrafficGenerator(4, 2, 16)
+    key = cache.deriveKey(traffic_generator, "template", 0)
+    cache.getArrivals(traffic_generator, 1000)
+    assert cache.deriveKey(traffic_generator, "template", 0) == key
+
+def test_hybrid_parallel_code_version_covers_its_component_generators():
+    module = hybrid_parallel_traffic_generator
+    component_modules = [value for name, value in vars(module).items() if name.endswith("_traffic_generator") and name != "synthetic_traffic_generator"]
+    assert component_modules
+    assert set(component_modules) <= set(module.HybridParallelTrafficGenerator.CODE_DEPENDENCIES)
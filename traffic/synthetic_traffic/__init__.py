@@ -14,4 +14,6 @@ __all__ = ["synthetic_traffic_generator",
 			"mesh_allreduce_traffic_generator",
 			"mesh_alltoall_traffic_generator",
 			"hybrid_parallel_traffic_generator",
+			"traffic_cache",
+			"traffic_registry",
 		   ]
\ No newline at end of file
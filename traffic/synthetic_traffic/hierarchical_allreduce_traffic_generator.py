@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from .synthetic_traffic_generator import *
 
 '''
@@ -8,6 +9,7 @@ class HierarchicalAllReduceTrafficGenerator(SyntheticTrafficGenerator):
     # Hierarchical ring-allreduce
     def __init__(self, p, k, num_server_per_job):
         SyntheticTrafficGenerator.__init__(self, p=p) # 100 packets per flow
+        self.setParameters(p=p, k=k, num_server_per_job=num_server_per_job)
         self.num_servers = p
         self.num_groups = k
         self.num_server_per_job = num_server_per_job
@@ -18,34 +20,25 @@ class HierarchicalAllReduceTrafficGenerator(SyntheticTrafficGenerator):
         self.num_jobs = self.num_servers // self.num_server_per_job
         self.name = "hierarchical_allreduce"
 
-    def plan_arrivals(self, total_message_size, start_time=0):
+    def plan_template(self, start_time=0):
+        num_grouped_servers = self.num_groups * self.num_server_per_group
+        # ring within each group, without self-pairs (i.e. groups of a single node)
+        intra_src, intra_dst = ringPairs(num_grouped_servers, self.num_server_per_group)
+        intra_src, intra_dst = intra_src[intra_src != intra_dst], intra_dst[intra_src != intra_dst]
+        # ring among the leader nodes (assume it to be the first node within each group)
+        leaders = np.arange(self.num_groups, dtype=np.int64) * self.num_server_per_group
+        inter_src, inter_dst = leaders, np.roll(leaders, -1)
+        inter_src, inter_dst = inter_src[inter_src != inter_dst], inter_dst[inter_src != inter_dst]
+        # Step 1): first intragroup ring-allreduce parallelized for all the groups
+        step1 = TrafficEvents.fromRepeatedSteps(intra_src, intra_dst, self.num_repetitions_intragroup, start_time, 0)
+        start_time += self.num_repetitions_intragroup
+        # Step 2): then intergroup ring-allreduce
+        step2 = TrafficEvents.fromRepeatedSteps(inter_src, inter_dst, self.num_repetitions_intergroup, start_time, 0)
+        start_time += self.num_repetitions_intergroup
+        # Step 3): then finish with intragroup ring-allreduce
+        step3 = TrafficEvents.fromRepeatedSteps(intra_src, intra_dst, self.num_repetitions_intragroup, start_time, 0)
+        return TrafficTemplate([step1, step2, step3])
+
+    def message_sizes(self, total_message_size):
         per_node_message_size = math.ceil(total_message_size / self.num_server_per_group)
-        traffic_arrival_events = []
-        start_time = start_time
-        for _ in range(self.num_repetitions_intragroup):
-            # Step 1): first intragroup ring-allreduce parallelized for all the groups
-            for group_id in range(self.num_groups):
-                group_offset = group_id * self.num_server_per_group
-                for src in range(group_offset, group_offset  + self.num_server_per_group):
-                    dst = group_offset + (src + 1 - group_offset) % self.num_server_per_group
-                    if src != dst: traffic_arrival_events.append( (start_time, src, dst, int(per_node_message_size)) )
-            start_time += 1
-        
-        for _ in range(self.num_repetitions_intergroup):
-            # Step 2): then intergroup ring-allreduce
-            # first select a leader node from each group (for now assume it to be the first node within each group)
-            for group_id in range(self.num_groups):
-                src = group_id * self.num_server_per_group
-                dst = (group_id + 1) % self.num_groups * self.num_server_per_group
-                if src != dst: traffic_arrival_events.append( (start_time, src, dst, int(per_node_message_size)) )
-            start_time += 1
-        
-        for _ in range(self.num_repetitions_intragroup):    
-            # Step 3): then finish with intragroup ring-allreduce
-            for group_id in range(self.num_groups):
-                group_offset = group_id * self.num_server_per_group
-                for src in range(group_offset, group_offset  + self.num_server_per_group):
-                    dst = group_offset + (src + 1 - group_offset) % self.num_server_per_group
-                    if src != dst: traffic_arrival_events.append( (start_time, src, dst, int(per_node_message_size)) )
-            start_time += 1
-        return traffic_arrival_events
\ No newline at end of file
+        return [int(per_node_message_size)] * 3
\ No newline at end of file
@@ -2,17 +2,27 @@
 Generates hybrid parallel traffic.
 '''
 
+import numpy as np
 from traffic.synthetic_traffic import synthetic_traffic_generator
 from traffic.synthetic_traffic import sipco_allgather_traffic_generator, sipco_allreduce_traffic_generator, sipco_alltoall_traffic_generator
 from traffic.synthetic_traffic import ring_allgather_traffic_generator, ring_allreduce_traffic_generator, ring_alltoall_traffic_generator
 from traffic.synthetic_traffic import hierarchical_allgather_traffic_generator, hierarchical_allreduce_traffic_generator, hierarchical_alltoall_traffic_generator
 from traffic.synthetic_traffic import mesh_allreduce_traffic_generator, mesh_alltoall_traffic_generator
 from traffic.synthetic_traffic import primitive_alltoall_traffic_generator
+from traffic.synthetic_traffic.synthetic_traffic_generator import TrafficEvents
 
 class HybridParallelTrafficGenerator(synthetic_traffic_generator.SyntheticTrafficGenerator):
+    # The generators its traffic is planned with, whose code versions its traffic depends on
+    CODE_DEPENDENCIES = (sipco_allgather_traffic_generator, sipco_allreduce_traffic_generator, sipco_alltoall_traffic_generator,
+                         ring_allgather_traffic_generator, ring_allreduce_traffic_generator, ring_alltoall_traffic_generator,
+                         hierarchical_allgather_traffic_generator, hierarchical_allreduce_traffic_generator, hierarchical_alltoall_traffic_generator,
+                         mesh_allreduce_traffic_generator, mesh_alltoall_traffic_generator,
+                         primitive_alltoall_traffic_generator)
+
     # Model parallel within group, data parallel across groups
     def __init__(self, p, num_mp_nodes, model_info):
         synthetic_traffic_generator.SyntheticTrafficGenerator.__init__(self, p=p)
+        self.setParameters(p=p, num_mp_nodes=num_mp_nodes, model_info=model_info)
         self.num_nodes = p
         self.num_mp_nodes = num_mp_nodes
         self.num_dp_nodes = self.num_nodes // self.num_mp_nodes
@@ -30,7 +40,7 @@ class HybridParallelTrafficGenerator(synthetic_traffic_generator.SyntheticTraffi
 
     def generateTrafficCommType(self, comm_type, algo_type, message_size, comm_data:dict):
         traffic_generator = None
-        traffic_events = []
+        traffic_events = TrafficEvents()
         p = comm_data['p']
         r, l = (comm_data["r"], comm_data["l"]) if algo_type == "sipco" else (None, None)
         if comm_type == "ALLTOALL":
@@ -66,39 +76,27 @@ class HybridParallelTrafficGenerator(synthetic_traffic_generator.SyntheticTraffi
 
     def map_traffic_events(self, unmapped_traffic, nodes_to_map, start_time):
         # unmapped traffic should contain a continuous block of nodes
-        min_node, max_node = float('inf'), -float("inf")
-        for (_, src, dst, _) in unmapped_traffic:
-            if min(src, dst) < min_node: min_node = min(src, dst)
-            if max(src, dst) > max_node: max_node = max(src, dst)
+        src, dst = unmapped_traffic.getSources(), unmapped_traffic.getDestinations()
+        min_node, max_node = min(src.min(), dst.min()), max(src.max(), dst.max())
         assert(max_node - min_node + 1 == len(nodes_to_map))
-        node_map = {}
-        for i, node in enumerate(range(min_node, max_node+1)):
-            node_map[node] = nodes_to_map[i]
-        traffic_events_new = []
-        for (st, src,dst, fs) in unmapped_traffic:
-            new_src, new_dst = node_map[src], node_map[dst]
-            traffic_events_new.append((st+start_time, new_src, new_dst, fs))
-        return traffic_events_new
+        node_map = np.asarray(nodes_to_map, dtype=np.int64)
+        return TrafficEvents.fromColumns(unmapped_traffic.getTimes() + start_time, node_map[src - min_node], node_map[dst - min_node], unmapped_traffic.getBytes())
 
     def plan_arrivals(self,total_message_size, start_time=0):
         assert(total_message_size==0), "Make sure we are not using the passed in message size!"
-        traffic_arrival_events = []
         start_time = start_time
         mp_groups = [list(range(m*self.num_mp_nodes, (m+1)*self.num_mp_nodes)) for m in range(self.num_mp_groups)]
         dp_groups = self.findCommunicatingNodes(mp_groups)
         
         # intra mp_group alltoall - model parallel 
-        for mp_group in mp_groups:
-            traffic_events = self.generateTrafficForNodeGroup(mp_group, "intra", start_time)
-            traffic_arrival_events += traffic_events
-        traffic_arrival_events.sort(key=lambda x: x[0])
+        traffic_arrival_events = TrafficEvents.concatenate([self.generateTrafficForNodeGroup(mp_group, "intra", start_time) for mp_group in mp_groups])
+        traffic_arrival_events = traffic_arrival_events[np.argsort(traffic_arrival_events.getTimes(), kind="stable")]
         
         # inter mp_group allreduce -- data parallel
         start_time = traffic_arrival_events[-1][0] + 1
-        for dp_group in dp_groups:
-            traffic_events = self.generateTrafficForNodeGroup(dp_group, "inter", start_time)
-            traffic_arrival_events += traffic_events
-        traffic_arrival_events.sort(key=lambda x: (x[0], x[1]))
+        traffic_arrival_events = TrafficEvents.concatenate([traffic_arrival_events] + [self.generateTrafficForNodeGroup(dp_group, "inter", start_time) for dp_group in dp_groups])
+        # sort by time, then src (np.lexsort is stable)
+        traffic_arrival_events = traffic_arrival_events[np.lexsort((traffic_arrival_events.getSources(), traffic_arrival_events.getTimes()))]
         return traffic_arrival_events
 
     def generateTrafficForNodeGroup(self, group, group_type, start_time):
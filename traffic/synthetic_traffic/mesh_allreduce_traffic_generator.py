@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from .synthetic_traffic_generator import *
 
 '''
@@ -7,6 +8,7 @@ Generates mesh allreduce traffic.
 class MeshAllReduceTrafficGenerator(SyntheticTrafficGenerator):
     def __init__(self, p, num_server_per_job=32):
         SyntheticTrafficGenerator.__init__(self, p=p) # 100 packets per flow
+        self.setParameters(p=p, num_server_per_job=num_server_per_job)
         self.num_servers = p
         self.num_server_per_job = num_server_per_job
         self.num_repetitions = 2
@@ -14,15 +16,14 @@ class MeshAllReduceTrafficGenerator(SyntheticTrafficGenerator):
         self.num_jobs = self.num_servers // self.num_server_per_job
         self.name = "mesh_allreduce"
     
-    def plan_arrivals(self, total_message_size, start_time=0):
-        per_node_message_size = math.ceil(total_message_size / self.num_nodes)
-        traffic_arrival_events = []
-        start_time = start_time
+    def plan_template(self, start_time=0):
         # diffuse + collect
-        for it in range(self.num_repetitions):
-            start_time = start_time + it
-            for src in range(self.num_servers):
-                for dst in range(self.num_servers):
-                    if src != dst:
-                        traffic_arrival_events.append( (start_time, src, dst, int(per_node_message_size)) )
-        return traffic_arrival_events
\ No newline at end of file
+        src, dst = meshPairs(np.arange(self.num_servers))
+        # the start time of repetition "it" is shifted by 0 + 1 + ... + it
+        iterations = np.arange(self.num_repetitions, dtype=np.int64)
+        start_times = start_time + iterations * (iterations + 1) // 2
+        return TrafficTemplate([TrafficEvents.fromColumns(np.repeat(start_times, len(src)), np.tile(src, self.num_repetitions), np.tile(dst, self.num_repetitions), 0)])
+
+    def message_sizes(self, total_message_size):
+        per_node_message_size = math.ceil(total_message_size / self.num_nodes)
+        return [int(per_node_message_size)]
\ No newline at end of file
@@ -1,3 +1,4 @@
+import numpy as np
 from .synthetic_traffic_generator import *
 
 '''
@@ -6,16 +7,14 @@ Generates primitive all-to-all traffic.
 class PrimitiveAllToAllTrafficGenerator(SyntheticTrafficGenerator):
     def __init__(self, p, num_repetitions=1):
         SyntheticTrafficGenerator.__init__(self, p)
+        self.setParameters(p=p, num_repetitions=num_repetitions)
         self.num_servers = p
         self.num_repetitions = num_repetitions
         self.name = "primitive_alltoall"
     
-    def plan_arrivals(self, total_message_size, start_time=0):
-        traffic_arrival_events = []
-        for _ in range(self.num_repetitions):
-            for src in range(self.num_servers):
-                for dst in range(self.num_servers):
-                    if src != dst:
-                        traffic_arrival_events.append((start_time, src, dst, int(total_message_size)))
-            start_time += 1
-        return traffic_arrival_events
\ No newline at end of file
+    def plan_template(self, start_time=0):
+        src, dst = meshPairs(np.arange(self.num_servers))
+        return TrafficTemplate([TrafficEvents.fromRepeatedSteps(src, dst, self.num_repetitions, start_time, 0)])
+
+    def message_sizes(self, total_message_size):
+        return [int(total_message_size)]
\ No newline at end of file
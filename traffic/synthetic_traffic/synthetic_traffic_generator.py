@@ -1,41 +1,273 @@
 import os
-import matplotlib.pyplot as plt
+import numpy as np
+from experiment_inputs import checkParameters
+from network_topology import network_topology
+
+# Traffic matrices of at least this many nodes are drawn as a heatmap of blocks of nodes (see drawHeatmap())
+HEATMAP_COARSENING_THRESHOLD = 1024
+# Number of blocks per side of a block-aggregated heatmap
+HEATMAP_NUM_BLOCKS = 256
+
+# Columnar layout of a traffic arrival event: (time, src, dst, bytes)
+EVENT_DTYPE = np.dtype([("time", np.int64), ("src", np.int32), ("dst", np.int32), ("bytes", np.int64)])
+
+# Container of traffic arrival events stored as a NumPy structured array. Iterating over it yields the
+# (time, src, dst, bytes) tuples that plan_arrivals() used to return, so existing callers keep working.
+class TrafficEvents(object):
+    def __init__(self, events=None):
+        self.events = np.zeros(0, dtype=EVENT_DTYPE) if events is None else events
+
+    # Builds events from columns; scalars (e.g. a constant message size) are broadcast against the arrays.
+    @classmethod
+    def fromColumns(cls, time, src, dst, num_bytes):
+        time, src, dst, num_bytes = np.broadcast_arrays(np.asarray(time), np.asarray(src), np.asarray(dst), np.asarray(num_bytes))
+        events = np.empty(time.size, dtype=EVENT_DTYPE)
+        events["time"], events["src"], events["dst"], events["bytes"] = time.ravel(), src.ravel(), dst.ravel(), num_bytes.ravel()
+        return cls(events)
+
+    # Builds the events of "num_steps" consecutive time steps starting at "start_time", where the same
+    # (src, dst) pairs communicate "num_bytes" in every step.
+    @classmethod
+    def fromRepeatedSteps(cls, src, dst, num_steps, start_time, num_bytes):
+        src, dst = np.broadcast_arrays(np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64))
+        steps = np.arange(num_steps, dtype=np.int64) + start_time
+        return cls.fromColumns(np.repeat(steps, src.size), np.tile(src.ravel(), num_steps), np.tile(dst.ravel(), num_steps), num_bytes)
+
+    @classmethod
+    def fromTuples(cls, tuples):
+        return cls(np.array([tuple(event) for event in tuples], dtype=EVENT_DTYPE))
+
+    @classmethod
+    def concatenate(cls, events_list):
+        events_list = [events.events if isinstance(events, TrafficEvents) else TrafficEvents.fromTuples(events).events for events in events_list]
+        if not events_list: return cls()
+        return cls(np.concatenate(events_list))
+
+    def getTimes(self):
+        return self.events["time"]
+
+    def getSources(self):
+        return self.events["src"]
+
+    def getDestinations(self):
+        return self.events["dst"]
+
+    def getBytes(self):
+        return self.events["bytes"]
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return zip(self.events["time"].tolist(), self.events["src"].tolist(), self.events["dst"].tolist(), self.events["bytes"].tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return tuple(x.item() for x in self.events[index])
+        return TrafficEvents(self.events[index])
+
+    def __add__(self, other):
+        return TrafficEvents.concatenate([self, other])
+
+    def __eq__(self, other):
+        if isinstance(other, TrafficEvents): return np.array_equal(self.events, other.events)
+        return self.toList() == [tuple(event) for event in other]
+
+    def toList(self):
+        return list(self)
+
+# Message-size independent structure of planned traffic: the (time, src, dst) of the arrival events, split in
+# consecutive segments whose events all carry the same message size. Instantiating a template for given
+# message sizes only fills in the byte column, so a message-size sweep plans the flow structure only once.
+class TrafficTemplate(object):
+    def __init__(self, segments):
+        self.events = TrafficEvents.concatenate(segments)
+        self.segment_lengths = np.array([len(segment) for segment in segments], dtype=np.int64)
+
+    # Builds a template from the concatenated events of its segments and the length of each segment
+    @classmethod
+    def fromEvents(cls, events, segment_lengths):
+        template = cls.__new__(cls)
+        template.events = events
+        template.segment_lengths = np.asarray(segment_lengths, dtype=np.int64)
+        assert(template.segment_lengths.sum() == len(events))
+        return template
+
+    def getNumSegments(self):
+        return len(self.segment_lengths)
+
+    # Returns the TrafficEvents of the template, where the events of segment i carry message_sizes[i] bytes
+    def instantiate(self, message_sizes):
+        assert(len(message_sizes) == self.getNumSegments()), "Expected {} message sizes, got {}.".format(self.getNumSegments(), len(message_sizes))
+        events = np.copy(self.events.events)
+        events["bytes"] = np.repeat(np.asarray(message_sizes, dtype=np.int64), self.segment_lengths)
+        return TrafficEvents(events)
+
+# Returns the (src, dst) pairs of a ring within each consecutive block of "group_size" nodes,
+# i.e. node i sends to the next node of its block, in ascending order of src.
+def ringPairs(num_nodes, group_size):
+    src = np.arange(num_nodes, dtype=np.int64)
+    group_offset = src - src % group_size
+    dst = group_offset + (src - group_offset + 1) % group_size
+    return src, dst
+
+# Returns the (src, dst) pairs of a full mesh within each row of "node_groups" (a 2D array of node ids),
+# ordered by row, then src, then dst, excluding self-pairs.
+def meshPairs(node_groups):
+    node_groups = np.asarray(node_groups, dtype=np.int64)
+    if node_groups.ndim == 1: node_groups = node_groups[None, :]
+    group_size = node_groups.shape[1]
+    src_index, dst_index = np.nonzero(~np.eye(group_size, dtype=bool))
+    return node_groups[:, src_index].ravel(), node_groups[:, dst_index].ravel()
+
+# Sums the entries of a square matrix over blocks of block_size x block_size entries (the last blocks may be smaller)
+def coarsenSquareMatrix(matrix, block_size):
+    block_starts = np.arange(0, len(matrix), block_size)
+    return np.add.reduceat(np.add.reduceat(np.asarray(matrix), block_starts, axis=0), block_starts, axis=1)
 
 class SyntheticTrafficGenerator(object):
     def __init__(self, p):
         self.num_nodes = p 
         self.name = ""
 
-    # Generate the traffic probability matrix based on traffic arrival events
+    # Records the parameters the traffic is generated from (the arguments of the constructor of the generator), which
+    # key its traffic in the cache and the experiment manifest. They must be plain (JSON) values.
+    def setParameters(self, **parameters):
+        self.parameters = checkParameters(type(self).__name__, parameters)
+
+    def getParameters(self):
+        if not hasattr(self, "parameters"): raise Exception("{} does not record its parameters.".format(type(self).__name__))
+        return dict(self.parameters)
+
+    # Generate the traffic probability matrix based on traffic arrival events, i.e., the bytes sent from src to dst
+    # (num_nodes x num_nodes array), summed over the flattened src * num_nodes + dst indices of the events
     def generateProbabilityMatrix(self, traffic_arrival_events, num_nodes):
-        traffic_matrix = [[0]*num_nodes for _ in range(num_nodes)]
-        for _, src, dst, byte in traffic_arrival_events:
-            assert(src in range(len(traffic_matrix)) and dst in range(len(traffic_matrix)))
-            traffic_matrix[src][dst] += byte
-        return traffic_matrix
+        if not isinstance(traffic_arrival_events, TrafficEvents): traffic_arrival_events = TrafficEvents.fromTuples(traffic_arrival_events)
+        src, dst = traffic_arrival_events.getSources().astype(np.int64), traffic_arrival_events.getDestinations().astype(np.int64)
+        assert(np.all((src >= 0) & (src < num_nodes) & (dst >= 0) & (dst < num_nodes)))
+        traffic_matrix = np.bincount(src * num_nodes + dst, weights=traffic_arrival_events.getBytes(), minlength=num_nodes * num_nodes)
+        return traffic_matrix.astype(np.int64).reshape(num_nodes, num_nodes)
 
-    # Normalize the sum of all entries in a squre matrix to 'norm'
+    # Normalize the sum of all entries in a square matrix to 'norm' (see network_topology.NormalizeSquareMatrix())
     def NormalizeSquareMatrix(self, matrix, norm):
-        num_entries = len(matrix)
-        new_matrix = [0] * num_entries
-        total = sum([sum(x) for x in matrix])
-        multiplicity = float(norm) / total
-        for i in range(num_entries):
-            new_matrix[i] = [0.] * num_entries
-            for j in range(num_entries):
-                new_matrix[i][j] = float(matrix[i][j]) * multiplicity
-        return new_matrix
+        return network_topology.NormalizeSquareMatrix(matrix, norm)
 
     def get_name(self):
         return self.name
 
-    def plan_arrivals(self):
-        raise Exception("Plan Arrivals method is not implemented.")
+    # Returns the TrafficTemplate of the planned traffic arrival events, i.e., their message-size independent structure.
+    def plan_template(self, start_time=0):
+        raise Exception("Plan template method is not implemented.")
+
+    # Returns the message size (in bytes) of the events of each segment of the template, given the total message size.
+    def message_sizes(self, total_message_size):
+        raise Exception("Message sizes method is not implemented.")
+
+    # Returns whether the generator plans its traffic from a TrafficTemplate
+    def has_template(self):
+        return type(self).plan_template is not SyntheticTrafficGenerator.plan_template
+
+    # Returns the planned traffic arrival events of a template planned by this generator for the total message size.
+    def instantiate_template(self, template, total_message_size):
+        return template.instantiate(self.message_sizes(total_message_size))
+
+    # Returns the planned traffic arrival events as a TrafficEvents instance.
+    def plan_arrivals(self, total_message_size, start_time=0):
+        return self.instantiate_template(self.plan_template(start_time), total_message_size)
+
+    # Returns the planned traffic arrival events of each total message size, planning the flow structure only once.
+    def plan_arrivals_sweep(self, total_message_sizes, start_time=0):
+        template = self.plan_template(start_time)
+        return [self.instantiate_template(template, total_message_size) for total_message_size in total_message_sizes]
+
+    # Returns the flows of the traffic planned for "total_message_size" between the nodes of "topology" (wired if needed):
+    # their source and destination nodes, their bits and the index of their step (the distinct event times, in order).
+    # Self-flows are dropped.
+    def plan_flows(self, topology, total_message_size):
+        traffic_arrival_events = self.plan_arrivals(total_message_size)
+        if topology.getAdjacency() is None: topology.wireNetwork()
+        src = topology.mapServerIds(traffic_arrival_events.getSources().astype(np.int64))
+        dst = topology.mapServerIds(traffic_arrival_events.getDestinations().astype(np.int64))
+        is_flow = src != dst
+        _, step_index = np.unique(traffic_arrival_events.getTimes()[is_flow], return_inverse=True)
+        return src[is_flow], dst[is_flow], traffic_arrival_events.getBytes()[is_flow] * 8., step_index.ravel()
+
+    # Predicts the time (ns) of each step of the traffic planned for "total_message_size" on "topology" with an alpha-beta
+    # model, without simulating it. Each step lasts as long as its slowest flow. A flow takes the latency of its shortest
+    # path (alpha: the sum of its link latencies, where "link_latency_ns" stands for the latency of topologies that leave
+    # it to the Netbench configuration), plus its bits over the bandwidth it gets (beta): its bottleneck link bandwidth,
+    # unless the bits that its source sends (or that its destination receives) in the step take longer over the total
+    # bandwidth of the links of that node.
+    def predict_step_times(self, topology, total_message_size, link_latency_ns=0):
+        src, dst, bits, step_index = self.plan_flows(topology, total_message_size)
+        if len(src) == 0: return np.zeros(0)
+        sources, source_index = np.unique(src, return_inverse=True)
+        _, path_latencies, path_bandwidths = topology.computeShortestPathMetrics(sources, link_latency_ns)
+        source_index = source_index.ravel()
+        flow_latencies, flow_bandwidths = path_latencies[source_index, dst], path_bandwidths[source_index, dst]
+        # bits sent by the source and received by the destination of each flow within its step
+        num_nodes = topology.getAdjacency().getNumNodes()
+        _, sending = np.unique(step_index * num_nodes + src, return_inverse=True)
+        _, receiving = np.unique(step_index * num_nodes + dst, return_inverse=True)
+        sent_bits, received_bits = np.bincount(sending.ravel(), bits)[sending.ravel()], np.bincount(receiving.ravel(), bits)[receiving.ravel()]
+        egress_bandwidths, ingress_bandwidths = topology.getNodeBandwidths()
+        flow_times = flow_latencies + np.maximum.reduce([bits / flow_bandwidths, sent_bits / egress_bandwidths[src], received_bits / ingress_bandwidths[dst]])
+        step_times = np.zeros(step_index.max() + 1)
+        np.maximum.at(step_times, step_index, flow_times)
+        return step_times
+
+    # Predicts the job completion time (ns) of the traffic planned for "total_message_size" on "topology": the steps of the
+    # schedule run one after the other, see predict_step_times().
+    def predict_completion_time(self, topology, total_message_size, link_latency_ns=0):
+        return float(self.predict_step_times(topology, total_message_size, link_latency_ns).sum())
+
+    # Estimates the load of every link in each step of the traffic planned for "total_message_size" on "topology", without
+    # simulating it: the traffic matrix of the step (bits per node pair) times the ECMP routing matrix (the fraction of the
+    # traffic of a pair crossing each link, see PathEngine.computeECMPLinkLoads()). Returns a dictionary of per-step arrays:
+    #   - lower_bound_ns: bandwidth-bound lower bound on the step time, i.e., the bits of the most loaded link over its bandwidth
+    #   - predicted_ns: step time predicted by the alpha-beta model (predict_step_times())
+    #   - max_utilization, mean_utilization: link loads over the bits the links carry in the predicted step time (above 1
+    #     when links are more shared than the alpha-beta model assumes)
+    #   - bottleneck_src, bottleneck_dst, bottleneck_role, bottleneck_utilization: the "top" most utilized links (step x top)
+    def estimate_link_loads(self, topology, total_message_size, link_latency_ns=0, top=3):
+        src, dst, bits, step_index = self.plan_flows(topology, total_message_size)
+        predicted_step_times = self.predict_step_times(topology, total_message_size, link_latency_ns)
+        num_steps = len(predicted_step_times)
+        adjacency, path_engine = topology.getAdjacency(), topology.getPathEngine()
+        num_nodes = adjacency.getNumNodes()
+        link_src, link_dst, link_multiplicity = adjacency.getEdgeArrays()
+        capacities = link_multiplicity * topology.getLinkBandwidths(link_src, link_dst)
+        top = min(top, len(capacities))
+        # traffic matrices, as the bits of each (step, pair), sorted by step
+        step_pairs, inverse = np.unique(step_index * num_nodes * num_nodes + src * num_nodes + dst, return_inverse=True)
+        step_pair_bits = np.bincount(inverse.ravel(), bits)
+        step_starts = np.searchsorted(step_pairs // (num_nodes * num_nodes), np.arange(num_steps + 1))
+        step_pairs %= num_nodes * num_nodes
+        link_loads = {"lower_bound_ns": np.zeros(num_steps), "predicted_ns": predicted_step_times,
+                      "max_utilization": np.zeros(num_steps), "mean_utilization": np.zeros(num_steps),
+                      "bottleneck_links": np.zeros((num_steps, top), dtype=np.int64), "bottleneck_utilization": np.zeros((num_steps, top))}
+        for step in range(num_steps):
+            pairs = step_pairs[step_starts[step]:step_starts[step + 1]]
+            link_times = path_engine.computeECMPLinkLoads(pairs // num_nodes, pairs % num_nodes, step_pair_bits[step_starts[step]:step_starts[step + 1]]) / capacities
+            utilizations = link_times / predicted_step_times[step] if predicted_step_times[step] > 0 else np.zeros(len(capacities))
+            bottleneck_links = np.argpartition(-link_times, top - 1)[:top] if top else np.zeros(0, dtype=np.int64)
+            bottleneck_links = bottleneck_links[np.argsort(-link_times[bottleneck_links], kind="stable")]
+            link_loads["lower_bound_ns"][step] = link_times.max()
+            link_loads["max_utilization"][step], link_loads["mean_utilization"][step] = utilizations.max(), utilizations.mean()
+            link_loads["bottleneck_links"][step], link_loads["bottleneck_utilization"][step] = bottleneck_links, utilizations[bottleneck_links]
+        bottleneck_links = link_loads.pop("bottleneck_links")
+        link_loads["bottleneck_src"], link_loads["bottleneck_dst"] = link_src[bottleneck_links], link_dst[bottleneck_links]
+        link_loads["bottleneck_role"] = topology.getLinkRoles(link_src[bottleneck_links], link_dst[bottleneck_links])
+        return link_loads
 
-    # Plot traffic heatmap to "file_path"
+    # Plot traffic heatmap to "file_path". matplotlib is only imported here, so that planning traffic does not load it.
     def drawHeatmap(self, probability_matrix, file_path=None):
+        import matplotlib.pyplot as plt
         print("*** Drawing heat map...")
         probability_matrix = self.NormalizeSquareMatrix(probability_matrix, 1)
-        plt.matshow(probability_matrix, cmap="Reds", aspect='auto')
+        num_nodes = len(probability_matrix)
+        # large matrices are drawn as blocks of nodes, to bound the size of the image
+        if num_nodes >= HEATMAP_COARSENING_THRESHOLD: probability_matrix = coarsenSquareMatrix(probability_matrix, -(-num_nodes // HEATMAP_NUM_BLOCKS))
+        plt.matshow(probability_matrix, cmap="Reds", aspect='auto', extent=(-0.5, num_nodes - 0.5, num_nodes - 0.5, -0.5))
         plt.colorbar()
-        if file_path and not os.path.isfile(file_path): plt.savefig(file_path, dpi=300)
\ No newline at end of file
+        if file_path and not os.path.isfile(file_path): plt.savefig(file_path, dpi=300)
@@ -0,0 +1,95 @@
+import os, json, hashlib, collections
+import numpy as np
+from .synthetic_traffic_generator import *
+from experiment_inputs import encodeJSONValue, computeCodeVersion
+
+'''
+Memoization layer for planned traffic.
+'''
+# Traffic generators are stateless functions of their parameters, so their planned traffic is cached under a key made of
+# the generator class, its parameters (see getParameters()) and the version of its code. Recently used
+# traffic is kept in an in-process LRU of "max_memory_entries" entries, backed by an on-disk cache of .npz files in
+# "cache_directory" (if given) whose least recently used files are evicted once it grows beyond "max_disk_bytes".
+# Traffic planned from a TrafficTemplate is cached as its template, i.e., once for all message sizes.
+class TrafficCache(object):
+    def __init__(self, cache_directory=None, max_memory_entries=4, max_disk_bytes=1 << 30):
+        self.cache_directory = cache_directory
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_cache = collections.OrderedDict()
+        if cache_directory: os.makedirs(cache_directory, exist_ok=True)
+
+    # Key of the traffic planned by a generator with the given plan arguments
+    def deriveKey(self, traffic_generator, *plan_arguments):
+        generator_class = type(traffic_generator)
+        content = json.dumps([generator_class.__name__, traffic_generator.getParameters(), computeCodeVersion(generator_class), plan_arguments],
+                             sort_keys=True, default=encodeJSONValue)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    # Returns the TrafficTemplate planned by the generator for "start_time"
+    def getTemplate(self, traffic_generator, start_time=0):
+        key = self.deriveKey(traffic_generator, "template", start_time)
+        template = self.lookup(key)
+        if template is None:
+            template = traffic_generator.plan_template(start_time)
+            self.insert(key, template)
+        return template
+
+    # Returns the traffic arrival events planned by the generator for the total message size and "start_time"
+    def getArrivals(self, traffic_generator, total_message_size, start_time=0):
+        if traffic_generator.has_template():
+            return traffic_generator.instantiate_template(self.getTemplate(traffic_generator, start_time), total_message_size)
+        key = self.deriveKey(traffic_generator, "arrivals", total_message_size, start_time)
+        traffic_arrival_events = self.lookup(key)
+        if traffic_arrival_events is None:
+            traffic_arrival_events = traffic_generator.plan_arrivals(total_message_size, start_time)
+            self.insert(key, traffic_arrival_events)
+        return traffic_arrival_events
+
+    def getCacheFilename(self, key):
+        return "{}/{}.npz".format(self.cache_directory, key)
+
+    # Returns the cached TrafficTemplate or TrafficEvents of the key (None if it is not cached)
+    def lookup(self, key):
+        if key in self.memory_cache:
+            self.memory_cache.move_to_end(key)
+            return self.memory_cache[key]
+        if not self.cache_directory or not os.path.isfile(self.getCacheFilename(key)): return None
+        cache_filename = self.getCacheFilename(key)
+        with np.load(cache_filename, allow_pickle=False) as cached:
+            events = TrafficEvents(cached["events"])
+            entry = TrafficTemplate.fromEvents(events, cached["segment_lengths"]) if "segment_lengths" in cached.files else events
+        os.utime(cache_filename) # mark the file as recently used
+        self.insertInMemory(key, entry)
+        return entry
+
+    def insert(self, key, entry):
+        self.insertInMemory(key, entry)
+        if not self.cache_directory: return
+        # write the file atomically, since several processes may share the cache directory
+        cache_filename = self.getCacheFilename(key)
+        temporary_cache_filename = "{}.{}.tmp".format(cache_filename, os.getpid())
+        with open(temporary_cache_filename, "wb") as f:
+            if isinstance(entry, TrafficTemplate): np.savez(f, events=entry.events.events, segment_lengths=entry.segment_lengths)
+            else: np.savez(f, events=entry.events)
+        os.replace(temporary_cache_filename, cache_filename)
+        self.evict()
+
+    def insertInMemory(self, key, entry):
+        self.memory_cache[key] = entry
+        self.memory_cache.move_to_end(key)
+        while len(self.memory_cache) > self.max_memory_entries: self.memory_cache.popitem(last=False)
+
+    # Removes the least recently used cache files until the on-disk cache fits within "max_disk_bytes"
+    def evict(self):
+        cache_files = []
+        for entry in os.scandir(self.cache_directory):
+            if not entry.name.endswith(".npz"): continue
+            try: cache_files.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+            except FileNotFoundError: continue # evicted by another process
+        total_size = sum(size for _, size, _ in cache_files)
+        for _, size, path in sorted(cache_files):
+            if total_size <= self.max_disk_bytes: break
+            try: os.remove(path)
+            except FileNotFoundError: pass
+            total_size -= size
@@ -0,0 +1,100 @@
+import importlib
+
+'''
+Registry of the synthetic traffic generators, imported on first use so that looking up one generator does not import the others.
+'''
+
+# Traffic generator class of each traffic pattern (the traffic names of the experiment directories): (module, class name)
+TRAFFIC_GENERATOR_CLASSES = {"ring_allreduce": ("traffic.synthetic_traffic.ring_allreduce_traffic_generator", "RingAllReduceTrafficGenerator"),
+                             "ring_allgather": ("traffic.synthetic_traffic.ring_allgather_traffic_generator", "RingAllGatherTrafficGenerator"),
+                             "ring_alltoall": ("traffic.synthetic_traffic.ring_alltoall_traffic_generator", "RingAllToAllTrafficGenerator"),
+                             "hierarchical_allreduce": ("traffic.synthetic_traffic.hierarchical_allreduce_traffic_generator", "HierarchicalAllReduceTrafficGenerator"),
+                             "hierarchical_allgather": ("traffic.synthetic_traffic.hierarchical_allgather_traffic_generator", "HierarchicalAllGatherTrafficGenerator"),
+                             "hierarchical_alltoall": ("traffic.synthetic_traffic.hierarchical_alltoall_traffic_generator", "HierarchicalAllToAllTrafficGenerator"),
+                             "sipco_allreduce": ("traffic.synthetic_traffic.sipco_allreduce_traffic_generator", "SiPCOAllReduceTrafficGenerator"),
+                             "sipco_allgather": ("traffic.synthetic_traffic.sipco_allgather_traffic_generator", "SiPCOAllGatherTrafficGenerator"),
+                             "sipco_alltoall": ("traffic.synthetic_traffic.sipco_alltoall_traffic_generator", "SiPCOAllToAllTrafficGenerator"),
+                             "mesh_allreduce": ("traffic.synthetic_traffic.mesh_allreduce_traffic_generator", "MeshAllReduceTrafficGenerator"),
+                             "mesh_alltoall": ("traffic.synthetic_traffic.mesh_alltoall_traffic_generator", "MeshAllToAllTrafficGenerator"),
+                             "primitive_alltoall": ("traffic.synthetic_traffic.primitive_alltoall_traffic_generator", "PrimitiveAllToAllTrafficGenerator"),
+                             "primitive_onetoall": ("traffic.synthetic_traffic.primitive_onetoall_traffic_generator", "PrimitiveOneToAllTrafficGenerator"),
+                             "primitive_alltoone": ("traffic.synthetic_traffic.primitive_alltoone_traffic_generator", "PrimitiveAllToOneTrafficGenerator"),
+                             "hybrid_parallel": ("traffic.synthetic_traffic.hybrid_parallel_traffic_generator", "HybridParallelTrafficGenerator"),
+                             }
+
+def getTrafficNames():
+    return list(TRAFFIC_GENERATOR_CLASSES.keys())
+
+# Returns the traffic generator class of a traffic pattern, importing its module
+def findTrafficGeneratorClass(traffic_name):
+    if traffic_name not in TRAFFIC_GENERATOR_CLASSES: raise Exception("Unknown traffic: {}".format(traffic_name))
+    module_name, class_name = TRAFFIC_GENERATOR_CLASSES[traffic_name]
+    return getattr(importlib.import_module(module_name), class_name)
+
+def createTrafficGenerator(traffic_name, **parameters):
+    return findTrafficGeneratorClass(traffic_name)(**parameters)
+
+####################################################################################################
+# Builders of the collectives run on the topologies compared in this work
+####################################################################################################
+
+# Size of the groups of hierarchical collectives on a topology: the rows of a 2D torus, the DGX nodes (8 GPUs) of a
+# SuperPod, or the r^l servers below a SiPAC/BCube switch. None if the topology has no such hierarchy.
+def deriveHierarchyGroupSize(topology, topology_kind):
+    if topology_kind == "torus" and topology.getName().startswith("2D"): return int(topology.getNumServers()**(1/2))
+    if topology_kind == "dgx_superpod":
+        k = topology.getNumServers() / 8
+        assert(k == int(k))
+        return int(k)
+    if topology_kind in ("sipac", "bcube"): return int(topology.getR() ** topology.getL())
+    return None
+
+def buildJobCollective(traffic_name):
+    return lambda topology, topology_kind, parameters: createTrafficGenerator(traffic_name, p=topology.getNumServers(), num_server_per_job=topology.getNumServers())
+
+def buildPrimitiveCollective(traffic_name, **root):
+    return lambda topology, topology_kind, parameters: createTrafficGenerator(traffic_name, p=topology.getNumServers(), **root)
+
+def buildHierarchicalCollective(traffic_name):
+    def build(topology, topology_kind, parameters):
+        k = deriveHierarchyGroupSize(topology, topology_kind)
+        if k is None: return None
+        return createTrafficGenerator(traffic_name, p=topology.getNumServers(), k=k, num_server_per_job=topology.getNumServers())
+    return build
+
+# SiPCO collectives follow the structure of SiPAC/BCube topologies
+def buildSiPCOCollective(traffic_name):
+    def build(topology, topology_kind, parameters):
+        if topology_kind not in ("sipac", "bcube"): return None
+        return createTrafficGenerator(traffic_name, r=topology.getR(), l=topology.getL(), num_server_per_job=topology.getNumServers())
+    return build
+
+# Hybrid parallel traffic of a model ("model_info") split over groups of "num_mp_nodes" model parallel nodes. SiPCO
+# collectives of the model run on the SiPAC/BCube structure of the topology.
+def buildHybridParallel(topology, topology_kind, parameters):
+    model_info = dict(parameters["model_info"])
+    if topology_kind in ("sipac", "bcube"): model_info["r"], model_info["l"] = topology.getR(), topology.getL()
+    return createTrafficGenerator("hybrid_parallel", p=topology.getNumServers(), num_mp_nodes=parameters["num_mp_nodes"], model_info=model_info)
+
+# Builder of each traffic pattern: (topology, topology kind, traffic parameters) -> traffic generator,
+# or None if the collective does not run on the topology
+TRAFFIC_BUILDERS = {"ring_allreduce": buildJobCollective("ring_allreduce"),
+                    "ring_allgather": buildJobCollective("ring_allgather"),
+                    "ring_alltoall": buildJobCollective("ring_alltoall"),
+                    "mesh_allreduce": buildJobCollective("mesh_allreduce"),
+                    "mesh_alltoall": buildJobCollective("mesh_alltoall"),
+                    "hierarchical_allreduce": buildHierarchicalCollective("hierarchical_allreduce"),
+                    "hierarchical_allgather": buildHierarchicalCollective("hierarchical_allgather"),
+                    "hierarchical_alltoall": buildHierarchicalCollective("hierarchical_alltoall"),
+                    "sipco_allreduce": buildSiPCOCollective("sipco_allreduce"),
+                    "sipco_allgather": buildSiPCOCollective("sipco_allgather"),
+                    "sipco_alltoall": buildSiPCOCollective("sipco_alltoall"),
+                    "primitive_alltoall": buildPrimitiveCollective("primitive_alltoall"),
+                    "primitive_onetoall": buildPrimitiveCollective("primitive_onetoall", src_node=0),
+                    "primitive_alltoone": buildPrimitiveCollective("primitive_alltoone", dst_node=0),
+                    "hybrid_parallel": buildHybridParallel,
+                    }
+
+def buildTrafficGenerator(traffic_name, topology, topology_kind, parameters=None):
+    if traffic_name not in TRAFFIC_BUILDERS: raise Exception("No builder for traffic: {}".format(traffic_name))
+    return TRAFFIC_BUILDERS[traffic_name](topology, topology_kind, parameters or {})
@@ -1,4 +1,6 @@
 import os, stat, json
+import hashlib
+from experiment_inputs import encodeJSONValue
 
 ## Given a long representing the nanoseconds, returns a string of the time.
 def extract_timing_string(nanoseconds):
@@ -43,11 +45,43 @@ def parseJSON(filename):
         json_dict = json.load(json_file)
     return json_dict
 
-# Generate the bash script used to run simulations in Netbench
-def generateBashScript(exec_dir, netbench_config_files_list, exp_name=""):
+# Hash (sha256) of a sequence of JSON-serializable items, used to detect changes in experiment inputs
+def computeContentHash(*items):
+    content = json.dumps(items, sort_keys=True, default=encodeJSONValue)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+# Read the manifest mapping each generated experiment file to the hash of its inputs (empty if it does not exist)
+def readManifest(filename):
+    if not os.path.isfile(filename): return {}
+    return parseJSON(filename)
+
+# Write the manifest atomically, so that an interrupted run never leaves a corrupted manifest behind
+def writeManifest(filename, manifest):
+    temporary_filename = "{}.tmp".format(filename)
+    with open(temporary_filename, "w+") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temporary_filename, filename)
+
+# Make "link_name" a hard link to "filename" (a symbolic link if hard links are not supported), replacing it atomically
+def linkFile(filename, link_name):
+    temporary_link_name = "{}.{}.tmp".format(link_name, os.getpid())
+    if os.path.lexists(temporary_link_name): os.remove(temporary_link_name)
+    try:
+        os.link(filename, temporary_link_name)
+    except OSError:
+        os.symlink(os.path.abspath(filename), temporary_link_name)
+    os.replace(temporary_link_name, link_name)
+
+# Generate the bash script used to run simulations in Netbench, or in the fluid simulator of this repository
+# (simulation/fluid_simulator.py) with simulator="fluid"
+def generateBashScript(exec_dir, netbench_config_files_list, exp_name="", simulator="netbench"):
     # Construct the string builder
-    directory_change_command = "cd $NETBENCH_HOME\n\n"
-    netbench_execution_prefix = "java -jar -ea NetBench.jar "
+    if simulator == "fluid":
+        directory_change_command = "cd \"{}\"\n\n".format(os.path.dirname(os.path.abspath(__file__)))
+        netbench_execution_prefix = "python3 -m simulation.fluid_simulator "
+    else:
+        directory_change_command = "cd $NETBENCH_HOME\n\n"
+        netbench_execution_prefix = "java -jar -ea NetBench.jar "
     str_builder = directory_change_command
     for i in range(len(netbench_config_files_list)):
         str_builder += (netbench_execution_prefix + netbench_config_files_list[i] + "\n")